@@ -9,7 +9,7 @@ import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.metrics import silhouette_score
 from scipy.linalg import eigh
-from scipy.sparse import csgraph
+from scipy.sparse import csgraph, csr_matrix
 import json
 
 
@@ -91,10 +91,10 @@ class GraphLaplacianPCBKT:
         if self.knowledge_graph is None:
             raise ValueError("Knowledge graph must be set before building Laplacian")
         
-        # Get adjacency matrix from knowledge graph
-        adjacency_full = self.knowledge_graph.get_adjacency_matrix()
+        # Get sparse adjacency from knowledge graph (memory grows with edge count)
+        adjacency_csr = self.knowledge_graph.get_adjacency_csr()
         
-        if adjacency_full.size == 0:
+        if adjacency_csr.shape[0] == 0:
             print("Empty adjacency matrix, using identity for Laplacian")
             n_skills = len(self.skills)
             self.graph_laplacian = np.eye(n_skills)
@@ -115,17 +115,15 @@ class GraphLaplacianPCBKT:
                 skill_indices.append(topic_index)
         
         # Extract relevant submatrix for our skills
-        valid_indices = [i for i, idx in enumerate(skill_indices) if 0 <= idx < adjacency_full.shape[0]]
+        valid_indices = [i for i, idx in enumerate(skill_indices) if 0 <= idx < adjacency_csr.shape[0]]
         kg_indices = [skill_indices[i] for i in valid_indices]
         
         if len(kg_indices) > 0:
-            # Extract submatrix for valid skills
-            sub_adjacency = adjacency_full[np.ix_(kg_indices, kg_indices)]
+            # Extract submatrix for valid skills: row slice of the CSR, then column slice
+            sub_adjacency = csr_matrix(adjacency_csr)[kg_indices, :][:, kg_indices].toarray()
             
             # Fill in the filtered adjacency matrix
-            for i, valid_i in enumerate(valid_indices):
-                for j, valid_j in enumerate(valid_indices):
-                    adjacency_filtered[valid_i, valid_j] = sub_adjacency[i, j]
+            adjacency_filtered[np.ix_(valid_indices, valid_indices)] = sub_adjacency
         
         # Symmetrize the directed adjacency matrix
         adjacency_sym = (adjacency_filtered + adjacency_filtered.T) / 2
@@ -420,8 +418,8 @@ class GraphLaplacianPCBKT:
             return 0.3
         
         # Get adjacency information for this skill
-        adjacency_matrix = self.knowledge_graph.get_adjacency_matrix()
-        if adjacency_matrix.size == 0 or target_idx >= adjacency_matrix.shape[0]:
+        adjacency_matrix = csr_matrix(self.knowledge_graph.get_adjacency_csr())
+        if adjacency_matrix.shape[0] == 0 or target_idx >= adjacency_matrix.shape[0]:
             return 0.3
         
         # Find connected skills that were tested
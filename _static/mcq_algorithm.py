@@ -19,15 +19,36 @@ import numpy as np
 import networkx as nx
 from typing import Dict, List, Set, Tuple, Optional, Union, Any
 from fractions import Fraction
-from dataclasses import dataclass, field
-from datetime import datetime
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime, timedelta, timezone
 import math
 import json
+import os
 import random
+import sys
+import heapq
+import itertools
 import re
-from sympy import ( sqrt, Poly, sympify, expand, factor, simplify, collect, symbols, latex, Rational,gcd, lcm, factorial, isprime, factorint, Abs, floor, ceiling, Mod,diff, integrate, limit, series, solve, roots,sin, cos, tan, asin, acos, atan, sec, csc, cot, pi, E, deg, rad, log, exp,cancel, apart, together, nsimplify
+import multiprocessing
+from types import MappingProxyType
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque, OrderedDict
+from collections.abc import Mapping, MutableMapping
+import keyword
+import sympy
+from sympy.printing.repr import ReprPrinter
+from sympy import ( Basic, Integer, S, Symbol, lambdify, sqrt, Poly, sympify, expand, factor, simplify, collect, symbols, latex, Rational,gcd, lcm, factorial, isprime, factorint, Abs, floor, ceiling, Mod,diff, integrate, limit, series, solve, roots,sin, cos, tan, asin, acos, atan, sec, csc, cot, pi, E, deg, rad, log, exp,cancel, apart, together, nsimplify
 )
 
+# scipy is optional: it is not in the Pyodide package list, so sparse
+# adjacency falls back to plain NumPy CSR arrays without it
+try:
+    import scipy.sparse as sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    sparse = None
+    SCIPY_AVAILABLE = False
+
 x, a, b, c, d, r_1, r_2 = symbols('x a b c d r_1 r_2')
 local_namespace = {
     'x': x, 'a': a, 'b': b, 'c': c, 'r_1': r_1, 'r_2': r_2,
@@ -36,10 +57,12 @@ local_namespace = {
 }
 
 
-@dataclass
+@dataclass(slots=True)
 class MinimalMCQData:
     """
-    Contains ONLY the data needed for select_optimal_mcqs algorithm
+    Contains ONLY the data needed for select_optimal_mcqs algorithm.
+    MCQLoader keeps these columns in an MCQColumnStore and hands out MinimalMCQView rows
+    with the same attributes.
     """
     id: str
     main_topic_index: int
@@ -56,24 +79,212 @@ class MinimalMCQData:
     has_breakdown: bool = False
     breakdown_options: List[int] = field(default_factory=list)
 
+
+class MCQColumnStore(Mapping):
+    """
+    Struct-of-arrays store behind MCQLoader.minimal_mcq_data: mcq_id -> MinimalMCQView.
+    One row per MCQ: scalar columns, the six skill difficulties as an n x 6 matrix
+    (DIFFICULTY_SKILLS order), and subtopic weights / prerequisites as CSR arrays in
+    the insertion order of the source JSON. No per-question Python objects are kept.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.ids: List[str] = columns['ids'].tolist()
+        # Duplicate ids behave like dict assignment: first position, last row wins
+        self.row_of: Dict[str, int] = {mcq_id: row for row, mcq_id in enumerate(self.ids)}
+
+        self.main_topics = columns['main_topics']
+        self.difficulty = columns['difficulty']
+        self.chapters = columns['chapters']
+        self.is_parameterized = columns['is_parameterized']
+        self.skill_difficulty = columns['skill_difficulty']
+
+        self.subtopic_indptr = columns['subtopic_indptr']
+        self.subtopic_indices = columns['subtopic_indices']
+        self.subtopic_weights = columns['subtopic_weights']
+        self.prereq_indptr = columns['prereq_indptr']
+        self.prereq_indices = columns['prereq_indices']
+        self.prereq_weights = columns['prereq_weights']
+
+        self.record_offsets = columns['record_offsets']
+        self.record_lengths = columns['record_lengths']
+
+    def __getitem__(self, mcq_id: str) -> 'MinimalMCQView':
+        return MinimalMCQView(self, self.row_of[mcq_id])
+
+    def __contains__(self, mcq_id) -> bool:
+        return mcq_id in self.row_of
+
+    def __iter__(self):
+        return iter(self.row_of)
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def rows(self, mcq_ids: List[str]) -> np.ndarray:
+        """Store rows of the given MCQ ids"""
+        return np.array([self.row_of[mcq_id] for mcq_id in mcq_ids], dtype=np.int64)
+
+    def record_span(self, mcq_id: str) -> Optional[Tuple[int, int]]:
+        """Byte offset and length of the MCQ's record in the source JSON"""
+        row = self.row_of.get(mcq_id)
+        if row is None:
+            return None
+        return int(self.record_offsets[row]), int(self.record_lengths[row])
+
+
+@dataclass
+class TopicPostings:
+    """
+    Inverted topic -> MCQ index over one CSR weight column of an MCQColumnStore.
+    Postings of each topic are sorted by weight, highest first (ties by store row),
+    so "MCQs touching topic T with weight >= w" is a binary search plus a slice.
+    """
+    indptr: np.ndarray   # (max_topic + 2,) offsets into rows/weights by topic index
+    rows: np.ndarray     # store rows
+    weights: np.ndarray  # matching weights, descending within each topic
+
+    @classmethod
+    def from_csr(cls, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray,
+                 live_rows: np.ndarray) -> 'TopicPostings':
+        """Transpose per-MCQ CSR arrays, keeping only entries of live (non-shadowed) rows"""
+        entry_rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        keep = live_rows[entry_rows]
+        entry_rows, entry_topics, entry_weights = entry_rows[keep], indices[keep], weights[keep]
+
+        order = np.lexsort((entry_rows, -entry_weights, entry_topics))
+        entry_topics = entry_topics[order]
+        num_topics = int(entry_topics.max()) + 1 if entry_topics.size else 0
+        return cls(
+            indptr=np.searchsorted(entry_topics, np.arange(num_topics + 1)),
+            rows=entry_rows[order],
+            weights=entry_weights[order]
+        )
+
+    def lookup(self, topic_index: int, min_weight: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and weights of MCQs with weight >= min_weight on topic_index, highest weight first"""
+        if not 0 <= topic_index < len(self.indptr) - 1:
+            return self.rows[:0], self.weights[:0]
+        start, end = self.indptr[topic_index], self.indptr[topic_index + 1]
+        count = np.searchsorted(-self.weights[start:end], -min_weight, side='right')
+        return self.rows[start:start + count], self.weights[start:start + count]
+
+
+class MinimalMCQView:
+    """
+    Read-only MinimalMCQData over one row of an MCQColumnStore.
+    The weight dicts and DifficultyBreakdown are built on first access and kept on the view.
+    """
+    __slots__ = ('_store', 'row', '_subtopic_weights', '_prerequisites', '_difficulty_breakdown')
+
+    text = None
+    has_breakdown = False
+
+    def __init__(self, store: MCQColumnStore, row: int):
+        self._store = store
+        self.row = row
+        self._subtopic_weights = None
+        self._prerequisites = None
+        self._difficulty_breakdown = None
+
+    @property
+    def id(self) -> str:
+        return self._store.ids[self.row]
+
+    @property
+    def main_topic_index(self) -> int:
+        return int(self._store.main_topics[self.row])
+
+    @property
+    def difficulty(self) -> float:
+        return float(self._store.difficulty[self.row])
+
+    @property
+    def chapter(self) -> Optional[str]:
+        return str(self._store.chapters[self.row]) or None
+
+    @property
+    def is_parameterized(self) -> bool:
+        return bool(self._store.is_parameterized[self.row])
+
+    @property
+    def breakdown_options(self) -> List[int]:
+        return []
+
+    @property
+    def subtopic_weights(self) -> Dict[int, float]:
+        if self._subtopic_weights is None:
+            store = self._store
+            start, end = store.subtopic_indptr[self.row], store.subtopic_indptr[self.row + 1]
+            self._subtopic_weights = dict(zip(store.subtopic_indices[start:end].tolist(),
+                                              store.subtopic_weights[start:end].tolist()))
+        return self._subtopic_weights
+
+    @property
+    def prerequisites(self) -> Dict[int, float]:
+        if self._prerequisites is None:
+            store = self._store
+            start, end = store.prereq_indptr[self.row], store.prereq_indptr[self.row + 1]
+            self._prerequisites = dict(zip(store.prereq_indices[start:end].tolist(),
+                                           store.prereq_weights[start:end].tolist()))
+        return self._prerequisites
+
+    @property
+    def skill_difficulties(self) -> np.ndarray:
+        """The six skill difficulties in DIFFICULTY_SKILLS order (a view into the store)"""
+        return self._store.skill_difficulty[self.row]
+
+    @property
+    def difficulty_breakdown(self) -> 'DifficultyBreakdown':
+        if self._difficulty_breakdown is None:
+            self._difficulty_breakdown = DifficultyBreakdown(*self.skill_difficulties.tolist())
+        return self._difficulty_breakdown
+
+    def __repr__(self) -> str:
+        return f"MinimalMCQView(id={self.id!r}, main_topic_index={self.main_topic_index}, difficulty={self.difficulty})"
+
+
+# Version of the columnar .npz layout written by compile_question_bank
+COMPILED_BANK_VERSION = 1
+# Version of the variant pool sidecar written by build_variant_pools
+VARIANT_POOL_VERSION = 2
+
 class MCQLoader:
     """
-    Loads only the minimal data needed for select_optimal_mcqs algorithm to save memory
+    Loads only the minimal data needed for select_optimal_mcqs algorithm to save memory.
+    Accepts either the computed MCQ JSON or a compiled .npz bank (see compile_question_bank).
     """
 
-    def __init__(self, mcqs_file: str):
+    def __init__(self, mcqs_file: str, full_mcq_cache_size: int = 256):
         self.mcqs_file = mcqs_file
+        self.is_compiled = mcqs_file.endswith('.npz')
 
         # Core data structures (minimal memory)
-        self.minimal_mcq_data: Dict[str, MinimalMCQData] = {}
+        self.minimal_mcq_data: MCQColumnStore = None
         self.topic_to_mcq_ids: Dict[int, Set[str]] = {}
+        # Weight-sorted inverted indexes over every subtopic / prerequisite entry
+        self.subtopic_postings: Optional[TopicPostings] = None
+        self.prerequisite_postings: Optional[TopicPostings] = None
 
         # Lazy loading for full MCQ objects (only when absolutely needed)
-        self._full_mcq_cache: Dict[str, 'MCQ'] = {}
-        self._raw_mcq_data: Dict[str, dict] = {}
+        # Bounded LRU: most recently used at the end
+        self._full_mcq_cache: 'OrderedDict[str, MCQ]' = OrderedDict()
+        self.full_mcq_cache_size = full_mcq_cache_size
+        self._cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._raw_mcq_data: Dict[str, dict] = {}  # Records added by hand; loaded ones are read from disk
+
+        # Pre-rendered variants of parameterized MCQs (see build_variant_pools), {mcq_id: [variant]}
+        self.variant_pools: Dict[str, List[Dict]] = {}
+        self._variant_stats = {'draws': 0, 'fallbacks': 0}
+
+        # Source JSON for on-demand full loading; record byte spans live in the column store
+        self.source_file: Optional[str] = None if self.is_compiled else mcqs_file
 
         # Build the minimal index
-        self._build_minimal_index()
+        if self.is_compiled:
+            self._load_compiled_index()
+        else:
+            self._build_minimal_index()
 
         self._breakdown_stats = {
             'total_with_breakdown': 0,
@@ -84,49 +295,73 @@ class MCQLoader:
         """Build index with only essential data for the algorithm"""
 
         try:
-            with open(self.mcqs_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(self.mcqs_file, 'rb') as f:
+                records = _scan_mcq_records(f.read())
 
-            mcqs_data = data.get('mcqs', data) if isinstance(data, dict) else data
-
-            for mcq_data in mcqs_data:
-                mcq_id = mcq_data['id']
-
-                # Convert string keys to integers (only conversion needed)
-                subtopic_weights = {int(k): v for k, v in mcq_data['subtopic_weights'].items()}
-                prerequisites = {int(k): v for k, v in mcq_data['prerequisites'].items()}
-                difficulty_breakdown = DifficultyBreakdown.from_dict(mcq_data['difficulty_breakdown'])
-
-                # Use precomputed values directly - no calculations
-                minimal_data = MinimalMCQData(
-                    id=mcq_id,
-                    main_topic_index=mcq_data['main_topic_index'],
-                    subtopic_weights=subtopic_weights,
-                    difficulty=mcq_data['overall_difficulty'],  # Direct use
-                    prerequisites=prerequisites,  # Direct use
-                    difficulty_breakdown=difficulty_breakdown,
-                    chapter=mcq_data.get('chapter'),
-                    is_parameterized=mcq_data.get('is_parameterized', False)
-                )
+            self.minimal_mcq_data = MCQColumnStore(_minimal_columns(records))
+            self._build_topic_indexes()
+
+        except Exception as e:
+            print(f"❌ Error building minimal index: {e}")
+            raise
+
+    def _load_compiled_index(self):
+        """Build the minimal index from a compiled .npz bank: no JSON parsing, no raw records kept"""
+        try:
+            with np.load(self.mcqs_file, allow_pickle=False) as bank:
+                version = int(bank['format_version'])
+                if version != COMPILED_BANK_VERSION:
+                    raise ValueError(f"unsupported compiled bank version {version}, expected {COMPILED_BANK_VERSION}")
+
+                columns = {name: bank[name] for name in bank.files}
+                source_file = str(bank['source_file'])
+                source_size = int(bank['source_size'])
 
-                self.minimal_mcq_data[mcq_id] = minimal_data
+            # Skill columns in DIFFICULTY_SKILLS order, whatever order the bank was written in
+            skill_names = columns['skill_names'].tolist()
+            columns['skill_difficulty'] = columns['skill_difficulty'][:, [skill_names.index(skill) for skill in DIFFICULTY_SKILLS]]
 
-                # Index by main topic
-                main_topic = mcq_data['main_topic_index']
-                if main_topic not in self.topic_to_mcq_ids:
-                    self.topic_to_mcq_ids[main_topic] = set()
-                self.topic_to_mcq_ids[main_topic].add(mcq_id)
+            self.source_file = os.path.join(os.path.dirname(self.mcqs_file), source_file)
+            if os.path.exists(self.source_file) and os.path.getsize(self.source_file) != source_size:
+                print(f"⚠️ {self.source_file} changed since {self.mcqs_file} was compiled; full question text may be wrong")
 
-                # Store raw data for full MCQ creation
-                self._raw_mcq_data[mcq_id] = mcq_data
+            self.minimal_mcq_data = MCQColumnStore(columns)
+            self._build_topic_indexes()
 
         except Exception as e:
-            print(f"❌ Error building minimal index: {e}")
+            print(f"❌ Error loading compiled MCQ bank: {e}")
             raise
 
+    def _build_topic_indexes(self):
+        """Index MCQ ids by main topic, and build the subtopic / prerequisite postings"""
+        store = self.minimal_mcq_data
+        live_rows = np.zeros(len(store.ids), dtype=bool)
+        live_rows[list(store.row_of.values())] = True
+        self.subtopic_postings = TopicPostings.from_csr(store.subtopic_indptr, store.subtopic_indices,
+                                                        store.subtopic_weights, live_rows)
+        self.prerequisite_postings = TopicPostings.from_csr(store.prereq_indptr, store.prereq_indices,
+                                                            store.prereq_weights, live_rows)
+
+        for mcq_id, main_topic in zip(store.ids, store.main_topics.tolist()):
+            if main_topic not in self.topic_to_mcq_ids:
+                self.topic_to_mcq_ids[main_topic] = set()
+            self.topic_to_mcq_ids[main_topic].add(mcq_id)
+
+    def _get_raw_mcq_data(self, mcq_id: str) -> Optional[dict]:
+        """Raw JSON record for an MCQ, read by byte offset from the source file"""
+        if mcq_id in self._raw_mcq_data:
+            return self._raw_mcq_data[mcq_id]
 
+        span = self.minimal_mcq_data.record_span(mcq_id)
+        if span is None or self.source_file is None:
+            return None
 
-    def get_mcqs_for_due_topics_minimal(self, due_topic_indices: List[int]) -> List[MinimalMCQData]:
+        offset, length = span
+        with open(self.source_file, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length).decode('utf-8'))
+
+    def get_mcqs_for_due_topics_minimal(self, due_topic_indices: List[int]) -> List[MinimalMCQView]:
         """
         Get minimal MCQ data for due topics
         This is what select_optimal_mcqs actually needs
@@ -149,7 +384,17 @@ class MCQLoader:
                 mcq_ids.extend(self.topic_to_mcq_ids[topic_index])
         return mcq_ids
 
-    def get_minimal_mcq_data(self, mcq_id: str) -> Optional[MinimalMCQData]:
+    def get_mcq_ids_for_subtopic(self, topic_index: int, min_weight: float = 0.0) -> List[str]:
+        """MCQ IDs with subtopic weight >= min_weight on topic_index, highest weight first"""
+        rows, _ = self.subtopic_postings.lookup(topic_index, min_weight)
+        return [self.minimal_mcq_data.ids[row] for row in rows.tolist()]
+
+    def get_mcq_ids_for_prerequisite(self, topic_index: int, min_weight: float = 0.0) -> List[str]:
+        """MCQ IDs with prerequisite weight >= min_weight on topic_index, highest weight first"""
+        rows, _ = self.prerequisite_postings.lookup(topic_index, min_weight)
+        return [self.minimal_mcq_data.ids[row] for row in rows.tolist()]
+
+    def get_minimal_mcq_data(self, mcq_id: str) -> Optional[MinimalMCQView]:
         """Get minimal data for a specific MCQ"""
         return self.minimal_mcq_data.get(mcq_id)
 
@@ -159,12 +404,15 @@ class MCQLoader:
         (e.g., for display text, detailed analysis)
         """
         if mcq_id in self._full_mcq_cache:
+            self._cache_stats['hits'] += 1
+            self._full_mcq_cache.move_to_end(mcq_id)
             return self._full_mcq_cache[mcq_id]
 
-        if mcq_id in self._raw_mcq_data:
+        if mcq_id in self._raw_mcq_data or mcq_id in self.minimal_mcq_data:
+            self._cache_stats['misses'] += 1
             try:
-                mcq = MCQ.from_dict(self._raw_mcq_data[mcq_id])
-                self._full_mcq_cache[mcq_id] = mcq
+                mcq = MCQ.from_dict(self._get_raw_mcq_data(mcq_id))
+                self._cache_full_mcq(mcq_id, mcq)
                 return mcq
             except Exception as e:
                 print(f"❌ Failed to create full MCQ {mcq_id}: {e}")
@@ -172,20 +420,385 @@ class MCQLoader:
 
         return None
 
-    def get_stats(self) -> Dict:
-        """Get loader statistics"""
+    def _cache_full_mcq(self, mcq_id: str, mcq: 'MCQ'):
+        """Insert into the LRU cache, evicting the least recently used MCQs over capacity"""
+        if self.full_mcq_cache_size <= 0:
+            return
+        self._full_mcq_cache[mcq_id] = mcq
+        while len(self._full_mcq_cache) > self.full_mcq_cache_size:
+            self._full_mcq_cache.popitem(last=False)
+            self._cache_stats['evictions'] += 1
+
+    def set_full_mcq_cache_size(self, capacity: int):
+        """Change the LRU capacity, evicting immediately if it shrank"""
+        self.full_mcq_cache_size = capacity
+        while len(self._full_mcq_cache) > max(capacity, 0):
+            self._full_mcq_cache.popitem(last=False)
+            self._cache_stats['evictions'] += 1
+
+    def load_variant_pools(self, pool_file: str):
+        """Load a variant pool sidecar written by build_variant_pools"""
+        try:
+            with open(pool_file, 'r', encoding='utf-8') as f:
+                pools = json.load(f)
+            if pools.get('format_version') != VARIANT_POOL_VERSION:
+                raise ValueError(f"unsupported variant pool version {pools.get('format_version')}, expected {VARIANT_POOL_VERSION}")
+
+            source_file = os.path.join(os.path.dirname(pool_file), pools['source_file'])
+            if os.path.exists(source_file) and os.path.getsize(source_file) != pools['source_size']:
+                print(f"⚠️ {source_file} changed since {pool_file} was built; pre-rendered variants may be stale")
+
+            self.variant_pools = {
+                mcq_id: [dict(variant, parameters={name: _decode_parameter_value(value)
+                                                   for name, value in variant['parameters'].items()})
+                         for variant in pool]
+                for mcq_id, pool in pools['pools'].items()
+            }
+            print(f"   🎲 {sum(len(pool) for pool in self.variant_pools.values())} pre-rendered variants "
+                  f"for {len(self.variant_pools)} parameterized MCQs")
+
+        except Exception as e:
+            print(f"⚠️ Could not load variant pools from {pool_file}: {e}")
+            self.variant_pools = {}
+
+    def draw_variant(self, mcq_id: str) -> Optional[Dict]:
+        """A random pre-rendered variant of the MCQ, or None if it has no pool"""
+        pool = self.variant_pools.get(mcq_id)
+        if not pool:
+            self._variant_stats['fallbacks'] += 1
+            return None
+        self._variant_stats['draws'] += 1
+        return random.choice(pool)
+
+    def measure_memory(self) -> Dict[str, int]:
+        """
+        Deep size in bytes of each loader structure (recursive sizer, see _deep_sizeof).
+        Each structure is measured on its own; 'total' counts objects shared between them once.
+        """
+        structures = {
+            'minimal_mcq_data': self.minimal_mcq_data,
+            'topic_to_mcq_ids': self.topic_to_mcq_ids,
+            'subtopic_postings': self.subtopic_postings,
+            'prerequisite_postings': self.prerequisite_postings,
+            'raw_mcq_data': self._raw_mcq_data,
+            'full_mcq_cache': self._full_mcq_cache,
+            'variant_pools': self.variant_pools,
+        }
+        memory = {name: _deep_sizeof(obj) for name, obj in structures.items()}
+
+        shared_seen: Set[int] = set()
+        memory['total'] = sum(_deep_sizeof(obj, shared_seen) for obj in structures.values())
+        return memory
+
+    def get_stats(self, measure_memory: bool = False) -> Dict:
+        """
+        Get loader statistics.
+        With measure_memory=True the per-structure deep sizes are added under 'memory_bytes',
+        along with measured counterparts of the estimated_* figures.
+        """
         minimal_memory = len(self.minimal_mcq_data) * 0.5  # Estimate KB
         full_memory = len(self._full_mcq_cache) * 5  # Estimate KB
 
-        return {
+        lookups = self._cache_stats['hits'] + self._cache_stats['misses']
+
+        stats = {
             'total_indexed': len(self.minimal_mcq_data),
             'minimal_data_loaded': len(self.minimal_mcq_data),
             'full_mcqs_cached': len(self._full_mcq_cache),
+            'full_mcq_cache_capacity': self.full_mcq_cache_size,
+            'full_mcq_cache_hits': self._cache_stats['hits'],
+            'full_mcq_cache_misses': self._cache_stats['misses'],
+            'full_mcq_cache_evictions': self._cache_stats['evictions'],
+            'full_mcq_cache_hit_rate': self._cache_stats['hits'] / lookups if lookups else 0.0,
             'topics_indexed': len(self.topic_to_mcq_ids),
             'estimated_minimal_memory_kb': minimal_memory,
             'estimated_full_memory_kb': full_memory,
             'memory_savings_percent': (1 - (minimal_memory + full_memory) / (len(self.minimal_mcq_data) * 5)) * 100
         }
+        stats.update(RENDER_CACHE.get_stats())
+        stats['variant_pool_mcqs'] = len(self.variant_pools)
+        stats['variant_pool_draws'] = self._variant_stats['draws']
+        stats['variant_pool_fallbacks'] = self._variant_stats['fallbacks']
+
+        if measure_memory:
+            memory = self.measure_memory()
+            stats['memory_bytes'] = memory
+            stats['measured_minimal_memory_kb'] = (memory['minimal_mcq_data'] + memory['topic_to_mcq_ids'] +
+                                                   memory['subtopic_postings'] + memory['prerequisite_postings']) / 1024
+            stats['measured_full_memory_kb'] = (memory['full_mcq_cache'] + memory['raw_mcq_data']) / 1024
+
+            # Savings against holding a full MCQ for every question, extrapolated from the cached ones
+            if self._full_mcq_cache and self.minimal_mcq_data:
+                per_full_mcq = memory['full_mcq_cache'] / len(self._full_mcq_cache)
+                all_full_kb = per_full_mcq * len(self.minimal_mcq_data) / 1024
+                used_kb = stats['measured_minimal_memory_kb'] + stats['measured_full_memory_kb']
+                stats['measured_memory_savings_percent'] = (1 - used_kb / all_full_kb) * 100
+            else:
+                stats['measured_memory_savings_percent'] = None
+
+        return stats
+
+
+def _deep_sizeof(obj, seen: Optional[Set[int]] = None) -> int:
+    """
+    Recursive sys.getsizeof: follows containers, instance __dict__ and __slots__,
+    counts NumPy buffers once per owning array and each object only once (tracked by id in seen).
+    Classes, functions and modules are treated as shared and not counted.
+    """
+    if seen is None:
+        seen = set()
+
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+
+        if isinstance(current, (type, type(sys), type(_deep_sizeof))):
+            continue
+
+        total += sys.getsizeof(current)
+
+        # An array owning its buffer already reports it; views point at the owner instead
+        if isinstance(current, np.ndarray):
+            if current.base is not None:
+                stack.append(current.base)
+            continue
+
+        if isinstance(current, (str, bytes, bytearray, int, float, bool, complex)) or current is None:
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        else:
+            instance_dict = getattr(current, '__dict__', None)
+            if isinstance(instance_dict, dict):
+                stack.append(instance_dict)
+            for klass in type(current).__mro__:
+                for slot in getattr(klass, '__slots__', ()):
+                    if isinstance(slot, str) and hasattr(current, slot):
+                        stack.append(getattr(current, slot))
+
+    return total
+
+
+def _scan_mcq_records(raw_bytes: bytes) -> List[Tuple[dict, int, int]]:
+    """
+    Parse the MCQ list of a JSON file ({"mcqs": [...]} or a bare list).
+    Returns (record, byte_offset, byte_length) for each MCQ.
+    """
+    text = raw_bytes.decode('utf-8')
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r'\s*')
+
+    def skip_whitespace(position):
+        return whitespace.match(text, position).end()
+
+    position = skip_whitespace(0)
+    if text.startswith('{', position):
+        # Walk the top-level keys until the MCQ list
+        position = skip_whitespace(position + 1)
+        while not text.startswith('}', position):
+            key, position = decoder.raw_decode(text, position)
+            position = skip_whitespace(skip_whitespace(position) + 1)  # past ':'
+            if key == 'mcqs':
+                break
+            _, position = decoder.raw_decode(text, position)
+            position = skip_whitespace(position)
+            if text.startswith(',', position):
+                position = skip_whitespace(position + 1)
+        else:
+            raise ValueError("JSON object has no 'mcqs' list")
+
+    if not text.startswith('[', position):
+        raise ValueError("expected a list of MCQs")
+    position = skip_whitespace(position + 1)
+
+    records = []
+    byte_position, char_position = 0, 0
+    while not text.startswith(']', position):
+        record, end = decoder.raw_decode(text, position)
+
+        # Characters to UTF-8 bytes, encoding each stretch of text once
+        byte_offset = byte_position + len(text[char_position:position].encode('utf-8'))
+        byte_length = len(text[position:end].encode('utf-8'))
+        byte_position, char_position = byte_offset + byte_length, end
+
+        records.append((record, byte_offset, byte_length))
+        position = skip_whitespace(end)
+        if text.startswith(',', position):
+            position = skip_whitespace(position + 1)
+
+    return records
+
+
+def _minimal_columns(records: List[Tuple[dict, int, int]]) -> Dict[str, np.ndarray]:
+    """
+    Column arrays of the minimal index (MCQColumnStore layout) from _scan_mcq_records output.
+    Shared by the JSON loader and compile_question_bank.
+    """
+    subtopic_indptr, subtopic_indices, subtopic_weights = [0], [], []
+    prereq_indptr, prereq_indices, prereq_weights = [0], [], []
+
+    for mcq_data, _, _ in records:
+        # Insertion order is kept: the greedy scores sum terms in this order
+        for topic_index, weight in mcq_data['subtopic_weights'].items():
+            subtopic_indices.append(int(topic_index))
+            subtopic_weights.append(weight)
+        subtopic_indptr.append(len(subtopic_indices))
+
+        for topic_index, weight in mcq_data['prerequisites'].items():
+            prereq_indices.append(int(topic_index))
+            prereq_weights.append(weight)
+        prereq_indptr.append(len(prereq_indices))
+
+    breakdowns = [DifficultyBreakdown.from_dict(mcq_data['difficulty_breakdown']) for mcq_data, _, _ in records]
+
+    return {
+        'ids': np.array([mcq_data['id'] for mcq_data, _, _ in records], dtype=str),
+        'main_topics': np.array([mcq_data['main_topic_index'] for mcq_data, _, _ in records], dtype=np.int64),
+        'difficulty': np.array([mcq_data['overall_difficulty'] for mcq_data, _, _ in records], dtype=float),
+        'chapters': np.array([mcq_data.get('chapter') or '' for mcq_data, _, _ in records], dtype=str),
+        'is_parameterized': np.array([bool(mcq_data.get('is_parameterized', False)) for mcq_data, _, _ in records], dtype=bool),
+        'subtopic_indptr': np.array(subtopic_indptr, dtype=np.int64),
+        'subtopic_indices': np.array(subtopic_indices, dtype=np.int64),
+        'subtopic_weights': np.array(subtopic_weights, dtype=float),
+        'prereq_indptr': np.array(prereq_indptr, dtype=np.int64),
+        'prereq_indices': np.array(prereq_indices, dtype=np.int64),
+        'prereq_weights': np.array(prereq_weights, dtype=float),
+        'skill_difficulty': np.array([[getattr(breakdown, skill) for skill in DIFFICULTY_SKILLS] for breakdown in breakdowns],
+                                     dtype=float).reshape(len(records), len(DIFFICULTY_SKILLS)),
+        'record_offsets': np.array([offset for _, offset, _ in records], dtype=np.int64),
+        'record_lengths': np.array([length for _, _, length in records], dtype=np.int64)
+    }
+
+
+def compile_question_bank(mcqs_file: str, output_file: Optional[str] = None) -> str:
+    """
+    Offline step: write the minimal index of an MCQ JSON file as a columnar .npz bank.
+
+    Holds ids, main topics, overall difficulty, subtopic weights and prerequisites in CSR
+    form, the six skill-difficulty columns, and each record's byte span in the JSON so
+    MCQLoader can still build full MCQs on demand. Pass the .npz path to MCQLoader or
+    KnowledgeGraph(mcqs_file=...) to use it. Returns the output path.
+    """
+    output_file = output_file or os.path.splitext(mcqs_file)[0] + '.npz'
+    if not output_file.endswith('.npz'):
+        output_file += '.npz'  # np.savez would add it anyway
+
+    with open(mcqs_file, 'rb') as f:
+        raw_bytes = f.read()
+    records = _scan_mcq_records(raw_bytes)
+
+    columns = _minimal_columns(records)
+
+    np.savez(
+        output_file,
+        format_version=np.array(COMPILED_BANK_VERSION),
+        source_file=np.array(os.path.relpath(mcqs_file, os.path.dirname(os.path.abspath(output_file)))),
+        source_size=np.array(len(raw_bytes)),
+        skill_names=np.array(DIFFICULTY_SKILLS, dtype=str),
+        **columns
+    )
+
+    print(f"✅ Compiled {len(records)} MCQs from {mcqs_file} into {output_file}")
+    return output_file
+
+
+def _encode_parameter_value(value):
+    """JSON form of a generated/calculated parameter value (see _decode_parameter_value)"""
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    if isinstance(value, Fraction):
+        return {'type': 'fraction', 'value': str(value)}
+    if isinstance(value, Basic):
+        return {'type': 'sympy', 'value': sympy.srepr(value)}
+    if isinstance(value, (list, tuple)):
+        return [_encode_parameter_value(item) for item in value]
+    raise TypeError(f"can't store parameter value of type {type(value).__name__} in a variant pool")
+
+
+def _decode_parameter_value(value):
+    """Rebuild a parameter value stored by _encode_parameter_value"""
+    if isinstance(value, list):
+        return [_decode_parameter_value(item) for item in value]
+    if isinstance(value, dict):
+        if value.get('type') == 'fraction':
+            return Fraction(value['value'])
+        if value.get('type') == 'sympy':
+            return sympy.sympify(value['value'])
+        raise ValueError(f"unknown parameter value type {value.get('type')!r}")
+    return value
+
+
+def build_variant_pools(mcqs_file: str, output_file: Optional[str] = None,
+                        variants_per_mcq: int = 32, seed: int = 0) -> str:
+    """
+    Offline step: pre-generate up to variants_per_mcq distinct parameter sets for every
+    parameterized MCQ and render each one (question text, options, option explanations).
+
+    The pools are written to a JSON sidecar next to the question bank; Fraction and SymPy
+    parameter values are stored as tagged strings and rebuilt on load (see
+    _encode_parameter_value). Set mcq_loader.variant_pool_file to it and get_mcq_safely draws a variant
+    instead of generating and rendering parameters on the request path. Returns the output path.
+    """
+    output_file = output_file or os.path.splitext(mcqs_file)[0] + '.variants.json'
+
+    with open(mcqs_file, 'rb') as f:
+        raw_bytes = f.read()
+    records = _scan_mcq_records(raw_bytes)
+
+    rng_state = random.getstate()
+    random.seed(seed)
+    pools = {}
+    try:
+        for mcq_data, _, _ in records:
+            if not mcq_data.get('generated_parameters'):
+                continue
+            mcq = MCQ.from_dict(mcq_data)
+            pool = {}
+            # Small parameter ranges run out of distinct sets; stop after a few misses per variant
+            for _ in range(variants_per_mcq * 4):
+                if len(pool) >= variants_per_mcq:
+                    break
+                params = mcq._generate_parameters()
+                # Only keep sets where every calculated parameter evaluated (no division by zero etc.)
+                if any(name not in params for name, _, code in calculation_plan(mcq.calculated_parameters or {}).steps
+                       if code is not None):
+                    continue
+                key = _render_cache_key(mcq.id, params)
+                if key is None or key in pool:
+                    continue
+                try:
+                    stored_params = {name: _encode_parameter_value(value) for name, value in params.items()}
+                except TypeError:
+                    continue
+                pool[key] = {
+                    'parameters': stored_params,
+                    'text': mcq.generate_question_text(mcq.text, params),
+                    'options': mcq.render_options(params),
+                    'explanations': mcq.render_option_explanations(params),
+                }
+            pools[mcq.id] = list(pool.values())
+    finally:
+        random.setstate(rng_state)
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'format_version': VARIANT_POOL_VERSION,
+            'source_file': os.path.relpath(mcqs_file, os.path.dirname(os.path.abspath(output_file))),
+            'source_size': len(raw_bytes),
+            'variants_per_mcq': variants_per_mcq,
+            'pools': pools,
+        }, f)
+
+    print(f"✅ Pre-rendered {sum(len(pool) for pool in pools.values())} variants of "
+          f"{len(pools)} parameterized MCQs from {mcqs_file} into {output_file}")
+    return output_file
 
 
 @dataclass
@@ -200,7 +813,7 @@ class Node:
     _in_degree: Optional[int] = field(default=None, init=False)  # Cached incoming connections
     _out_degree: Optional[int] = field(default=None, init=False)  # Cached outgoing connections
 
-@dataclass
+@dataclass(slots=True)
 class DifficultyBreakdown:
     """
     Breaks down question difficulty across different cognitive skills.
@@ -243,6 +856,272 @@ class DifficultyBreakdown:
         return cls(conceptual, procedural, problem_solving, communication, memory, spatial)
 
 
+# Skill column order used by MCQColumnStore and compiled banks
+DIFFICULTY_SKILLS = tuple(skill.name for skill in fields(DifficultyBreakdown))
+# Order calculate_skills_difficulty_mismatch sums the skill penalties in
+_SKILL_PENALTY_ORDER = ('problem_solving', 'procedural_fluency', 'conceptual_understanding',
+                        'memory', 'mathematical_communication', 'spatial_reasoning')
+
+
+_INTEGER_LITERAL = re.compile(r'-?(0|[1-9][0-9]*)')
+
+
+def _exact_substitution_values(params: Dict) -> Optional[Dict[str, Any]]:
+    """
+    Parameters as SymPy Integer/Rational values when every one of them is exact (ints,
+    Rationals or integer strings from smart_format_number), else None. Substituting only
+    exact numbers gives the same result however the symbols are bound, so these skip subs().
+    """
+    exact = {}
+    for name, value in params.items():
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, int):
+            exact[name] = Integer(value)
+        elif isinstance(value, Rational):
+            exact[name] = value
+        elif isinstance(value, str) and _INTEGER_LITERAL.fullmatch(value):
+            exact[name] = Integer(int(value))
+        else:
+            return None
+    return exact
+
+
+class _ExactLambdaPrinter(ReprPrinter):
+    """
+    Prints lambdify() bodies as SymPy constructor calls (Add, Mul, Rational(1, 2), ...) so
+    the generated function computes exactly what subs() would; the default Python printer
+    turns rational constants into float divisions.
+    """
+
+    def _print_Symbol(self, expr):
+        return expr.name
+
+
+class CompiledExpression:
+    """
+    A question or subquestion expression parsed once by sympify. substitute(params) returns
+    what expr.subs(params) would, but with exact numeric parameters it binds the expression's
+    symbols directly (through a lambdified function when every symbol gets a value) instead
+    of sympifying every parameter name and value again. subs() substitutes one symbol at a
+    time, which can cancel a singular term (0/0) that binding all at once turns into nan, so
+    non-finite results are recomputed with subs().
+    """
+    __slots__ = ('text', 'expr', 'symbol_names', '_numeric_function')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.expr = sympify(text, locals={'__builtins__': {}})
+        if isinstance(self.expr, Basic):
+            self.symbol_names = tuple(sorted(symbol.name for symbol in self.expr.free_symbols))
+        else:
+            self.symbol_names = None
+        self._numeric_function = None  # lambdify()'d on the first fully numeric substitution
+
+    def _lambdifiable(self) -> bool:
+        # Argument names must be identifiers that don't shadow the SymPy constructors used
+        return all(name.isidentifier() and not keyword.iskeyword(name) and not hasattr(sympy, name)
+                   for name in self.symbol_names)
+
+    def substitute(self, params: Dict):
+        exact = _exact_substitution_values(params) if self.symbol_names is not None else None
+        if exact is None:
+            return self.expr.subs(params)
+        if not self.symbol_names:
+            return self.expr
+        try:
+            if all(name in exact for name in self.symbol_names) and self._lambdifiable():
+                if self._numeric_function is None:
+                    self._numeric_function = lambdify([Symbol(name) for name in self.symbol_names], self.expr,
+                                                      modules=[vars(sympy)], printer=_ExactLambdaPrinter())
+                substituted = self._numeric_function(*[exact[name] for name in self.symbol_names])
+            else:
+                substituted = self.expr.xreplace({Symbol(name): exact[name]
+                                                  for name in self.symbol_names if name in exact})
+        except Exception:
+            return self.expr.subs(params)
+        if substituted.has(S.NaN, S.ComplexInfinity, S.Infinity, S.NegativeInfinity):
+            return self.expr.subs(params)
+        return substituted
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used mapping for the process-wide caches keyed by question content
+    (compiled expressions, calculation plans, sampling counters), so a long-running server
+    keeps the entries in use instead of every one it has ever seen. Capacities come from
+    mcq_loader config when a KnowledgeGraph loads its question bank.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.evictions = 0
+        self._entries: 'OrderedDict[Any, Any]' = OrderedDict()
+
+    def get(self, key, default=None):
+        value = self._entries.get(key, default)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if self.capacity <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def items(self):
+        return self._entries.items()
+
+    def set_capacity(self, capacity: int):
+        """Change the capacity, evicting immediately if it shrank"""
+        self.capacity = capacity
+        self._evict()
+
+    def clear(self):
+        self._entries.clear()
+
+    def _evict(self):
+        while len(self._entries) > max(self.capacity, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+# {expression text: CompiledExpression or the exception sympify raised}
+_COMPILED_EXPRESSIONS = LRUCache(4096)
+
+
+def compile_expression(text: str) -> CompiledExpression:
+    """Parse an expression once (while it stays cached); parse errors are cached and re-raised too"""
+    compiled = _COMPILED_EXPRESSIONS.get(text)
+    if compiled is None:
+        try:
+            compiled = CompiledExpression(text)
+        except Exception as e:
+            compiled = e
+        _COMPILED_EXPRESSIONS[text] = compiled
+    if isinstance(compiled, Exception):
+        raise compiled.with_traceback(None)
+    return compiled
+
+
+def _canonical_parameter_value(value):
+    """Hashable form of a generated parameter value that keeps its type (1, 1.0 and True render differently)"""
+    if isinstance(value, dict):
+        return ('dict', tuple(sorted(((key, _canonical_parameter_value(item)) for key, item in value.items()), key=repr)))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_canonical_parameter_value(item) for item in value))
+    return (type(value).__name__, value)
+
+
+def _render_cache_key(cache_id, params: Dict) -> Optional[Tuple]:
+    """(cache_id, canonical parameter tuple), or None if the parameters can't be hashed"""
+    try:
+        key = (cache_id, tuple(sorted((name, _canonical_parameter_value(value)) for name, value in params.items())))
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class MCQRenderCache:
+    """
+    Bounded LRU of rendered parameterized MCQs keyed by (MCQ.render_cache_id, canonical
+    parameter tuple). The cache id pairs the MCQ id with a fingerprint of its content, so an
+    MCQ edited or reloaded under the same id never gets another version's renders. Each entry holds the parts rendered so far: 'text', 'options' and 'explanations'.
+    Integer parameters come from small ranges, so the same combinations recur across
+    students and a hit skips the whole SymPy/latex pipeline.
+    """
+
+    PARTS = ('text', 'options', 'explanations')
+
+    def __init__(self, capacity: int = 2048):
+        self.capacity = capacity
+        self._entries: 'OrderedDict[Tuple, Dict[str, Any]]' = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'uncacheable': 0}
+        self._part_stats = {part: {'hits': 0, 'misses': 0} for part in self.PARTS}
+
+    def get_or_render(self, cache_id: Optional[Tuple], params: Dict, part: str, render):
+        """Return the cached part for these parameters, calling render() on a miss"""
+        key = _render_cache_key(cache_id, params)
+        if cache_id is None or key is None or self.capacity <= 0:
+            self._stats['uncacheable'] += 1
+            return render()
+
+        entry = self._entries.get(key)
+        if entry is not None and part in entry:
+            self._stats['hits'] += 1
+            self._part_stats[part]['hits'] += 1
+            self._entries.move_to_end(key)
+            rendered = entry[part]
+        else:
+            self._stats['misses'] += 1
+            self._part_stats[part]['misses'] += 1
+            rendered = render()
+            if entry is None:
+                entry = self._entries[key] = {}
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+            else:
+                self._entries.move_to_end(key)
+            entry[part] = rendered
+        # Callers get their own option/explanation lists
+        return list(rendered) if isinstance(rendered, list) else rendered
+
+    def store(self, cache_id: Optional[Tuple], params: Dict, parts: Dict[str, Any]):
+        """Seed the cache with already rendered parts (pre-rendered variants)"""
+        key = _render_cache_key(cache_id, params)
+        if cache_id is None or key is None or self.capacity <= 0:
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = {}
+        else:
+            self._entries.move_to_end(key)
+        entry.update({part: list(rendered) if isinstance(rendered, list) else rendered
+                      for part, rendered in parts.items()})
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def set_capacity(self, capacity: int):
+        """Change the LRU capacity, evicting immediately if it shrank"""
+        self.capacity = capacity
+        while len(self._entries) > max(capacity, 0):
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """Hit rates overall and per part, for sizing mcq_loader.render_cache_size"""
+        lookups = self._stats['hits'] + self._stats['misses']
+        part_hit_rates = {}
+        for part, counts in self._part_stats.items():
+            part_lookups = counts['hits'] + counts['misses']
+            part_hit_rates[part] = counts['hits'] / part_lookups if part_lookups else 0.0
+        return {
+            'render_cache_entries': len(self._entries),
+            'render_cache_capacity': self.capacity,
+            'render_cache_hits': self._stats['hits'],
+            'render_cache_misses': self._stats['misses'],
+            'render_cache_evictions': self._stats['evictions'],
+            'render_cache_uncacheable': self._stats['uncacheable'],
+            'render_cache_hit_rate': self._stats['hits'] / lookups if lookups else 0.0,
+            'render_cache_hit_rate_by_part': part_hit_rates,
+        }
+
+
+# Shared by every MCQ object in the process, so reloading an evicted MCQ keeps its renders
+RENDER_CACHE = MCQRenderCache()
+
+
 @dataclass
 class BreakdownStep:
     """Represents a single step in a question breakdown"""
@@ -336,8 +1215,6 @@ class BreakdownStep:
             for placeholder, format_type in placeholders:
                 if placeholder in result_text:
                     try:
-                        local_namespace = {'__builtins__': {}}
-
                         # Create SymPy-safe parameter dictionary
                         # Only include numeric parameters
                         sympy_safe_params = {}
@@ -387,11 +1264,8 @@ class BreakdownStep:
                         # Handle equations separately
                         if '=' in self.parent_question_expression:
                             left_side, right_side = self.parent_question_expression.split('=', 1)
-                            left_expr = sympify(left_side.strip(), locals=local_namespace)
-                            right_expr = sympify(right_side.strip(), locals=local_namespace)
-
-                            left_sub = left_expr.subs(sympy_safe_params)
-                            right_sub = right_expr.subs(sympy_safe_params)
+                            left_sub = compile_expression(left_side.strip()).substitute(sympy_safe_params)
+                            right_sub = compile_expression(right_side.strip()).substitute(sympy_safe_params)
 
                             # Apply format
                             if format_type == 'expanded':
@@ -422,11 +1296,10 @@ class BreakdownStep:
                         else:
                             if self.parent_question_expression in params:
                                 # This is a parameter name that should be substituted
-                                expr = symbols(self.parent_question_expression)
+                                substituted = symbols(self.parent_question_expression).subs(sympy_safe_params)
                             else:
-                                # This is a mathematical expression to be parsed
-                                expr = sympify(self.parent_question_expression, locals=local_namespace)
-                            substituted = expr.subs(sympy_safe_params)
+                                # This is a mathematical expression, parsed once and cached
+                                substituted = compile_expression(self.parent_question_expression).substitute(sympy_safe_params)
                             if format_type == 'expanded':
                                 processed = expand(substituted)
                             elif format_type == 'factored':
@@ -494,8 +1367,6 @@ class BreakdownStep:
             for placeholder, format_type in subq_placeholders:
                 if placeholder in result_text:
                     try:
-                        local_namespace = {'__builtins__': {}}
-
                         # Create SymPy-safe parameter dictionary
                         # Only include numeric parameters
                         sympy_safe_params = {}
@@ -542,11 +1413,8 @@ class BreakdownStep:
                         # Handle equations separately
                         if '=' in self.subquestion_expression:
                             left_side, right_side = self.subquestion_expression.split('=', 1)
-                            left_expr = sympify(left_side.strip(), locals=local_namespace)
-                            right_expr = sympify(right_side.strip(), locals=local_namespace)
-
-                            left_sub = left_expr.subs(sympy_safe_params)
-                            right_sub = right_expr.subs(sympy_safe_params)
+                            left_sub = compile_expression(left_side.strip()).substitute(sympy_safe_params)
+                            right_sub = compile_expression(right_side.strip()).substitute(sympy_safe_params)
 
                             # Apply format
                             if format_type == 'expanded':
@@ -577,11 +1445,10 @@ class BreakdownStep:
                         else:
                             if self.subquestion_expression in params:
                                 # This is a parameter name that should be substituted
-                                expr = symbols(self.subquestion_expression)
+                                substituted = symbols(self.subquestion_expression).subs(sympy_safe_params)
                             else:
-                                # This is a mathematical expression to be parsed
-                                expr = sympify(self.subquestion_expression, locals=local_namespace)
-                            substituted = expr.subs(sympy_safe_params)
+                                # This is a mathematical expression, parsed once and cached
+                                substituted = compile_expression(self.subquestion_expression).substitute(sympy_safe_params)
                             if format_type == 'expanded':
                                 processed = expand(substituted)
                             elif format_type == 'factored':
@@ -628,8 +1495,6 @@ class BreakdownStep:
         from sympy import sympify, expand, factor, simplify, collect, symbols, latex, Rational
 
         try:
-            local_namespace = {'__builtins__': {}}
-
             # FIXED: Use the SAME logic as generate_question_text
             # Create SymPy-safe parameters (same as existing code)
             sympy_safe_params = {}
@@ -644,15 +1509,13 @@ class BreakdownStep:
                     continue
 
             #  Use the same parameter vs expression check as generate_question_text
+            # Apply parameter substitution
             if expression in params:
                 # This is a parameter name that should be substituted
-                expr = symbols(expression)
+                substituted = symbols(expression).subs(sympy_safe_params)
             else:
-                # This is a mathematical expression to be parsed
-                expr = sympify(expression, locals=local_namespace)
-
-            # Apply parameter substitution
-            substituted = expr.subs(sympy_safe_params)
+                # This is a mathematical expression, parsed once and cached
+                substituted = compile_expression(expression).substitute(sympy_safe_params)
 
             # Apply format transformation (same as existing code)
             if format_type == 'expanded':
@@ -753,22 +1616,19 @@ class BreakdownStep:
         """Calculate step-specific parameters"""
         calc_params = {}
 
-        for calc_name, calc_expr in self.all_calculated_parameters.items():
+        # Safe namespace with parent parameters, plus each step parameter as it is calculated
+        safe_namespace = MCQ.create_safe_math_namespace(self.parent_params)
+        for calc_name, calc_expr, code in calculation_plan(self.all_calculated_parameters).steps:
             try:
-                if calc_name == calc_expr:
+                if code is None:
                     continue
 
-                # Create safe namespace with parent parameters
-                safe_namespace = MCQ.create_safe_math_namespace({
-                    **self.parent_params,
-                    **calc_params
-                })
-                calc_result = eval(calc_expr, safe_namespace)
-                calc_params[calc_name] = calc_result
+                calc_params[calc_name] = _evaluate_calculation(code, safe_namespace)
 
             except Exception as e:
                 print(f"⚠️ Failed to calculate step parameter {calc_name}: {e}")
                 calc_params[calc_name] = 0
+            safe_namespace[calc_name] = calc_params[calc_name]
 
         return calc_params
 
@@ -847,6 +1707,242 @@ class BreakdownStep:
         return substituted
 
 
+# Largest product of domain sizes a group of exclude-linked parameters is enumerated jointly for
+_JOINT_DOMAIN_LIMIT = 4096
+
+
+# Functions and constants calculated parameters and option expressions may use, built once per
+# process; MCQ.create_safe_math_namespace copies it and adds the parameters
+_SAFE_MATH_NAMESPACE = MappingProxyType({
+    '__builtins__': {},
+    # Math functions
+    'sqrt': lambda x: x**0.5,
+    'round': round,
+    'int': int,
+    'float': float,
+    'sum': sum,
+    'len': len,
+
+    # Basic arithmetic & comparison
+    'abs': Abs, 'max': max, 'min': min, 'round': round,
+
+    # Number theory
+    'gcd': gcd, 'lcm': lcm, 'factorial': factorial,
+    'isprime': isprime, 'factorint': factorint,
+    'floor': floor, 'ceiling': ceiling, 'mod': Mod,
+
+    # Calculus
+    'diff': diff, 'integrate': integrate, 'limit': limit,
+    'solve': solve, 'roots': roots,
+
+    # Trigonometry
+    'sin': sin, 'cos': cos, 'tan': tan,
+    'asin': asin, 'acos': acos, 'atan': atan,
+    'sec': sec, 'csc': csc, 'cot': cot,
+
+    # Constants
+    'pi': pi, 'e': E,
+
+    # Logarithms & exponentials
+    'log': log, 'ln': log, 'exp': exp,
+    'sqrt': sqrt, 'pow': pow,
+
+    # Rational functions
+    'cancel': cancel,
+})
+
+
+def _code_names(code) -> Set[str]:
+    """Global names a compiled expression reads, including inside comprehensions and lambdas"""
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if hasattr(constant, 'co_names'):
+            names |= _code_names(constant)
+    return names
+
+
+class CalculationPlan:
+    """
+    A calculated_parameters block compiled once. steps holds (name, source, code) with each
+    parameter after the calculated parameters its expression reads (written order otherwise,
+    and for cycles). code is None for a self-referential entry (name == source), which callers
+    skip, and the compile error for a source that doesn't compile (see _evaluate_calculation).
+    """
+    __slots__ = ('steps',)
+
+    def __init__(self, calculated_parameters: Dict[str, str]):
+        compiled, dependencies = {}, {}
+        for name, source in calculated_parameters.items():
+            compiled[name], dependencies[name] = None, set()
+            if name == source:
+                continue
+            try:
+                compiled[name] = compile(source, '<string>', 'eval')
+            except Exception as e:
+                compiled[name] = e
+                continue
+            dependencies[name] = (_code_names(compiled[name]) & calculated_parameters.keys()) - {name}
+
+        order, remaining = [], list(calculated_parameters)
+        while remaining:
+            pending = set(remaining)
+            ready = next((name for name in remaining if not dependencies[name] & pending), None)
+            if ready is None:
+                order.extend(remaining)
+                break
+            order.append(ready)
+            remaining.remove(ready)
+
+        self.steps: List[Tuple[str, str, Any]] = [(name, calculated_parameters[name], compiled[name]) for name in order]
+
+
+# {tuple(calculated_parameters.items()): CalculationPlan}, shared by every MCQ and breakdown step
+_CALCULATION_PLANS = LRUCache(4096)
+
+
+def calculation_plan(calculated_parameters: Dict[str, str]) -> CalculationPlan:
+    """The compiled CalculationPlan of a calculated_parameters block, built once while it stays cached"""
+    try:
+        key = tuple(calculated_parameters.items())
+        plan = _CALCULATION_PLANS.get(key)
+    except TypeError:
+        return CalculationPlan(calculated_parameters)
+    if plan is None:
+        plan = CalculationPlan(calculated_parameters)
+        _CALCULATION_PLANS[key] = plan
+    return plan
+
+
+def _evaluate_calculation(code, namespace: Dict, local_namespace: Optional[Dict] = None):
+    """eval() a CalculationPlan step, raising its compile error as eval(source) would have"""
+    if isinstance(code, Exception):
+        raise code.with_traceback(None)
+    return eval(code, namespace, local_namespace)
+
+
+class ParameterDomains:
+    """
+    Sampling domains of an MCQ's generated_parameters, built once per MCQ.
+
+    values: the allowed values of each int parameter (range minus numeric excludes) and each
+    choice parameter (choices minus numeric/list excludes), for random.choice.
+    joint: parameters tied together by excludes naming each other ('exclude': 'a') are drawn
+    as one tuple from their precomputed allowed combinations, {name: (position, combinations)}.
+    That is the distribution the rejection loop produced, without the rejected attempts.
+    links: for linked groups too large to enumerate, the parameters each one must differ
+    from; they are sampled in order, each skipping the values already drawn.
+    invalid: why no attempt can ever succeed (empty range, no choices), or None.
+    """
+    __slots__ = ('values', 'joint', 'links', 'invalid')
+
+    def __init__(self, generated_parameters: Dict[str, Dict]):
+        self.values: Dict[str, list] = {}
+        self.joint: Dict[str, Tuple[int, list]] = {}
+        self.links: Dict[str, Tuple[str, ...]] = {}
+        self.invalid: Optional[str] = None
+
+        references = []
+        for param_name, config in generated_parameters.items():
+            exclude = config.get('exclude')
+            if isinstance(exclude, str):
+                if exclude in generated_parameters and exclude != param_name:
+                    references.append((param_name, exclude))
+                exclude = []  # References are not value exclusions
+            elif exclude is None:
+                exclude = []
+            elif not isinstance(exclude, list):
+                exclude = [exclude]
+
+            try:
+                if config.get('type') == 'int':
+                    if config['min'] > config['max']:
+                        self.invalid = f"Invalid range for {param_name}: min={config['min']} > max={config['max']}"
+                        continue
+                    values = [x for x in range(config['min'], config['max'] + 1) if x not in exclude]
+                    if not values:
+                        self.invalid = f"No valid values for parameter {param_name}"
+                    self.values[param_name] = values
+                elif config.get('type') == 'choice':
+                    if not config.get('choices'):
+                        self.invalid = f"No choices provided for parameter {param_name}"
+                        continue
+                    values = [choice for choice in config['choices'] if choice not in exclude]
+                    if not values:
+                        self.invalid = f"No valid choices for parameter {param_name}"
+                    self.values[param_name] = values
+            except Exception as e:
+                self.invalid = f"Error generating parameter {param_name}: {e}"
+
+        # Only references between int/choice parameters are resolved here; others stay post-checks
+        links: Dict[str, List[str]] = {}
+        for param_name, exclude in references:
+            if param_name in self.values and exclude in self.values:
+                links.setdefault(param_name, []).append(exclude)
+                links.setdefault(exclude, []).append(param_name)
+
+        seen = set()
+        for start in links:
+            if start in seen:
+                continue
+            group, stack = [], [start]
+            seen.add(start)
+            while stack:
+                param_name = stack.pop()
+                group.append(param_name)
+                for linked in links[param_name]:
+                    if linked not in seen:
+                        seen.add(linked)
+                        stack.append(linked)
+            group.sort(key=list(generated_parameters).index)
+
+            if math.prod(len(self.values[param_name]) for param_name in group) > _JOINT_DOMAIN_LIMIT:
+                for param_name in group:
+                    self.links[param_name] = tuple(links[param_name])
+                continue
+            position = {param_name: i for i, param_name in enumerate(group)}
+            pairs = [(position[param_name], position[exclude]) for param_name, exclude in references
+                     if param_name in position]
+            combinations = [combination for combination in itertools.product(*(self.values[param_name] for param_name in group))
+                            if all(combination[i] != combination[j] for i, j in pairs)]
+            if not combinations:
+                self.invalid = f"No values of {', '.join(group)} satisfy their exclude constraints"
+            for param_name in group:
+                self.joint[param_name] = (position[param_name], combinations)
+
+
+# {mcq_id: counters} of _generate_parameters, kept across MCQ objects for the most recently
+# sampled MCQs (see get_parameter_sampling_stats)
+_PARAMETER_SAMPLING_STATS = LRUCache(4096)
+
+
+def _parameter_sampling_stats(mcq_id: Optional[str]) -> Dict[str, int]:
+    stats = _PARAMETER_SAMPLING_STATS.get(mcq_id)
+    if stats is None:
+        stats = {'calls': 0, 'attempts': 0, 'accepted': 0, 'rejections': 0, 'fallbacks': 0}
+        _PARAMETER_SAMPLING_STATS[mcq_id] = stats
+    return stats
+
+
+def get_parameter_sampling_stats(min_calls: int = 1) -> List[Dict[str, Any]]:
+    """
+    Per-MCQ parameter sampling statistics, worst acceptance rate first.
+    acceptance_rate is accepted parameter sets per attempt; rejections count attempts failed
+    by exclude constraints and fallbacks calls that ended in _generate_fallback_parameters.
+    """
+    report = []
+    for mcq_id, stats in _PARAMETER_SAMPLING_STATS.items():
+        if stats['calls'] < min_calls:
+            continue
+        report.append({
+            'mcq_id': mcq_id,
+            **stats,
+            'acceptance_rate': stats['accepted'] / stats['attempts'] if stats['attempts'] else 0.0,
+            'attempts_per_call': stats['attempts'] / stats['calls'],
+        })
+    report.sort(key=lambda entry: (entry['acceptance_rate'], -entry['calls']))
+    return report
+
+
 @dataclass
 class MCQ:
     text: str  # Question text (may include LaTeX math)
@@ -870,49 +1966,14 @@ class MCQ:
     # Cache for generated parameters (not saved to JSON)
     _current_params: Optional[Dict] = field(default=None, init=False)
     _is_parameterized: Optional[bool] = field(default=None, init=False)
+    _parameter_domains: Optional['ParameterDomains'] = field(default=None, init=False, repr=False)
 
     breakdown: Optional[Dict[str, Dict]] = None
 
     @staticmethod
     def create_safe_math_namespace(base_params: Dict = None) -> Dict:
-        """Create a standardized safe namespace with common math functions"""
-        safe_namespace = {
-            '__builtins__': {},
-            # Math functions
-            'sqrt': lambda x: x**0.5,
-            'round': round,
-            'int': int,
-            'float': float,
-            'sum': sum,
-            'len': len,
-
-        # Basic arithmetic & comparison
-        'abs': Abs, 'max': max, 'min': min, 'round': round,
-
-        # Number theory
-        'gcd': gcd, 'lcm': lcm, 'factorial': factorial,
-        'isprime': isprime, 'factorint': factorint,
-        'floor': floor, 'ceiling': ceiling, 'mod': Mod,
-
-        # Calculus
-        'diff': diff, 'integrate': integrate, 'limit': limit,
-        'solve': solve, 'roots': roots,
-
-        # Trigonometry
-        'sin': sin, 'cos': cos, 'tan': tan,
-        'asin': asin, 'acos': acos, 'atan': atan,
-        'sec': sec, 'csc': csc, 'cot': cot,
-
-        # Constants
-        'pi': pi, 'e': E,
-
-        # Logarithms & exponentials
-        'log': log, 'ln': log, 'exp': exp,
-        'sqrt': sqrt, 'pow': pow,
-
-        # Rational functions
-        'cancel': cancel,
-        }
+        """Create a standardized safe namespace with common math functions (a copy of _SAFE_MATH_NAMESPACE)"""
+        safe_namespace = dict(_SAFE_MATH_NAMESPACE)
         if base_params:
             safe_namespace.update(base_params)
 
@@ -985,52 +2046,60 @@ class MCQ:
             breakdown=breakdown
         )
     def _generate_parameters(self) -> Dict:
-        """Generates random parameters for questions based on constraints"""
+        """
+        Generates random parameters for questions based on constraints.
+        int and choice domains come precomputed from ParameterDomains, and excludes that name
+        another parameter are resolved while sampling, so only the remaining constraints
+        (on other parameter types) can reject an attempt.
+        """
         if not self.generated_parameters:
             return {}
 
+        domains = self._parameter_domains
+        if domains is None:
+            domains = self._parameter_domains = ParameterDomains(self.generated_parameters)
+        stats = _parameter_sampling_stats(self.id)
+        stats['calls'] += 1
+
+        if domains.invalid:
+            # Same outcome as 100 failed attempts, without making them
+            print(f"Warning: {domains.invalid}")
+            stats['fallbacks'] += 1
+            return self._generate_fallback_parameters()
+
         for attempt in range(100):  # Try up to 100 times
+            stats['attempts'] += 1
             params = {}
+            joint_draws = {}  # id(combinations) -> the combination drawn for that linked group
             success = True
 
-            # generate all parameters, then check constraints
+            # generate all parameters, then check the remaining constraints
             for param_name, config in self.generated_parameters.items():
                 try:
-                    if config['type'] == 'int':
-                        # VALIDATE: Check for invalid range
-                        if config['min'] > config['max']:
-
-                            print(f"Warning: Invalid range for {param_name}: min={config['min']} > max={config['max']}")
-                            success = False
-                            break
-                        min_val = config['min']
-                        max_val = config['max']
-                        exclude = config.get('exclude', [])
-
-                        # Handle single exclude value
-                        if not isinstance(exclude, list):
-                            exclude = [exclude]
-
-                        # Generate valid values
-                        valid_values = [x for x in range(min_val, max_val + 1) if x not in exclude]
-
-                        if not valid_values:
-                            raise ValueError(f"No valid values for parameter {param_name}")
-
-                        params[param_name] = random.choice(valid_values)
+                    values = domains.values.get(param_name)
+                    if param_name in domains.joint:
+                        # Linked int / choice parameters: one draw for the whole group
+                        position, combinations = domains.joint[param_name]
+                        if id(combinations) not in joint_draws:
+                            joint_draws[id(combinations)] = random.choice(combinations)
+                        params[param_name] = joint_draws[id(combinations)][position]
+
+                    elif values is not None:
+                        # int / choice: draw from the precomputed domain minus linked parameters' values
+                        taken = [params[linked] for linked in domains.links.get(param_name, ()) if linked in params]
+                        if taken:
+                            values = [value for value in values if value not in taken]
+                            if not values:
+                                stats['rejections'] += 1
+                                success = False
+                                break
+                        params[param_name] = random.choice(values)
 
                     elif config['type'] == 'float':
                         min_val = config['min']
                         max_val = config['max']
                         params[param_name] = random.uniform(min_val, max_val)
 
-                    elif config['type'] == 'choice':
-                        if not config.get('choices'):
-                            print(f"Warning: No choices provided for parameter {param_name}")
-                            success = False
-                            break
-                        params[param_name] = random.choice(config['choices'])
-
                     elif config['type'] == 'fraction':
                         # Fraction type
                         fraction_value = self._generate_fraction_parameter(config)
@@ -1108,24 +2177,23 @@ class MCQ:
                             break
 
             if not all_constraints_met:
+                stats['rejections'] += 1
                 continue  # Try again
 
-            # Calculate derived parameters
+            # Calculate derived parameters, from code compiled once per expression
             try:
                 if self.calculated_parameters:
-                    for calc_name, calc_expr in self.calculated_parameters.items():
+                    safe_namespace = MCQ.create_safe_math_namespace(params)
+                    for calc_name, calc_expr, code in calculation_plan(self.calculated_parameters).steps:
                         try:
                             # Check for self-referential calculated parameters (common bug)
-                            if calc_name == calc_expr:
+                            if code is None:
                                 print(f"Warning: Self-referential calculated parameter: {calc_name} = {calc_expr}")
                                 continue
 
-                            # Create safe evaluation environment
-                            local_namespace = {'__builtins__': {}}
-
-                            safe_namespace = MCQ.create_safe_math_namespace({**params})
-                            calc_result = eval(calc_expr, {"__builtins__": {}}, safe_namespace)
+                            calc_result = _evaluate_calculation(code, {"__builtins__": {}}, safe_namespace)
                             params[calc_name] = calc_result
+                            safe_namespace[calc_name] = calc_result
                         except Exception as e:
                             print(f"Warning: Error calculating parameter {calc_name} with expression '{calc_expr}': {e}")
                             # For debugging: show available parameters
@@ -1134,6 +2202,7 @@ class MCQ:
                             # Skip this calculated parameter rather than failing entirely
                             continue
 
+                stats['accepted'] += 1
                 return params
 
             except Exception as e:
@@ -1141,6 +2210,7 @@ class MCQ:
 
         # If we get here, we failed to generate valid parameters
         print("Warning: Could not generate valid parameters after 100 attempts")
+        stats['fallbacks'] += 1
         return self._generate_fallback_parameters()
 
     def _generate_fraction_parameter(self, config: Dict[str, Any]) -> Fraction:
@@ -1561,8 +2631,6 @@ class MCQ:
             for placeholder, format_type in placeholders:
                 if placeholder in result_text:
                     try:
-                        local_namespace = {'__builtins__': {}}
-
                         # Create SymPy-safe parameter dictionary
                         # Only include numeric parameters
                         sympy_safe_params = {}
@@ -1609,11 +2677,8 @@ class MCQ:
                         # Handle equations separately
                         if '=' in self.question_expression:
                             left_side, right_side = self.question_expression.split('=', 1)
-                            left_expr = sympify(left_side.strip(), locals=local_namespace)
-                            right_expr = sympify(right_side.strip(), locals=local_namespace)
-
-                            left_sub = left_expr.subs(sympy_safe_params)
-                            right_sub = right_expr.subs(sympy_safe_params)
+                            left_sub = compile_expression(left_side.strip()).substitute(sympy_safe_params)
+                            right_sub = compile_expression(right_side.strip()).substitute(sympy_safe_params)
 
                             # Apply format
                             if format_type == 'expanded':
@@ -1644,11 +2709,10 @@ class MCQ:
                         else:
                             if self.question_expression in params:
                                 # This is a parameter name that should be substituted
-                                expr = symbols(self.question_expression)
+                                substituted = symbols(self.question_expression).subs(sympy_safe_params)
                             else:
-                                # This is a mathematical expression to be parsed
-                                expr = sympify(self.question_expression, locals=local_namespace)
-                            substituted = expr.subs(sympy_safe_params)
+                                # This is a mathematical expression, parsed once and cached
+                                substituted = compile_expression(self.question_expression).substitute(sympy_safe_params)
                             if format_type == 'expanded':
                                 processed = expand(substituted)
                             elif format_type == 'factored':
@@ -1700,21 +2764,18 @@ class MCQ:
             # Step 1: Calculate derived parameters
             calc = {}
             if self.calculated_parameters:
-                for calc_name, calc_expr in self.calculated_parameters.items():
+                safe_namespace = MCQ.create_safe_math_namespace(params)
+                for calc_name, calc_expr, code in calculation_plan(self.calculated_parameters).steps:
                     try:
-                        if calc_name == calc_expr:
+                        if code is None:
                             continue
 
-                        safe_namespace =MCQ.create_safe_math_namespace({
-                            **params,
-                            **calc
-                        })
-                        calc_result = eval(calc_expr, safe_namespace)
-                        calc[calc_name] = calc_result
+                        calc[calc_name] = _evaluate_calculation(code, safe_namespace)
 
                     except Exception as e:
                         print(f"⚠️ Failed to calculate {calc_name}: {e}")
                         calc[calc_name] = 0
+                    safe_namespace[calc_name] = calc[calc_name]
 
             all_params = {**params, **calc}
 
@@ -1854,7 +2915,8 @@ class MCQ:
         if self.is_parameterized:
             if self._current_params is None:
                 self._current_params = self._generate_parameters()
-            return self.render_option_explanations(self._current_params)
+            return RENDER_CACHE.get_or_render(self.render_cache_id, self._current_params, 'explanations',
+                                              lambda: self.render_option_explanations(self._current_params))
         return self.option_explanations
 
     def render_option_explanations(self, params: Dict) -> List[str]:
@@ -1866,21 +2928,18 @@ class MCQ:
             # Step 1: Calculate derived parameters
             calc = {}
             if self.calculated_parameters:
-                for calc_name, calc_expr in self.calculated_parameters.items():
+                safe_namespace = MCQ.create_safe_math_namespace(params)
+                for calc_name, calc_expr, code in calculation_plan(self.calculated_parameters).steps:
                     try:
-                        if calc_name == calc_expr:
+                        if code is None:
                             continue
 
-                        safe_namespace = MCQ.create_safe_math_namespace({
-                            **params,
-                            **calc
-                        })
-                        calc_result = eval(calc_expr, safe_namespace)
-                        calc[calc_name] = calc_result
+                        calc[calc_name] = _evaluate_calculation(code, safe_namespace)
 
                     except Exception as e:
                         print(f"⚠️ Failed to calculate {calc_name}: {e}")
                         calc[calc_name] = 0
+                    safe_namespace[calc_name] = calc[calc_name]
 
             all_params = {**params, **calc}
 
@@ -1971,7 +3030,8 @@ class MCQ:
         if self.is_parameterized:
             if self._current_params is None:
                 self._current_params = self._generate_parameters()
-            return self.generate_question_text(self.text, self._current_params)
+            return RENDER_CACHE.get_or_render(self.render_cache_id, self._current_params, 'text',
+                                              lambda: self.generate_question_text(self.text, self._current_params))
         return self.text
 
     @property
@@ -1980,9 +3040,20 @@ class MCQ:
         if self.is_parameterized:
             if self._current_params is None:
                 self._current_params = self._generate_parameters()
-            return self.render_options(self._current_params)
+            return RENDER_CACHE.get_or_render(self.render_cache_id, self._current_params, 'options',
+                                              lambda: self.render_options(self._current_params))
         return self.options
 
+    @property
+    def render_cache_id(self) -> Optional[Tuple]:
+        """(id, content fingerprint) for RENDER_CACHE; None for MCQs without an id"""
+        if self.id is None:
+            return None
+        calculated = self.calculated_parameters or {}
+        fingerprint = hash((self.text, tuple(self.options or ()), tuple(self.option_explanations or ()),
+                            tuple(sorted(calculated.items())), self.question_expression))
+        return (self.id, fingerprint)
+
     @property
     def is_parameterized(self) -> bool:
         """Check if this MCQ uses parameterization"""
@@ -2096,6 +3167,15 @@ class MCQ:
         """Force regeneration of parameters"""
         self._current_params = None
 
+    def use_variant(self, variant: Dict):
+        """Adopt a pre-rendered variant (see build_variant_pools) as the current parameters"""
+        self._current_params = dict(variant['parameters'])
+        RENDER_CACHE.store(self.render_cache_id, self._current_params, {
+            'text': variant['text'],
+            'options': variant['options'],
+            'explanations': variant['explanations'],
+        })
+
     def get_current_parameters_safe(self) -> Dict[str, Union[int, float]]:
         """Get current parameter values with guaranteed consistency"""
         if self.is_parameterized:
@@ -2150,12 +3230,75 @@ class StudentAttempt:
     time_taken: float  # seconds
 
 
+def _config_field(path: str, default):
+    """ConfigSnapshot field read from a dot-notation config path"""
+    return field(default=default, metadata={'path': path})
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Immutable, typed copy of the configuration values read in the scheduler's hot loops.
+    ConfigurationManager rebuilds it on load and on every reload(); version goes up each
+    time, so caches derived from config values can tell when they are stale.
+    """
+    version: int = 0
+    mastery_threshold: float = _config_field('algorithm_config.mastery_threshold', 0.7)
+    greedy_convergence_threshold: float = _config_field('algorithm_config.greedy_convergence_threshold', 0.05)
+    greedy_priority_weight: float = _config_field('greedy_algorithm.greedy_priority_weight', 2.0)
+    greedy_subtopic_weight: float = _config_field('greedy_algorithm.greedy_subtopic_weight', 0.7)
+    greedy_prereq_weight: float = _config_field('greedy_algorithm.greedy_prereq_weight', 0.5)
+    greedy_importance_weight: float = _config_field('greedy_algorithm.greedy_importance_weight', 0.3)
+    greedy_difficulty_penalty: float = _config_field('greedy_algorithm.greedy_difficulty_penalty', 1.5)
+    greedy_too_easy_penalty: float = _config_field('greedy_algorithm.greedy_too_easy_penalty', 1.5)
+    skills_breakdown_weight: float = _config_field('greedy_algorithm.skills_breakdown_weight', 2.0)
+    overall_difficulty_weight: float = _config_field('greedy_algorithm.overall_difficulty_weight', 1.0)
+    greedy_max_mcqs_to_evaluate: int = _config_field('greedy_algorithm.greedy_max_mcqs_to_evaluate', 50)
+    greedy_early_stopping: bool = _config_field('greedy_algorithm.greedy_early_stopping', False)
+    enable_virtual_area_effects: bool = _config_field('greedy_algorithm.enable_virtual_area_effects', True)
+    greedy_engine: str = _config_field('greedy_algorithm.greedy_engine', 'loop')
+    confidence_cap: float = _config_field('confidence_algorithm.confidence_cap', 0.8)
+    difficulty_reduction_factor: float = _config_field('confidence_algorithm.difficulty_reduction_factor', 0.5)
+    min_difficulty_penalty: float = _config_field('confidence_algorithm.min_difficulty_penalty', 0.1)
+
+    # algorithm_config.skill_difficulty_weights, resolved per skill as calculate_skills_difficulty_mismatch reads it
+    skill_student_offset: float = 0.1
+    skill_penalty_weights: Mapping = field(default_factory=dict)
+
+    @classmethod
+    def from_config(cls, config_manager: 'ConfigurationManager', version: int) -> 'ConfigSnapshot':
+        values = {snapshot_field.name: config_manager.get(snapshot_field.metadata['path'], snapshot_field.default)
+                  for snapshot_field in fields(cls) if 'path' in snapshot_field.metadata}
+
+        skill_weights = config_manager.get('algorithm_config.skill_difficulty_weights', {
+            'problem_solving_penalty': 0.0,
+            'procedural_penalty': 0.0,
+            'conceptual_penalty': 0.0,
+            'memory_penalty': 0.0,
+            'communication_penalty': 0.0,
+            'spatial_penalty': 0.0,
+            'student_offset': 0.0
+        })
+        values['skill_student_offset'] = skill_weights.get('student_offset', 0.1)
+        values['skill_penalty_weights'] = MappingProxyType({
+            'problem_solving': skill_weights.get('problem_solving_penalty', 0.2),
+            'procedural_fluency': skill_weights.get('procedural_penalty', 0.15),
+            'conceptual_understanding': skill_weights.get('conceptual_penalty', 0.15),
+            'memory': skill_weights.get('memory_penalty', 0.1),
+            'mathematical_communication': skill_weights.get('communication_penalty', 0.1),
+            'spatial_reasoning': skill_weights.get('spatial_penalty', 0.1)
+        })
+        return cls(version=version, **values)
+
+
 class ConfigurationManager:
     """Simple configuration manager that uses JSON values directly"""
 
     def __init__(self, config_file: str = 'config.json'):
         self.config_file = config_file
         self.config = self._load_config_file()
+        self.version = 0
+        self.snapshot = ConfigSnapshot.from_config(self, self.version)
 
     def _load_config_file(self) -> Dict:
         """Load configuration from JSON file"""
@@ -2193,15 +3336,155 @@ class ConfigurationManager:
         # Fallback to default
         return self.get('bkt_parameters.default')
 
-    def reload(self):
-        """Reload configuration from file"""
-        self.config = self._load_config_file()
+    def reload(self):
+        """Reload configuration from file"""
+        self.config = self._load_config_file()
+        self.compile_snapshot()
+
+    def compile_snapshot(self) -> ConfigSnapshot:
+        """Rebuild the hot-path snapshot under a new version; call after editing self.config in place"""
+        self.version += 1
+        self.snapshot = ConfigSnapshot.from_config(self, self.version)
+        return self.snapshot
+
+    def get_breakdown_config(self) -> Dict:
+        return self.get('breakdown_config', {
+            'prerequisite_skip_threshold': 0.8,
+            'enable_breakdown_system': True
+        })
+
+
+class StudentTopicMatrix:
+    """
+    Dense students x topics matrix for one per-topic student field (mastery, confidence or
+    studied flags), used by StudentManager when algorithm_config.dense_student_store is on.
+    Each student owns a row and sees it through a TopicRow; `present` marks the topics that
+    have a value, so a row behaves like the sparse dict it replaces. `order` holds the
+    insertion sequence number of each present value, so rows iterate in insertion order like
+    a dict and greedy tie-breaks don't depend on the store. Rows and topic columns grow on demand.
+    """
+
+    def __init__(self, dtype=float, num_topics: int = 0):
+        self.values = np.zeros((0, num_topics), dtype=dtype)
+        self.present = np.zeros((0, num_topics), dtype=bool)
+        self.order = np.zeros((0, num_topics), dtype=np.int64)
+        self.next_order = 0
+        self.row_of: Dict[str, int] = {}
+
+    @property
+    def num_topics(self) -> int:
+        return self.values.shape[1]
+
+    def _grow(self, num_rows: int, num_topics: int):
+        rows = max(num_rows, self.values.shape[0])
+        columns = max(num_topics, self.values.shape[1])
+        if rows > self.values.shape[0]:
+            rows = max(rows, 2 * self.values.shape[0])
+        if columns > self.values.shape[1]:
+            columns = max(columns, 2 * self.values.shape[1])
+        values = np.zeros((rows, columns), dtype=self.values.dtype)
+        present = np.zeros((rows, columns), dtype=bool)
+        order = np.zeros((rows, columns), dtype=np.int64)
+        values[:self.values.shape[0], :self.values.shape[1]] = self.values
+        present[:self.present.shape[0], :self.present.shape[1]] = self.present
+        order[:self.order.shape[0], :self.order.shape[1]] = self.order
+        self.values, self.present, self.order = values, present, order
+
+    def add_row(self, student_id: str, initial: Optional[Dict[int, Any]] = None) -> 'TopicRow':
+        """Allocate (or reuse) the student's row and return its dict facade"""
+        row = self.row_of.get(student_id)
+        if row is None:
+            row = self.row_of[student_id] = len(self.row_of)
+            if row >= self.values.shape[0]:
+                self._grow(row + 1, 0)
+        view = TopicRow(self, row)
+        view.assign(initial or {})
+        return view
+
+
+class TopicRow(MutableMapping):
+    """
+    {topic_index: value} facade over one row of a StudentTopicMatrix.
+    Iterates topics in insertion order; copy() and pickling produce a plain dict.
+    """
+
+    __slots__ = ('matrix', 'row')
+
+    def __init__(self, matrix: StudentTopicMatrix, row: int):
+        self.matrix = matrix
+        self.row = row
+
+    def __getitem__(self, topic_index: int):
+        matrix = self.matrix
+        if 0 <= topic_index < matrix.values.shape[1] and matrix.present[self.row, topic_index]:
+            return matrix.values[self.row, topic_index].item()
+        raise KeyError(topic_index)
+
+    def get(self, topic_index: int, default=None):
+        matrix = self.matrix
+        if 0 <= topic_index < matrix.values.shape[1] and matrix.present[self.row, topic_index]:
+            return matrix.values[self.row, topic_index].item()
+        return default
+
+    def __setitem__(self, topic_index: int, value):
+        matrix = self.matrix
+        if topic_index < 0:
+            raise KeyError(topic_index)
+        if topic_index >= matrix.values.shape[1]:
+            matrix._grow(0, topic_index + 1)
+        if not matrix.present[self.row, topic_index]:
+            matrix.present[self.row, topic_index] = True
+            matrix.order[self.row, topic_index] = matrix.next_order
+            matrix.next_order += 1
+        matrix.values[self.row, topic_index] = value
+
+    def __delitem__(self, topic_index: int):
+        if topic_index not in self:
+            raise KeyError(topic_index)
+        self.matrix.present[self.row, topic_index] = False
+        self.matrix.values[self.row, topic_index] = 0
+
+    def __contains__(self, topic_index) -> bool:
+        matrix = self.matrix
+        return (isinstance(topic_index, (int, np.integer)) and 0 <= topic_index < matrix.values.shape[1]
+                and bool(matrix.present[self.row, topic_index]))
+
+    def _topics(self) -> np.ndarray:
+        """Present topics of the row in insertion order"""
+        topics = np.flatnonzero(self.matrix.present[self.row])
+        return topics[np.argsort(self.matrix.order[self.row, topics], kind='stable')]
+
+    def __iter__(self):
+        return iter(self._topics().tolist())
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.matrix.present[self.row]))
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
+    def __reduce__(self):
+        return (dict, (self.copy(),))
+
+    def copy(self) -> Dict[int, Any]:
+        """Plain dict snapshot of the row"""
+        topics = self._topics()
+        return dict(zip(topics.tolist(), self.matrix.values[self.row, topics].tolist()))
+
+    def clear(self):
+        self.matrix.present[self.row] = False
+        self.matrix.values[self.row] = 0
+
+    def assign(self, values: Dict[int, Any]):
+        """Replace the whole row with the given mapping"""
+        self.clear()
+        for topic_index, value in values.items():
+            self[topic_index] = value
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(values, present) views of the row for vectorized code"""
+        return self.matrix.values[self.row], self.matrix.present[self.row]
 
-    def get_breakdown_config(self) -> Dict:
-        return self.get('breakdown_config', {
-            'prerequisite_skip_threshold': 0.8,
-            'enable_breakdown_system': True
-        })
 
 @dataclass
 class StudentProfile:
@@ -2418,6 +3701,15 @@ class StudentManager:
         self.bkt_system = None  # Reference to BKT system
         self._current_breakdown_session = None
 
+        # Optional dense storage: per-topic student fields become rows of shared matrices
+        self.topic_matrices: Optional[Dict[str, StudentTopicMatrix]] = None
+        if self.config and self.config.get('algorithm_config.dense_student_store', False):
+            self.topic_matrices = {
+                'mastery_levels': StudentTopicMatrix(float),
+                'confidence_levels': StudentTopicMatrix(float),
+                'studied_topics': StudentTopicMatrix(bool)
+            }
+
     def get_mastery_threshold(self):
         """Get mastery threshold from config"""
         return self.config.get('algorithm_config.mastery_threshold', 0.7) if self.config else 0.7
@@ -2457,6 +3749,9 @@ class StudentManager:
             completed_questions=set(),
             daily_completed=set()
         )
+        if self.topic_matrices is not None:
+            for field_name, matrix in self.topic_matrices.items():
+                setattr(student, field_name, matrix.add_row(student_id, getattr(student, field_name)))
         self.students[student_id] = student
         return student
 
@@ -2493,18 +3788,7 @@ class StudentManager:
             mcq = kg.mcqs.get(mcq_id)
             mcq_exists = mcq is not None
         if mcq_exists:
-            attempt = StudentAttempt(
-                mcq_id=mcq_id,
-                timestamp=datetime.now(),
-                correct=is_correct,
-                time_taken=time_taken,
-            )
-
-            student.attempt_history.append(attempt)
-            student.completed_questions.add(mcq_id)
-            student.daily_completed.add(mcq_id)
-            student.total_questions_attempted += 1
-            student.last_active = attempt.timestamp
+            self._log_attempt(student, mcq_id, is_correct, time_taken, datetime.now())
 
             # Trigger BKT update if system is available
             if self.bkt_system:
@@ -2513,6 +3797,23 @@ class StudentManager:
                 return bkt_updates
 
         return []
+
+    def _log_attempt(self, student: StudentProfile, mcq_id: str, is_correct: bool,
+                     time_taken: float, timestamp: datetime):
+        """Append an attempt to the student's history and counters"""
+        attempt = StudentAttempt(
+            mcq_id=mcq_id,
+            timestamp=timestamp,
+            correct=is_correct,
+            time_taken=time_taken,
+        )
+
+        student.attempt_history.append(attempt)
+        student.completed_questions.add(mcq_id)
+        student.daily_completed.add(mcq_id)
+        student.total_questions_attempted += 1
+        student.last_active = attempt.timestamp
+
     def start_session(self, student_id: str):
         """Start a new session for a student"""
         student = self.get_student(student_id)
@@ -2653,6 +3954,75 @@ class StudentManager:
 
 
 
+@dataclass
+class SparseAdjacency:
+    """
+    NumPy-only CSR/CSC adjacency used when scipy is unavailable.
+    Exposes the same indptr/indices/data/shape attributes as scipy.sparse matrices.
+    """
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    shape: Tuple[int, int]
+    format: str = 'csr'
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def toarray(self) -> np.ndarray:
+        """Dense copy, for small graphs and debugging"""
+        matrix = np.zeros(self.shape, dtype=float)
+        for outer in range(len(self.indptr) - 1):
+            start, end = self.indptr[outer], self.indptr[outer + 1]
+            if self.format == 'csr':
+                matrix[outer, self.indices[start:end]] = self.data[start:end]
+            else:
+                matrix[self.indices[start:end], outer] = self.data[start:end]
+        return matrix
+
+
+@dataclass
+class AreaOfEffectKernel:
+    """
+    Precomputed sparse influence kernel for area-of-effect updates.
+    Row per center topic (CSR layout): every topic within max_distance on the
+    undirected graph, with decay_rate**distance and the path weight stored per entry.
+    Entries keep the breadth-first order networkx reports them in.
+    """
+    max_distance: int
+    decay_rate: float
+    graph_version: int
+    graph_signature: Tuple[int, int]      # (number_of_nodes, number_of_edges) at build time
+    row_of: Dict[int, int]                # center topic -> row
+    indptr: np.ndarray                    # (num_rows + 1,)
+    topics: np.ndarray                    # neighbour topic per entry
+    distances: np.ndarray
+    decay_factors: np.ndarray             # decay_rate ** distance
+    path_weights: np.ndarray              # product of edge weights along the path
+    paths: List[Tuple[int, ...]]          # shortest path per entry, center first
+
+    def neighbours(self, center_topic_index: int, mastery_change: float,
+                   min_effect: float) -> List[Tuple[int, int, float, float, Tuple[int, ...]]]:
+        """
+        Topics around a center whose effect exceeds min_effect.
+        Returns (topic_index, distance, path_weight, final_effect, path) tuples, where
+        final_effect = mastery_change * decay_rate**distance * path_weight.
+        """
+        row = self.row_of.get(center_topic_index)
+        if row is None:
+            return []
+        start, end = self.indptr[row], self.indptr[row + 1]
+
+        # Same multiplication order as the per-call computation
+        effects = mastery_change * self.decay_factors[start:end] * self.path_weights[start:end]
+        significant = np.flatnonzero(effects > min_effect)
+
+        return [(int(self.topics[start + entry]), int(self.distances[start + entry]),
+                 float(self.path_weights[start + entry]), float(effects[entry]), self.paths[start + entry])
+                for entry in significant]
+
+
 class KnowledgeGraph:
     """
     Core knowledge structure representing relationships between learning topics.
@@ -2670,6 +4040,9 @@ class KnowledgeGraph:
         self._next_index = 0  # Auto-incrementing index counter for making new topics
         self._adjacency_matrix = None  # Cache the matrix
         self._matrix_dirty = False     # Track if matrix needs recalculation
+        self._graph_version = 0        # Bumped whenever the graph structure changes
+        self._influence_kernel = None  # Cached AreaOfEffectKernel
+        self._sparse_adjacency = {}    # {'csr'/'csc': (graph_key, matrix)}
 
         # Initialize nodes with the original data
         #self._initialize_nodes()
@@ -2681,6 +4054,10 @@ class KnowledgeGraph:
         # Create NetworkX graph
         self._build_graph()
 
+        # Precompute area-of-effect neighbourhoods once
+        self.get_influence_kernel(self.config.get('bkt_config.area_effect_max_distance', 2),
+                                  self.config.get('bkt_config.area_effect_decay_rate', 0.6))
+
     def _load_nodes_from_json(self, nodes_file: str):
         """Load knowledge graph nodes from JSON file"""
         try:
@@ -2731,11 +4108,23 @@ class KnowledgeGraph:
 
     def _load_mcqs_from_json(self, mcqs_file: str):
         """optimized loading for select_optimal_mcqs algorithm"""
-        self.ultra_loader = MCQLoader(mcqs_file)
+        self.ultra_loader = MCQLoader(mcqs_file, self.config.get('mcq_loader.full_mcq_cache_size', 256))
+        RENDER_CACHE.set_capacity(self.config.get('mcq_loader.render_cache_size', 2048))
+        expression_cache_size = self.config.get('mcq_loader.expression_cache_size', 4096)
+        _COMPILED_EXPRESSIONS.set_capacity(expression_cache_size)
+        _CALCULATION_PLANS.set_capacity(expression_cache_size)
+        _PARAMETER_SAMPLING_STATS.set_capacity(self.config.get('mcq_loader.sampling_stats_size', 4096))
+        variant_pool_file = self.config.get('mcq_loader.variant_pool_file')
+        if variant_pool_file:
+            self.ultra_loader.load_variant_pools(variant_pool_file)
 
         # Show memory savings
-        stats = self.ultra_loader.get_stats()
+        measure_memory = self.config.get('mcq_loader.report_memory', False)
+        stats = self.ultra_loader.get_stats(measure_memory=measure_memory)
         print(f"   📊 {stats['total_indexed']} MCQs indexed with minimal data")
+        if measure_memory:
+            print(f"   📊 Loader memory: {stats['memory_bytes']['total'] / 1024:.1f} KB "
+                  f"(minimal {stats['measured_minimal_memory_kb']:.1f} KB, full {stats['measured_full_memory_kb']:.1f} KB)")
 
     def preload_for_student(self, student_id: str, student_manager) -> List[str]:
         """Preload minimal data for student's due topics"""
@@ -2792,7 +4181,7 @@ class KnowledgeGraph:
         """
         Helper function to get MCQ data regardless of loading method
         Returns:
-            For minimal data: MinimalMCQData object
+            For minimal data: MinimalMCQView object
             For full data: MCQ object
             None if not found
         """
@@ -2805,9 +4194,16 @@ class KnowledgeGraph:
         else:
             mcq = self.mcqs.get(mcq_id)
 
-        # Handle parameter regeneration for parameterized MCQs
+        # Handle parameter regeneration for parameterized MCQs: draw a pre-rendered variant
+        # when there is a pool for it, generate on-line otherwise
         if mcq and hasattr(mcq, 'is_parameterized') and mcq.is_parameterized:
-            mcq.regenerate_parameters()
+            variant = None
+            if hasattr(self, 'ultra_loader') and isinstance(mcq, MCQ):
+                variant = self.ultra_loader.draw_variant(mcq_id)
+            if variant is not None:
+                mcq.use_variant(variant)
+            else:
+                mcq.regenerate_parameters()
 
         return mcq
 
@@ -2832,6 +4228,164 @@ class KnowledgeGraph:
         }
 
 
+    def invalidate_graph_caches(self):
+        """Call after changing nodes or edges so cached matrices and kernels are rebuilt"""
+        self._graph_version += 1
+        self._matrix_dirty = True
+
+    def _graph_signature(self) -> Tuple[int, int]:
+        """Cheap fingerprint used to notice graph edits that skipped invalidate_graph_caches"""
+        return (self.graph.number_of_nodes(), self.graph.number_of_edges())
+
+    def get_adjacency_csr(self):
+        """
+        Sparse adjacency with rows = topics and columns = their prerequisites.
+        Returns a scipy.sparse.csr_matrix when scipy is installed, else a SparseAdjacency.
+        Within a row, entries keep the order of Node.dependencies.
+        """
+        return self._get_sparse_adjacency('csr')
+
+    def get_adjacency_csc(self):
+        """Column-major adjacency: column slices list the topics that depend on a prerequisite"""
+        return self._get_sparse_adjacency('csc')
+
+    def _get_sparse_adjacency(self, matrix_format: str):
+        """Cached sparse adjacency, rebuilt when the graph changes"""
+        graph_key = (self._graph_version, self._graph_signature())
+        cached = self._sparse_adjacency.get(matrix_format)
+        if cached is None or cached[0] != graph_key:
+            if matrix_format == 'csr':
+                matrix = self._calculate_adjacency_csr()
+            else:
+                matrix = self._csr_to_csc(self.get_adjacency_csr())
+            self._sparse_adjacency[matrix_format] = (graph_key, matrix)
+            return matrix
+        return cached[1]
+
+    def _calculate_adjacency_csr(self):
+        """Build the CSR arrays straight from Node.dependencies; memory grows with edge count"""
+        size = max(self.nodes.keys()) + 1 if self.nodes else 0
+
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        indices = []
+        data = []
+        for source_index in range(size):
+            node = self.nodes.get(source_index)
+            if node:
+                # Later duplicates overwrite earlier ones, as in the dense matrix
+                row = {}
+                for dest_index, weight in node.dependencies:
+                    if dest_index < size:
+                        row[dest_index] = weight
+                indices.extend(row.keys())
+                data.extend(row.values())
+            indptr[source_index + 1] = len(indices)
+
+        indices = np.array(indices, dtype=np.int64)
+        data = np.array(data, dtype=float)
+
+        if SCIPY_AVAILABLE:
+            return sparse.csr_matrix((data, indices, indptr), shape=(size, size))
+        return SparseAdjacency(indptr=indptr, indices=indices, data=data, shape=(size, size), format='csr')
+
+    def _csr_to_csc(self, adjacency_csr):
+        """Transpose the storage order of a CSR adjacency"""
+        if SCIPY_AVAILABLE:
+            return adjacency_csr.tocsc()
+
+        num_rows, num_columns = adjacency_csr.shape
+        rows = np.repeat(np.arange(num_rows), np.diff(adjacency_csr.indptr))
+        order = np.argsort(adjacency_csr.indices, kind='stable')
+        indptr = np.zeros(num_columns + 1, dtype=np.int64)
+        np.cumsum(np.bincount(adjacency_csr.indices, minlength=num_columns), out=indptr[1:])
+        return SparseAdjacency(indptr=indptr, indices=rows[order], data=adjacency_csr.data[order],
+                               shape=(num_rows, num_columns), format='csc')
+
+    def get_significant_prerequisites(self, topic_index: int, min_weight: float = 0.1) -> List[int]:
+        """Direct prerequisites of a topic with weight above min_weight, read from the CSR row"""
+        adjacency = self.get_adjacency_csr()
+        if topic_index < 0 or topic_index >= adjacency.shape[0]:
+            return []
+        start, end = adjacency.indptr[topic_index], adjacency.indptr[topic_index + 1]
+        return adjacency.indices[start:end][adjacency.data[start:end] > min_weight].tolist()
+
+    def get_dependent_topics(self, topic_index: int, min_weight: float = 0.0) -> List[int]:
+        """Topics that list topic_index as a prerequisite, read from the CSC column"""
+        adjacency = self.get_adjacency_csc()
+        if topic_index < 0 or topic_index >= adjacency.shape[1]:
+            return []
+        start, end = adjacency.indptr[topic_index], adjacency.indptr[topic_index + 1]
+        return adjacency.indices[start:end][adjacency.data[start:end] > min_weight].tolist()
+
+    def get_influence_kernel(self, max_distance: int, decay_rate: float) -> AreaOfEffectKernel:
+        """Cached area-of-effect kernel, rebuilt when the graph or the area effect config changes"""
+        kernel = self._influence_kernel
+        graph_signature = self._graph_signature()
+        if (kernel is None or
+            kernel.max_distance != max_distance or
+            kernel.decay_rate != decay_rate or
+            kernel.graph_version != self._graph_version or
+            kernel.graph_signature != graph_signature):
+            kernel = self._build_influence_kernel(max_distance, decay_rate)
+            self._influence_kernel = kernel
+        return kernel
+
+    def _build_influence_kernel(self, max_distance: int, decay_rate: float) -> AreaOfEffectKernel:
+        """Run the bounded BFS for every center topic once and store the results in CSR form"""
+        undirected_graph = self.graph.to_undirected()
+
+        row_of = {}
+        indptr = [0]
+        topics, distances, decay_factors, path_weights, paths = [], [], [], [], []
+
+        for center_topic_index in self.graph.nodes:
+            paths_from_center = nx.single_source_shortest_path(undirected_graph, center_topic_index, cutoff=max_distance)
+            paths_from_center.pop(center_topic_index, None)
+
+            for topic_index, path in paths_from_center.items():
+                distance = len(path) - 1
+                topics.append(topic_index)
+                distances.append(distance)
+                decay_factors.append(decay_rate ** distance)
+                path_weights.append(self._calculate_path_weight(path))
+                paths.append(tuple(path))
+
+            row_of[center_topic_index] = len(indptr) - 1
+            indptr.append(len(topics))
+
+        return AreaOfEffectKernel(
+            max_distance=max_distance,
+            decay_rate=decay_rate,
+            graph_version=self._graph_version,
+            graph_signature=self._graph_signature(),
+            row_of=row_of,
+            indptr=np.array(indptr, dtype=np.int64),
+            topics=np.array(topics, dtype=np.int64),
+            distances=np.array(distances, dtype=np.int64),
+            decay_factors=np.array(decay_factors, dtype=float),
+            path_weights=np.array(path_weights, dtype=float),
+            paths=paths
+        )
+
+    def _calculate_path_weight(self, path: List[int]) -> float:
+        """Combined weight along a path: product of edge weights in either direction, 0.5 if missing"""
+        if len(path) < 2:
+            return 1.0
+
+        total_weight = 1.0
+        for i in range(len(path) - 1):
+            source, target = path[i], path[i + 1]
+            edge_weight = 0.5  # Default weight
+
+            if self.graph.has_edge(source, target):
+                edge_weight = self.graph[source][target].get('weight', 0.5)
+            elif self.graph.has_edge(target, source):
+                edge_weight = self.graph[target][source].get('weight', 0.5)
+
+            total_weight *= edge_weight
+
+        return total_weight
+
     def get_adjacency_matrix(self) -> np.ndarray:
         """ Cached adjacency matrix until graph changes"""
         if self._adjacency_matrix is None or self._matrix_dirty:
@@ -2857,12 +4411,12 @@ class KnowledgeGraph:
     def get_prerequisite_chain_length(self, topic_index: int, max_depth: int = 6, max_nodes: int = 50) -> int:
         """Calculate prerequisite chain length using BFS with depth tracking"""
         visited = set()
-        queue = [(topic_index, 0)]  # (node_id, depth)
+        queue = deque([(topic_index, 0)])  # (node_id, depth)
         max_depth_reached = 0
         nodes_explored = 0
 
         while queue and nodes_explored < max_nodes:
-            current, depth = queue.pop(0)
+            current, depth = queue.popleft()
             if current in visited or depth >= max_depth:
                 continue
 
@@ -2870,11 +4424,9 @@ class KnowledgeGraph:
             nodes_explored += 1
             max_depth_reached = max(max_depth_reached, depth)
 
-            node = self.get_node_by_index(current)
-            if node:
-                for prereq_id, weight in node.dependencies:
-                    if prereq_id not in visited and weight > 0.1:
-                        queue.append((prereq_id, depth + 1))
+            for prereq_id in self.get_significant_prerequisites(current):
+                if prereq_id not in visited:
+                    queue.append((prereq_id, depth + 1))
 
         return max_depth_reached
 
@@ -2886,12 +4438,12 @@ class KnowledgeGraph:
         Stops at max_depth levels or max_nodes explored.
         """
         visited = set()
-        queue = [(node_id, 0)]  # (node_id, depth)
+        queue = deque([(node_id, 0)])  # (node_id, depth)
         prerequisites = []
         nodes_explored = 0
 
         while queue and nodes_explored < max_nodes:
-            current, depth = queue.pop(0)
+            current, depth = queue.popleft()
 
             if current in visited or depth >= max_depth:
                 continue
@@ -2899,13 +4451,11 @@ class KnowledgeGraph:
             visited.add(current)
             nodes_explored += 1
 
-            # Get direct prerequisites from node dependencies
-            node = self.kg.get_node_by_index(current)
-            if node:
-                for prereq_id, weight in node.dependencies:
-                    if prereq_id not in visited and weight > 0.1:  # Only significant dependencies
-                        queue.append((prereq_id, depth + 1))
-                        prerequisites.append(prereq_id)
+            # Direct prerequisites from the CSR row (only significant dependencies)
+            for prereq_id in self.get_significant_prerequisites(current):
+                if prereq_id not in visited:
+                    queue.append((prereq_id, depth + 1))
+                    prerequisites.append(prereq_id)
 
         return prerequisites
 
@@ -2938,12 +4488,12 @@ class KnowledgeGraph:
         Helper method for get_prerequisite_chains_batch.
         """
         local_visited = set()
-        queue = [(target_node, 0)]  # (node_id, depth)
+        queue = deque([(target_node, 0)])  # (node_id, depth)
         prerequisites = []
         nodes_explored = 0
 
         while queue and nodes_explored < max_nodes:
-            current, depth = queue.pop(0)
+            current, depth = queue.popleft()
 
             if current in local_visited or depth >= max_depth:
                 continue
@@ -2952,13 +4502,11 @@ class KnowledgeGraph:
             global_visited.add(current)  # Update global state
             nodes_explored += 1
 
-            # Get direct prerequisites from node dependencies
-            node = self.get_node_by_index(current)
-            if node:
-                for prereq_id, weight in node.dependencies:
-                    if prereq_id not in local_visited and weight > 0.1:
-                        queue.append((prereq_id, depth + 1))
-                        prerequisites.append(prereq_id)
+            # Direct prerequisites from the CSR row
+            for prereq_id in self.get_significant_prerequisites(current):
+                if prereq_id not in local_visited:
+                    queue.append((prereq_id, depth + 1))
+                    prerequisites.append(prereq_id)
 
         return prerequisites
 
@@ -2971,7 +4519,7 @@ class OptimizedMCQVector:
     Caches computed values like prerequisites for performance
     """
     mcq_id: str
-    minimal_data: MinimalMCQData  # Instead of full MCQ reference
+    minimal_data: MinimalMCQView  # Instead of full MCQ reference
     prerequisites: Dict[int, float]
 
     @property
@@ -2991,6 +4539,281 @@ class OptimizedMCQVector:
         """Return detailed breakdown in minimal data"""
         return self.minimal_data.difficulty_breakdown
 
+    @property
+    def row(self) -> int:
+        """Row of this MCQ in the loader's MCQColumnStore"""
+        return self.minimal_data.row
+
+    @property
+    def skill_difficulties(self) -> np.ndarray:
+        """The six skill difficulties in DIFFICULTY_SKILLS order"""
+        return self.minimal_data.skill_difficulties
+
+
+def _ell_row_sums(values: np.ndarray) -> np.ndarray:
+    """
+    Row sums of a padded (ELL) sparse matrix, accumulated column by column.
+    Keeps the left-to-right summation order of the scalar loops so both
+    greedy engines produce bit-identical scores.
+    """
+    totals = values[:, 0].copy()
+    for column in range(1, values.shape[1]):
+        totals += values[:, column]
+    return totals
+
+
+def _column_row_index(coverage_columns: np.ndarray, padding_column: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverted index topic column -> candidate rows, used to find affected candidates"""
+    num_rows, coverage_width = coverage_columns.shape
+    entry_columns = coverage_columns.ravel()
+    entry_rows = np.repeat(np.arange(num_rows), coverage_width)
+    real_entries = entry_columns != padding_column
+    order = np.argsort(entry_columns[real_entries], kind='stable')
+    column_rows = entry_rows[real_entries][order]
+    column_rows_indptr = np.searchsorted(entry_columns[real_entries][order], np.arange(padding_column + 1))
+    return column_rows, column_rows_indptr
+
+
+@dataclass
+class PackedMCQCandidates:
+    """
+    Candidate MCQs packed into padded sparse (ELL) matrices for the vectorized greedy engine.
+    Rows follow the eligible MCQ order; columns index topic_indices, with one extra
+    padding column at the end that always reads as zero.
+    """
+    mcq_ids: List[str]
+    row_of: Dict[str, int]                # mcq_id -> row
+    topic_indices: List[int]              # column -> topic index
+    coverage_columns: np.ndarray          # (n, k) subtopic entries followed by prerequisite entries
+    coverage_weights: np.ndarray          # (n, k) MCQ weight of each entry
+    coverage_factors: np.ndarray          # (n, k) 1.0 for main topic, subtopic or prereq weight otherwise
+    subtopic_columns: np.ndarray          # (n, s)
+    subtopic_weights: np.ndarray          # (n, s)
+    importance_weights: np.ndarray        # (n, s) out_degree * weight * importance weight
+    subtopic_total_weight: np.ndarray     # (n,)
+    difficulty: np.ndarray                # (n,)
+    skills_cost: np.ndarray               # (n,) |total_skills_penalty|, fixed for one run
+    column_rows: np.ndarray               # rows touching each column, grouped by column
+    column_rows_indptr: np.ndarray        # (num_columns + 1,) offsets into column_rows
+    available: np.ndarray                 # (n,) False once selected
+    topic_array: np.ndarray               # (num_columns,) topic_indices as a sorted array
+    topic_state: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None  # last _packed_topic_state
+
+    def mark_selected(self, mcq_id: str):
+        """Remove an MCQ from further consideration"""
+        row = self.row_of.get(mcq_id)
+        if row is not None:
+            self.available[row] = False
+
+    def rows_for_columns(self, columns: np.ndarray) -> np.ndarray:
+        """Unique candidate rows with an entry in any of the given topic columns"""
+        if columns.size == 0:
+            return np.array([], dtype=np.int64)
+        row_groups = [self.column_rows[self.column_rows_indptr[column]:self.column_rows_indptr[column + 1]]
+                      for column in columns]
+        return np.unique(np.concatenate(row_groups))
+
+    def columns_for_topics(self, topics) -> np.ndarray:
+        """Packed columns of the given topic indexes; topics no candidate touches are skipped"""
+        topics = np.fromiter(topics, dtype=np.int64)
+        columns = np.searchsorted(self.topic_array, topics)
+        in_range = columns < len(self.topic_array)
+        columns = columns[in_range]
+        return np.unique(columns[self.topic_array[columns] == topics[in_range]])
+
+
+class TopicPriorityVector(MutableMapping):
+    """
+    Due-topic priorities of one greedy run: {topic_index: priority} for topics below the
+    mastery threshold, backed by a priority vector and a due mask indexed by topic.
+    Every write or removal goes into a change log, so after a greedy update only
+    candidates touching changed_topics() need rescoring. Topics whose simulated mastery
+    changed without a priority change (area effects on topics that are not due) are
+    recorded with touch(). Iteration follows insertion order, like the dict it replaces.
+    """
+
+    def __init__(self, size: int = 0):
+        self.priorities = np.zeros(size)              # 0.0 for topics that are not due
+        self.due = np.zeros(size, dtype=bool)
+        self._order: Dict[int, None] = {}             # due topics in insertion order
+        self._changes: Set[int] = set()
+
+    def _grow(self, topic_index: int):
+        size = max(topic_index + 1, 2 * len(self.priorities))
+        self.priorities = np.concatenate([self.priorities, np.zeros(size - len(self.priorities))])
+        self.due = np.concatenate([self.due, np.zeros(size - len(self.due), dtype=bool)])
+
+    def __getitem__(self, topic_index: int) -> float:
+        if topic_index not in self._order:
+            raise KeyError(topic_index)
+        return float(self.priorities[topic_index])
+
+    def __setitem__(self, topic_index: int, priority: float):
+        if topic_index >= len(self.priorities):
+            self._grow(topic_index)
+        self.priorities[topic_index] = priority
+        self.due[topic_index] = True
+        self._order[topic_index] = None
+        self._changes.add(topic_index)
+
+    def __delitem__(self, topic_index: int):
+        del self._order[topic_index]
+        self.priorities[topic_index] = 0.0
+        self.due[topic_index] = False
+        self._changes.add(topic_index)
+
+    def __contains__(self, topic_index) -> bool:
+        return topic_index in self._order
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __repr__(self) -> str:
+        return f"TopicPriorityVector({dict(self.items())})"
+
+    def touch(self, topic_index: int):
+        """Log a topic whose simulated mastery changed while its priority did not"""
+        self._changes.add(topic_index)
+
+    def changed_topics(self) -> Set[int]:
+        """Topics written, removed or touched since the last call; clears the log"""
+        changes, self._changes = self._changes, set()
+        return changes
+
+    def gather(self, topic_indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Priority and due-mask values for an array of topic indexes"""
+        if topic_indices.size and topic_indices.max() >= len(self.priorities):
+            self._grow(int(topic_indices.max()))
+        return self.priorities[topic_indices], self.due[topic_indices]
+
+
+class GreedyCostCache:
+    """
+    Cost model of one select_optimal_mcqs call (loop engine), split by what can change.
+    Static per student and session: the skills cost (MCQScheduler._skills_cost_cache) and the
+    out-degree importance weight of each subtopic entry. Dynamic: the mastery-dependent base
+    difficulty cost and the importance bonus over still-due topics, kept per MCQ and dropped
+    only for MCQs whose subtopics are in the TopicPriorityVector change log of the last
+    greedy update.
+    """
+
+    def __init__(self, student: 'StudentProfile', simulated_mastery_levels: Dict[int, float],
+                 topic_priorities: 'TopicPriorityVector'):
+        self.student = student
+        self.simulated_mastery_levels = simulated_mastery_levels
+        self.topic_priorities = topic_priorities
+
+        self.importance_entries: Dict[str, List[Tuple[int, float]]] = {}  # static
+        self.base_difficulty_cost: Dict[str, float] = {}                  # dynamic: mastery
+        self.importance_bonus: Dict[str, float] = {}                      # dynamic: due topics
+        self._mcqs_by_topic: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def applies_to(self, student, simulated_mastery_levels: Dict[int, float]) -> bool:
+        return student is self.student and simulated_mastery_levels is self.simulated_mastery_levels
+
+    def register(self, mcq_id: str, subtopic_weights: Dict[int, float]):
+        """Record which topics an MCQ's cached values depend on"""
+        for topic_index in subtopic_weights:
+            self._mcqs_by_topic.setdefault(topic_index, set()).add(mcq_id)
+
+    def begin_update(self):
+        """Call before a greedy update mutates simulated mastery / topic priorities"""
+        self.topic_priorities.changed_topics()
+
+    def end_update(self):
+        """Drop dynamic values of MCQs touching topics whose mastery or due status changed"""
+        for topic_index in self.topic_priorities.changed_topics():
+            for mcq_id in self._mcqs_by_topic.get(topic_index, ()):
+                self.base_difficulty_cost.pop(mcq_id, None)
+                self.importance_bonus.pop(mcq_id, None)
+
+
+class LazyGreedyQueue:
+    """
+    Max-heap of candidate ratios for the lazy-greedy (CELF) engine.
+
+    Each candidate is either fresh (its exact ratio for the current simulated state)
+    or stale (an upper bound from an earlier state). Coverage only shrinks as
+    priorities fall, and the importance bonus only shrinks as topics leave the due
+    set, so coverage / max(0.01, cost_floor - importance_bonus) stays an upper bound
+    until the candidate is re-evaluated. Heap keys are (-value, row) so ties resolve
+    to the earliest row, like the scalar loop.
+    """
+
+    def __init__(self, packed: PackedMCQCandidates, topic_state: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                 ratios: np.ndarray, coverage: np.ndarray, importance_bonus: np.ndarray,
+                 cost_floor: np.ndarray):
+        self.packed = packed
+        self.topic_state = topic_state
+        self.ratios = ratios.copy()
+        self.coverage = coverage.copy()
+        self.importance_bonus = importance_bonus.copy()
+        self.cost_floor = cost_floor
+        self.fresh = np.ones(len(ratios), dtype=bool)
+        self.versions = np.zeros(len(ratios), dtype=np.int64)
+        self.heap = [(-ratio, row, 0) for row, ratio in enumerate(ratios.tolist())]
+        heapq.heapify(self.heap)
+
+    def affected_rows(self, topic_state: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                      changed_columns: np.ndarray) -> Tuple[np.ndarray, bool]:
+        """
+        Adopt a new topic state and return the available rows whose ratio may have changed
+        (those touching changed_columns), plus whether their stale ratios are still valid
+        upper bounds.
+        """
+        old_priorities, old_due_mask, _ = self.topic_state
+        priorities, due_mask, _ = topic_state
+        bounds_hold = not np.any((priorities[changed_columns] > old_priorities[changed_columns]) |
+                                 (due_mask[changed_columns] > old_due_mask[changed_columns]))
+        self.topic_state = topic_state
+
+        rows = self.packed.rows_for_columns(changed_columns)
+        return rows[self.packed.available[rows]], bounds_hold
+
+    def mark_stale(self, rows: np.ndarray):
+        """Replace exact ratios of changed candidates with upper bounds"""
+        if rows.size == 0:
+            return
+        self.fresh[rows] = False
+        self.versions[rows] += 1
+        coverage = self.coverage[rows]
+        bounds = np.where(coverage == 0, 0.0,
+                          coverage / np.maximum(0.01, self.cost_floor[rows] - self.importance_bonus[rows]))
+        for row, bound, version in zip(rows.tolist(), bounds.tolist(), self.versions[rows].tolist()):
+            heapq.heappush(self.heap, (-bound, row, version))
+
+    def refresh(self, rows: np.ndarray, ratios: np.ndarray, coverage: np.ndarray, importance_bonus: np.ndarray):
+        """Store exact ratios for re-evaluated candidates"""
+        self.ratios[rows] = ratios
+        self.coverage[rows] = coverage
+        self.importance_bonus[rows] = importance_bonus
+        self.fresh[rows] = True
+        self.versions[rows] += 1
+        for row, ratio, version in zip(rows.tolist(), ratios.tolist(), self.versions[rows].tolist()):
+            heapq.heappush(self.heap, (-ratio, row, version))
+
+    def pop(self) -> Optional[int]:
+        """Pop the highest current entry, skipping selected rows and superseded entries"""
+        while self.heap:
+            _, row, version = heapq.heappop(self.heap)
+            if self.packed.available[row] and version == self.versions[row]:
+                return row
+        return None
+
+# Scheduler inherited by forked select_optimal_mcqs_batch workers
+_BATCH_SCHEDULER = None
+
+
+def _select_optimal_mcqs_block(student_ids: List[str], options: Dict) -> Dict[str, List[str]]:
+    """ProcessPoolExecutor entry point for one block of select_optimal_mcqs_batch"""
+    return _BATCH_SCHEDULER._select_optimal_mcqs_block(student_ids, **options)
+
+
 class MCQScheduler:
     """the bit that does the actual mcq algorithm calculations
         Selects optimal questions for students based on:
@@ -3016,6 +4839,12 @@ class MCQScheduler:
             'topic_orderings': {}     # {frozenset(topics): sorted_list}
         }
         self._cache_dirty = False  # Track when to invalidate caches
+        self._ratio_evaluations = 0
+        self.greedy_stats = {}  # Evaluation counts from the last select_optimal_mcqs call
+        self._packed_bank = None  # (config version, PackedMCQCandidates of the whole bank), only during batch planning
+        self._skills_cost_cache = None  # (student, {mcq_id: skills cost}) during one select_optimal_mcqs call
+        self._cost_cache = None  # GreedyCostCache during one loop-engine select_optimal_mcqs call
+        self.batch_stats = {}  # Block/worker counts from the last select_optimal_mcqs_batch call
 
 
     def _invalidate_pedagogy_caches(self):
@@ -3028,6 +4857,11 @@ class MCQScheduler:
         """Get configuration value using dot notation"""
         return self.config.get(path, default)
 
+    @property
+    def config_snapshot(self) -> ConfigSnapshot:
+        """Compiled config values for the greedy hot loops (see ConfigSnapshot)"""
+        return self.config.snapshot
+
     def set_bkt_system(self, bkt_system):
         """Set reference to BKT system after initialization"""
         self.bkt_system = bkt_system
@@ -3098,10 +4932,17 @@ class MCQScheduler:
             return []
 
     def select_optimal_mcqs(self, student_id: str, num_questions: int = 50,
-                          use_chapter_weights: bool = False, confidence: float = 1.0) -> List[str]:
+                          use_chapter_weights: bool = False, confidence: float = 1.0,
+                          engine: Optional[str] = None) -> List[str]:
         """
         Main greedy algorithm for adaptive MCQ selection.
         Iteratively selects best question, updates virtual mastery, repeats.
+
+        engine: 'loop' scores candidates one at a time, 'vectorized' packs them into
+        NumPy matrices once and scores all of them per iteration, 'lazy' keeps a
+        lazy-greedy (CELF) heap and re-evaluates only candidates whose topics changed.
+        All engines select the same MCQs. Defaults to greedy_algorithm.greedy_engine
+        from config. Evaluation counts for the last call are kept in self.greedy_stats.
         """
 
         student = self.student_manager.get_student(student_id)
@@ -3109,9 +4950,15 @@ class MCQScheduler:
             print(f"❌ Student {student_id} not found")
             return []
         # Get config values
-        greedy_max_mcqs_to_evaluate = self.get_config_value('greedy_algorithm.greedy_max_mcqs_to_evaluate', 50)
-        greedy_early_stopping = self.get_config_value('greedy_algorithm.greedy_early_stopping', False)
-        greedy_convergence_threshold = self.get_config_value('algorithm_config.greedy_convergence_threshold', 0.05)
+        config = self.config_snapshot
+        greedy_max_mcqs_to_evaluate = config.greedy_max_mcqs_to_evaluate
+        greedy_early_stopping = config.greedy_early_stopping
+        greedy_convergence_threshold = config.greedy_convergence_threshold
+
+        engine = engine or config.greedy_engine
+        if engine not in ('loop', 'vectorized', 'lazy'):
+            print(f"⚠️ Unknown greedy engine '{engine}', using 'loop'")
+            engine = 'loop'
 
         # Get MCQs eligible for selection
         eligible_mcqs = self.get_available_questions_for_student(student_id)
@@ -3140,7 +4987,7 @@ class MCQScheduler:
             quick_scores = [(mcq_id, self._calculate_quick_priority_score(mcq_id, student))
                           for mcq_id in eligible_mcqs]
             quick_scores.sort(key=lambda x: x[1], reverse=True)
-            eligible_mcqs = [mcq_id for mcq_id, _ in quick_scores[:self.config.greedy_max_mcqs_to_evaluate]]
+            eligible_mcqs = [mcq_id for mcq_id, _ in quick_scores[:greedy_max_mcqs_to_evaluate]]
 
         # Create working copy of mastery levels for algorithm (not real mastery updates)
         simulated_mastery_levels = student.mastery_levels.copy()
@@ -3152,80 +4999,579 @@ class MCQScheduler:
             print(f"No due topics found for student {student_id}")
             return []
 
-        selected_mcqs = []
-        last_total_coverage = 0.0
+        # Ability levels do not change during a greedy run: skills cost of every candidate, once
+        store = self.kg.ultra_loader.minimal_mcq_data
+        candidate_ids = [mcq_id for mcq_id in dict.fromkeys(eligible_mcqs) if mcq_id in store]
+        skills_costs = np.abs(self.calculate_skills_mismatch_matrix(store.skill_difficulty[store.rows(candidate_ids)], student)[:, -1])
+        skills_costs = dict(zip(candidate_ids, skills_costs.tolist()))
 
-        # Greedy selection loop
-        for iteration in range(num_questions):
-            if not topic_priorities:
-                break
+        # The per-call caches must not outlive this call, also when it fails
+        self._skills_cost_cache = (student, skills_costs)
+        try:
+            # Pack candidates once for the vectorized and lazy engines; the loop engine caches costs instead
+            self._ratio_evaluations = 0
+            cost_cache = None
+            if engine == 'loop':
+                cost_cache = self._cost_cache = GreedyCostCache(student, simulated_mastery_levels, topic_priorities)
+            packed_candidates = None
+            lazy_queue = None
+            if engine in ('vectorized', 'lazy'):
+                packed_candidates = self._pack_candidate_matrices(eligible_mcqs, student, skills_costs)
+            if engine == 'lazy' and packed_candidates is not None:
+                lazy_queue = self._build_lazy_greedy_queue(
+                    packed_candidates, topic_priorities, simulated_mastery_levels, student, confidence)
+
+            selected_mcqs = []
+            last_total_coverage = 0.0
+
+            # Greedy selection loop
+            for iteration in range(num_questions):
+                if not topic_priorities:
+                    break
 
-            # Calculate coverage-to-cost ratio for each available MCQ
-            best_mcq = None
-            best_ratio = 0.0
-            best_coverage_info = None
+                # Calculate coverage-to-cost ratio for each available MCQ
+                if lazy_queue is not None:
+                    best_mcq, best_ratio, best_coverage_info = self._select_best_mcq_lazy(
+                        lazy_queue, topic_priorities, simulated_mastery_levels, student, confidence)
+                elif packed_candidates is not None:
+                    best_mcq, best_ratio, best_coverage_info = self._select_best_mcq_vectorized(
+                        packed_candidates, topic_priorities, simulated_mastery_levels, student, confidence)
+                else:
+                    best_mcq, best_ratio, best_coverage_info = self._select_best_mcq_loop(
+                        eligible_mcqs, selected_mcqs, topic_priorities, simulated_mastery_levels, student, confidence)
 
-            for mcq_id in eligible_mcqs:
-                if mcq_id in selected_mcqs:  # Skip already selected
-                    continue
+                if best_mcq is None:
+                    print(f"No suitable MCQ found for remaining due topics in iteration {iteration + 1}")
+                    break
 
-                try:
-                    # Ensure vector exists before calculation
-                    vector = self._get_or_create_optimized_mcq_vector(mcq_id)
-                    if not vector:
-                        print(f"   ⚠️  Skipping MCQ {mcq_id} - no vector available")
-                        continue
+                print(f"Best MCQ selected: {best_mcq}, best score: {best_ratio}")
+                # Select the best MCQ
+                selected_mcqs.append(best_mcq)
+                if packed_candidates is not None:
+                    packed_candidates.mark_selected(best_mcq)
 
-                    coverage_to_cost_ratio, coverage_info = self._calculate_coverage_to_cost_ratio(mcq_id, topic_priorities, simulated_mastery_levels, student, confidence)
+                # Update virtual mastery and topic priorities
+                try:
+                    if cost_cache is not None:
+                        cost_cache.begin_update()
+                    # Update virtual mastery and topic priorities
+                    total_topic_coverage_score = self._update_simulated_mastery_and_priorities(best_mcq, simulated_mastery_levels, topic_priorities, best_coverage_info, student)
+                    if cost_cache is not None:
+                        cost_cache.end_update()
 
-                    if coverage_to_cost_ratio > best_ratio:
-                        best_ratio = coverage_to_cost_ratio
-                        best_mcq = mcq_id
-                        best_coverage_info = coverage_info
-                    if best_mcq is None:
-                        break
 
                 except Exception as e:
-                    print(f"   ❌ Error evaluating MCQ {mcq_id}: {type(e)} - {e}")
+                    print(f"❌ Error updating virtual mastery: {type(e)} - {e}")
                     import traceback
                     traceback.print_exc()
-                    # Continue with next MCQ instead of crashing
-                    continue
+                    break
 
-            if best_mcq is None:
-                print(f"No suitable MCQ found for remaining due topics in iteration {iteration + 1}")
-                break
+                # Early stopping if improvement is minimal
+                if (greedy_early_stopping and abs(total_topic_coverage_score - last_total_coverage) < greedy_convergence_threshold):
+                    print(f"Early stopping: minimal improvement detected")
+                    break
+
+                last_total_coverage = total_topic_coverage_score
+        finally:
+            self._skills_cost_cache = None
+            self._cost_cache = None
+
+        print(f"🎯 Greedy selection complete: {selected_mcqs}")
+        self.greedy_stats = {
+            'engine': engine,
+            'candidates': len(eligible_mcqs),
+            'selected': len(selected_mcqs),
+            'ratio_evaluations': self._ratio_evaluations
+        }
+        if cost_cache is not None:
+            self.greedy_stats['cost_cache_hits'] = cost_cache.hits
+            self.greedy_stats['cost_cache_misses'] = cost_cache.misses
+
+        # apply reordering for better learning outcomes
+        pedagogically_ordered_mcqs = self._reorder_mcqs_pedagogically(selected_mcqs)
+
+        return pedagogically_ordered_mcqs
+
+    def select_optimal_mcqs_batch(self, student_ids: List[str], num_questions: int = 50,
+                                  use_chapter_weights: bool = False, confidence: float = 1.0,
+                                  engine: Optional[str] = None, max_workers: Optional[int] = None,
+                                  block_size: Optional[int] = None) -> Dict[str, List[str]]:
+        """
+        Plan sessions for many students: select_optimal_mcqs for each, returned as {student_id: mcq_ids}.
+
+        The whole MCQ bank is packed into one matrix set per batch, keyed by the config version,
+        before any block starts. Each student's candidates are rows of that shared pack (in the
+        student's candidate order), so per student only the skills cost and the row selection are
+        computed. Because every engine selects the same MCQs, the 'loop' engine is scored against
+        the shared pack as 'vectorized'; batch_stats['engine'] is the engine that actually ran.
+
+        Students are split into blocks of block_size (greedy_algorithm.batch_block_size). Blocks
+        run across a ProcessPoolExecutor of max_workers processes (greedy_algorithm.batch_max_workers,
+        default os.cpu_count()) where fork is available, and serially otherwise (e.g. Pyodide) or
+        when max_workers is 1. Worker processes inherit the shared pack and plan on a snapshot of
+        the scheduler: their cache updates are not sent back.
+        """
+        global _BATCH_SCHEDULER
+
+        config = self.config_snapshot
+        engine = engine or config.greedy_engine
+        if engine == 'loop':
+            engine = 'vectorized'
+        block_size = block_size or self.get_config_value('greedy_algorithm.batch_block_size', 64)
+        max_workers = max_workers or self.get_config_value('greedy_algorithm.batch_max_workers', None) or os.cpu_count() or 1
+
+        # Vectors and the packed bank are shared by every student, so build them once before any worker starts
+        bank = None
+        if hasattr(self.kg, 'ultra_loader'):
+            bank_mcqs = [mcq_id for mcq_id in self.kg.ultra_loader.minimal_mcq_data
+                         if self._get_or_create_optimized_mcq_vector(mcq_id)]
+            bank = self._pack_shared_candidate_matrices(bank_mcqs)
+
+        blocks = [list(student_ids[start:start + block_size]) for start in range(0, len(student_ids), block_size)]
+        options = {
+            'num_questions': num_questions,
+            'use_chapter_weights': use_chapter_weights,
+            'confidence': confidence,
+            'engine': engine
+        }
+
+        use_processes = (max_workers > 1 and len(blocks) > 1 and
+                         'fork' in multiprocessing.get_all_start_methods())
+        results = {}
+        self._packed_bank = (config.version, bank) if bank is not None else None
+        try:
+            if use_processes:
+                # Forked workers inherit the scheduler through this module global instead of pickling it
+                _BATCH_SCHEDULER = self
+                try:
+                    with ProcessPoolExecutor(max_workers=min(max_workers, len(blocks)),
+                                             mp_context=multiprocessing.get_context('fork')) as executor:
+                        for block_results in executor.map(_select_optimal_mcqs_block, blocks, [options] * len(blocks)):
+                            results.update(block_results)
+                except (OSError, NotImplementedError) as e:
+                    print(f"⚠️ Process pool unavailable ({e}), planning serially")
+                    use_processes = False
+                    results = {}
+                finally:
+                    _BATCH_SCHEDULER = None
+
+            if not use_processes:
+                for block in blocks:
+                    results.update(self._select_optimal_mcqs_block(block, **options))
+        finally:
+            self._packed_bank = None
+
+        self.batch_stats = {
+            'students': len(student_ids),
+            'blocks': len(blocks),
+            'workers': min(max_workers, len(blocks)) if use_processes else 1,
+            'engine': engine
+        }
+        return results
+
+    def _select_optimal_mcqs_block(self, student_ids: List[str], **options) -> Dict[str, List[str]]:
+        """Plan one block of students, each against its rows of the shared packed bank"""
+        return {student_id: self.select_optimal_mcqs(student_id, **options) for student_id in student_ids}
 
-            print(f"Best MCQ selected: {best_mcq}, best score: {best_ratio}")
-            # Select the best MCQ
-            selected_mcqs.append(best_mcq)
+    def _select_best_mcq_loop(self, eligible_mcqs: List[str], selected_mcqs: List[str],
+                              topic_priorities: Dict[int, float],
+                              simulated_mastery_levels: Dict[int, float],
+                              student: StudentProfile,
+                              confidence: float = 1.0) -> Tuple[Optional[str], float, Optional[Dict]]:
+        """One greedy iteration: score each unselected MCQ in turn and keep the best ratio"""
+        best_mcq = None
+        best_ratio = 0.0
+        best_coverage_info = None
+
+        for mcq_id in eligible_mcqs:
+            if mcq_id in selected_mcqs:  # Skip already selected
+                continue
 
-            # Update virtual mastery and topic priorities
             try:
-                # Update virtual mastery and topic priorities
-                total_topic_coverage_score = self._update_simulated_mastery_and_priorities(best_mcq, simulated_mastery_levels, topic_priorities, best_coverage_info, student)
+                # Ensure vector exists before calculation
+                vector = self._get_or_create_optimized_mcq_vector(mcq_id)
+                if not vector:
+                    print(f"   ⚠️  Skipping MCQ {mcq_id} - no vector available")
+                    continue
+
+                coverage_to_cost_ratio, coverage_info = self._calculate_coverage_to_cost_ratio(mcq_id, topic_priorities, simulated_mastery_levels, student, confidence)
+                self._ratio_evaluations += 1
 
+                if coverage_to_cost_ratio > best_ratio:
+                    best_ratio = coverage_to_cost_ratio
+                    best_mcq = mcq_id
+                    best_coverage_info = coverage_info
+                if best_mcq is None:
+                    break
 
             except Exception as e:
-                print(f"❌ Error updating virtual mastery: {type(e)} - {e}")
+                print(f"   ❌ Error evaluating MCQ {mcq_id}: {type(e)} - {e}")
                 import traceback
                 traceback.print_exc()
-                break
+                # Continue with next MCQ instead of crashing
+                continue
 
-            # Early stopping if improvement is minimal
-            if (greedy_early_stopping and abs(total_topic_coverage_score - last_total_coverage) < greedy_convergence_threshold):
-                print(f"Early stopping: minimal improvement detected")
-                break
+        return best_mcq, best_ratio, best_coverage_info
+
+    def _pack_candidate_matrices(self, eligible_mcqs: List[str], student: StudentProfile,
+                                 skills_costs: Optional[Dict[str, float]] = None) -> Optional['PackedMCQCandidates']:
+        """
+        Pack candidate MCQs into padded sparse matrices for the vectorized engine.
+        Everything that does not change during one greedy run (weights, type factors,
+        importance weights, skills cost) is computed here once. During batch planning
+        the student-independent matrices are row selections of the packed bank.
+        skills_costs: {mcq_id: skills cost} already computed by the caller, if any.
+        """
+        if self._packed_bank is not None and self._packed_bank[0] == self.config_snapshot.version:
+            shared = self._select_packed_rows(self._packed_bank[1], eligible_mcqs)
+        else:
+            shared = self._pack_shared_candidate_matrices(eligible_mcqs)
+        if shared is None:
+            return None
 
-            last_total_coverage = total_topic_coverage_score
+        # Ability levels do not change during a greedy run
+        if skills_costs is not None and all(mcq_id in skills_costs for mcq_id in shared.mcq_ids):
+            skills_cost = np.array([skills_costs[mcq_id] for mcq_id in shared.mcq_ids], dtype=float)
+        else:
+            store = self.kg.ultra_loader.minimal_mcq_data
+            skills_cost = np.abs(self.calculate_skills_mismatch_matrix(store.skill_difficulty[store.rows(shared.mcq_ids)], student)[:, -1])
 
-        print(f"🎯 Greedy selection complete: {selected_mcqs}")
+        return replace(shared, skills_cost=skills_cost, available=np.ones(len(shared.mcq_ids), dtype=bool))
 
-        # apply reordering for better learning outcomes
-        pedagogically_ordered_mcqs = self._reorder_mcqs_pedagogically(selected_mcqs)
+    def _pack_shared_candidate_matrices(self, eligible_mcqs: List[str]) -> Optional['PackedMCQCandidates']:
+        """Student-independent part of _pack_candidate_matrices; skills_cost is left at zero"""
+        config = self.config_snapshot
+        greedy_subtopic_weight = config.greedy_subtopic_weight
+        greedy_prereq_weight = config.greedy_prereq_weight
+        greedy_importance_weight = config.greedy_importance_weight
 
-        return pedagogically_ordered_mcqs
+        mcq_ids = []
+        vectors = []
+        row_of = {}
+        for mcq_id in eligible_mcqs:
+            if mcq_id in row_of:
+                continue
+            vector = self._get_or_create_optimized_mcq_vector(mcq_id)
+            if vector:
+                row_of[mcq_id] = len(mcq_ids)
+                mcq_ids.append(mcq_id)
+                vectors.append(vector)
+
+        if not vectors:
+            return None
+
+        # Weights and difficulties come straight from the loader's column store
+        store = self.kg.ultra_loader.minimal_mcq_data
+        rows = np.array([vector.row for vector in vectors], dtype=np.int64)
+        num_rows = len(vectors)
+
+        subtopic_start = store.subtopic_indptr[rows]
+        subtopic_count = store.subtopic_indptr[rows + 1] - subtopic_start
+        prereq_start = store.prereq_indptr[rows]
+        prereq_count = store.prereq_indptr[rows + 1] - prereq_start
+
+        subtopic_width = max(1, int(subtopic_count.max()))
+        prereq_width = max(1, int(prereq_count.max()))
+        coverage_width = max(1, int((subtopic_count + prereq_count).max()))
+
+        # Gather CSR rows into padded (ELL) topic/weight matrices, position by position
+        subtopic_topics = np.zeros((num_rows, subtopic_width), dtype=np.int64)
+        subtopic_weights = np.zeros((num_rows, subtopic_width))
+        subtopic_present = np.arange(subtopic_width) < subtopic_count[:, None]
+        prereq_topics = np.zeros((num_rows, prereq_width), dtype=np.int64)
+        prereq_weights = np.zeros((num_rows, prereq_width))
+        prereq_present = np.arange(prereq_width) < prereq_count[:, None]
+        for position in range(subtopic_width):
+            present = subtopic_present[:, position]
+            subtopic_topics[present, position] = store.subtopic_indices[subtopic_start[present] + position]
+            subtopic_weights[present, position] = store.subtopic_weights[subtopic_start[present] + position]
+        for position in range(prereq_width):
+            present = prereq_present[:, position]
+            prereq_topics[present, position] = store.prereq_indices[prereq_start[present] + position]
+            prereq_weights[present, position] = store.prereq_weights[prereq_start[present] + position]
+
+        # Compact topic space: only topics touched by some candidate get a column,
+        # plus one trailing padding column that always reads as zero
+        topic_array = np.unique(np.concatenate([subtopic_topics[subtopic_present], prereq_topics[prereq_present]]))
+        topic_indices = topic_array.tolist()
+        padding_column = len(topic_indices)
+
+        subtopic_columns = np.where(subtopic_present, np.searchsorted(topic_array, subtopic_topics), padding_column)
+        prereq_columns = np.where(prereq_present, np.searchsorted(topic_array, prereq_topics), padding_column)
+
+        main_topics = store.main_topics[rows]
+        greedy_subtopic_factors = np.where(subtopic_topics == main_topics[:, None], 1.0, greedy_subtopic_weight)
+
+        out_degrees = np.array([self.kg.get_node_degree(topic_index).get('out_degree', 0)
+                                for topic_index in topic_indices] + [0])
+        importance_weights = out_degrees[subtopic_columns] * subtopic_weights * greedy_importance_weight
+
+        # Same term order as _calculate_weighted_coverage: subtopics, then prerequisites
+        coverage_columns = np.full((num_rows, coverage_width), padding_column, dtype=np.int64)
+        coverage_weights = np.zeros((num_rows, coverage_width))
+        coverage_factors = np.zeros((num_rows, coverage_width))
+        coverage_columns[:, :subtopic_width][subtopic_present] = subtopic_columns[subtopic_present]
+        coverage_weights[:, :subtopic_width][subtopic_present] = subtopic_weights[subtopic_present]
+        coverage_factors[:, :subtopic_width][subtopic_present] = greedy_subtopic_factors[subtopic_present]
+        for position in range(prereq_width):
+            present = np.flatnonzero(prereq_present[:, position])
+            target = subtopic_count[present] + position
+            coverage_columns[present, target] = prereq_columns[present, position]
+            coverage_weights[present, target] = prereq_weights[present, position]
+            coverage_factors[present, target] = greedy_prereq_weight
+
+        subtopic_total_weight = _ell_row_sums(subtopic_weights)
+        difficulty = store.difficulty[rows]
+
+        column_rows, column_rows_indptr = _column_row_index(coverage_columns, padding_column)
+
+        return PackedMCQCandidates(
+            mcq_ids=mcq_ids,
+            row_of=row_of,
+            topic_indices=topic_indices,
+            coverage_columns=coverage_columns,
+            coverage_weights=coverage_weights,
+            coverage_factors=coverage_factors,
+            subtopic_columns=subtopic_columns,
+            subtopic_weights=subtopic_weights,
+            importance_weights=importance_weights,
+            subtopic_total_weight=subtopic_total_weight,
+            difficulty=difficulty,
+            skills_cost=np.zeros(num_rows),
+            column_rows=column_rows,
+            column_rows_indptr=column_rows_indptr,
+            available=np.ones(num_rows, dtype=bool),
+            topic_array=topic_array
+        )
+
+    def _select_packed_rows(self, bank: 'PackedMCQCandidates',
+                            eligible_mcqs: List[str]) -> Optional['PackedMCQCandidates']:
+        """
+        The rows of a packed bank for eligible_mcqs, in eligible order, as their own
+        PackedMCQCandidates: the same matrices _pack_shared_candidate_matrices would build,
+        with topic columns compacted to the topics these rows touch.
+        """
+        mcq_ids = [mcq_id for mcq_id in dict.fromkeys(eligible_mcqs) if mcq_id in bank.row_of]
+        if not mcq_ids:
+            return None
+        rows = np.array([bank.row_of[mcq_id] for mcq_id in mcq_ids], dtype=np.int64)
+
+        # Renumber the bank columns these rows touch; the bank padding column maps to the new one
+        bank_padding = len(bank.topic_indices)
+        coverage_columns = bank.coverage_columns[rows]
+        used_columns = np.unique(coverage_columns[coverage_columns != bank_padding])
+        padding_column = len(used_columns)
+        renumber = np.full(bank_padding + 1, padding_column, dtype=np.int64)
+        renumber[used_columns] = np.arange(padding_column)
+        coverage_columns = renumber[coverage_columns]
+
+        column_rows, column_rows_indptr = _column_row_index(coverage_columns, padding_column)
+        topic_array = bank.topic_array[used_columns]
+
+        return PackedMCQCandidates(
+            mcq_ids=mcq_ids,
+            row_of={mcq_id: row for row, mcq_id in enumerate(mcq_ids)},
+            topic_indices=topic_array.tolist(),
+            coverage_columns=coverage_columns,
+            coverage_weights=bank.coverage_weights[rows],
+            coverage_factors=bank.coverage_factors[rows],
+            subtopic_columns=renumber[bank.subtopic_columns[rows]],
+            subtopic_weights=bank.subtopic_weights[rows],
+            importance_weights=bank.importance_weights[rows],
+            subtopic_total_weight=bank.subtopic_total_weight[rows],
+            difficulty=bank.difficulty[rows],
+            skills_cost=np.zeros(len(mcq_ids)),
+            column_rows=column_rows,
+            column_rows_indptr=column_rows_indptr,
+            available=np.ones(len(mcq_ids), dtype=bool),
+            topic_array=topic_array
+        )
+
+    def _packed_topic_state(self, packed: 'PackedMCQCandidates',
+                            topic_priorities: 'TopicPriorityVector',
+                            simulated_mastery_levels: Dict[int, float],
+                            student: StudentProfile) -> Tuple[Tuple[np.ndarray, np.ndarray, np.ndarray], np.ndarray]:
+        """
+        Priority, due-mask and mastery vectors over the packed topic columns, plus the
+        columns that changed since the previous call for the same packing.
+        The first call builds every column; later calls copy the previous state and
+        rewrite only the columns of topics in the priority change log.
+        The trailing padding column stays zero.
+        """
+        changed_topics = topic_priorities.changed_topics()
+        num_columns = len(packed.topic_indices)
+
+        if packed.topic_state is None:
+            priorities = np.zeros(num_columns + 1)
+            due_mask = np.zeros(num_columns + 1)
+            mastery = np.zeros(num_columns + 1)
+            columns = np.arange(num_columns)
+            topics = packed.topic_indices
+            priorities[:num_columns], due = topic_priorities.gather(packed.topic_array)
+            due_mask[:num_columns] = due
+        else:
+            priorities, due_mask, mastery = (vector.copy() for vector in packed.topic_state)
+            columns = packed.columns_for_topics(changed_topics)
+            topics = packed.topic_array[columns].tolist()
+            priorities[columns], due = topic_priorities.gather(packed.topic_array[columns])
+            due_mask[columns] = due
+
+        for column, topic_index in zip(columns.tolist(), topics):
+            mastery[column] = simulated_mastery_levels.get(topic_index, student.get_mastery(topic_index))
+
+        packed.topic_state = (priorities, due_mask, mastery)
+        return packed.topic_state, columns
+
+    def _score_packed_candidates(self, packed: 'PackedMCQCandidates',
+                                 topic_state: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                                 confidence: float = 1.0,
+                                 rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized _calculate_coverage_to_cost_ratio for packed candidates (all rows by default).
+        Returns (ratios, coverage, importance_bonus) arrays aligned with rows.
+        """
+        config = self.config_snapshot
+        greedy_difficulty_penalty = config.greedy_difficulty_penalty
+        greedy_too_easy_penalty = config.greedy_too_easy_penalty
+        skills_weight = config.skills_breakdown_weight
+        overall_weight = config.overall_difficulty_weight
+
+        priorities, due_mask, mastery = topic_state
+        if rows is None:
+            rows = slice(None)
+
+        # Coverage: sparse matrix-vector product against the priority vector
+        coverage = _ell_row_sums(packed.coverage_weights[rows] * priorities[packed.coverage_columns[rows]] * packed.coverage_factors[rows])
+
+        # Weighted mastery over the subtopics of each candidate
+        subtopic_columns = packed.subtopic_columns[rows]
+        subtopic_total_weight = packed.subtopic_total_weight[rows]
+        weighted_mastery = _ell_row_sums(mastery[subtopic_columns] * packed.subtopic_weights[rows])
+        has_weight = subtopic_total_weight > 0
+        weighted_mastery[has_weight] /= subtopic_total_weight[has_weight]
 
+        # Overall difficulty mismatch, too easy vs too hard
+        difficulty = packed.difficulty[rows]
+        overall_difficulty_diff = np.abs(difficulty - weighted_mastery)
+        overall_cost = np.where(difficulty < weighted_mastery,
+                                overall_difficulty_diff * greedy_too_easy_penalty,
+                                overall_difficulty_diff * greedy_difficulty_penalty)
+
+        difficulty_cost = (skills_weight * packed.skills_cost[rows] + overall_weight * overall_cost)
+        difficulty_cost = difficulty_cost * self._confidence_penalty_multiplier(confidence)
+
+        # Importance bonus only counts due subtopics
+        importance_bonus = _ell_row_sums(packed.importance_weights[rows] * due_mask[subtopic_columns])
+
+        total_cost = np.maximum(0.01, difficulty_cost - importance_bonus)
+        ratios = np.where(coverage == 0, 0.0, coverage / total_cost)
+
+        return ratios, coverage, importance_bonus
+
+    def _select_best_mcq_vectorized(self, packed: 'PackedMCQCandidates',
+                                    topic_priorities: Dict[int, float],
+                                    simulated_mastery_levels: Dict[int, float],
+                                    student: StudentProfile,
+                                    confidence: float = 1.0) -> Tuple[Optional[str], float, Optional[Dict]]:
+        """
+        One greedy iteration over packed candidates.
+        Mirrors _select_best_mcq_loop: first strictly best ratio wins, and nothing is
+        selected when the first unselected candidate scores zero.
+        """
+        available_rows = np.flatnonzero(packed.available)
+        if available_rows.size == 0:
+            return None, 0.0, None
+
+        topic_state, _ = self._packed_topic_state(packed, topic_priorities, simulated_mastery_levels, student)
+        ratios, _, _ = self._score_packed_candidates(packed, topic_state, confidence, available_rows)
+        self._ratio_evaluations += available_rows.size
+
+        if not ratios[0] > 0.0:
+            return None, 0.0, None
+
+        best_position = int(np.argmax(ratios))
+        best_mcq = packed.mcq_ids[available_rows[best_position]]
+
+        # Full coverage breakdown for the winner only
+        best_coverage_info = self._calculate_weighted_coverage(
+            self.mcq_vectors[best_mcq], topic_priorities, simulated_mastery_levels)
+
+        return best_mcq, float(ratios[best_position]), best_coverage_info
+
+    def _build_lazy_greedy_queue(self, packed: 'PackedMCQCandidates',
+                                 topic_priorities: Dict[int, float],
+                                 simulated_mastery_levels: Dict[int, float],
+                                 student: StudentProfile,
+                                 confidence: float = 1.0) -> 'LazyGreedyQueue':
+        """Score every candidate once and seed the lazy-greedy heap with exact ratios"""
+        config = self.config_snapshot
+        skills_weight = config.skills_breakdown_weight
+
+        topic_state, _ = self._packed_topic_state(packed, topic_priorities, simulated_mastery_levels, student)
+        ratios, coverage, importance_bonus = self._score_packed_candidates(packed, topic_state, confidence)
+        self._ratio_evaluations += len(packed.mcq_ids)
+
+        # The overall-difficulty term is never negative, so the skills term alone
+        # bounds the difficulty cost from below for the whole run
+        cost_floor = skills_weight * packed.skills_cost * self._confidence_penalty_multiplier(confidence)
+
+        return LazyGreedyQueue(packed, topic_state, ratios, coverage, importance_bonus, cost_floor)
+
+    def _refresh_lazy_rows(self, queue: 'LazyGreedyQueue', rows: np.ndarray, confidence: float = 1.0):
+        """Re-evaluate stale candidates exactly and push them back onto the heap"""
+        if rows.size == 0:
+            return
+        ratios, coverage, importance_bonus = self._score_packed_candidates(
+            queue.packed, queue.topic_state, confidence, rows)
+        self._ratio_evaluations += rows.size
+        queue.refresh(rows, ratios, coverage, importance_bonus)
+
+    def _select_best_mcq_lazy(self, queue: 'LazyGreedyQueue',
+                              topic_priorities: Dict[int, float],
+                              simulated_mastery_levels: Dict[int, float],
+                              student: StudentProfile,
+                              confidence: float = 1.0) -> Tuple[Optional[str], float, Optional[Dict]]:
+        """
+        One lazy-greedy (CELF) iteration.
+        Only candidates touching topics that changed since the last pick are marked stale,
+        and a stale candidate is re-evaluated only when its upper bound reaches the top
+        of the heap. Selects the same MCQ as _select_best_mcq_loop.
+        """
+        packed = queue.packed
+        available_rows = np.flatnonzero(packed.available)
+        if available_rows.size == 0:
+            return None, 0.0, None
+
+        topic_state, changed_columns = self._packed_topic_state(packed, topic_priorities, simulated_mastery_levels, student)
+        affected_rows, bounds_hold = queue.affected_rows(topic_state, changed_columns)
+        if bounds_hold:
+            queue.mark_stale(affected_rows)
+        else:
+            # A priority went up, so stale values are no longer upper bounds
+            self._refresh_lazy_rows(queue, affected_rows, confidence)
+
+        # The loop engine stops when the first unselected candidate scores zero
+        first_row = available_rows[0]
+        if not queue.fresh[first_row]:
+            self._refresh_lazy_rows(queue, available_rows[:1], confidence)
+        if not queue.ratios[first_row] > 0.0:
+            return None, 0.0, None
+
+        while True:
+            best_row = queue.pop()
+            if best_row is None:
+                return None, 0.0, None
+            if queue.fresh[best_row]:
+                break
+            self._refresh_lazy_rows(queue, np.array([best_row]), confidence)
+
+        best_mcq = packed.mcq_ids[best_row]
+
+        # Full coverage breakdown for the winner only
+        best_coverage_info = self._calculate_weighted_coverage(
+            self.mcq_vectors[best_mcq], topic_priorities, simulated_mastery_levels)
+
+        return best_mcq, float(queue.ratios[best_row]), best_coverage_info
 
     def _calculate_quick_priority_score(self, mcq_id: str, student: StudentProfile) -> float:
         """Quick scoring for performance optimization when too many MCQs available
@@ -3234,7 +5580,8 @@ class MCQScheduler:
         if not mcq_vector:
             return 0.0
         # Get greedy priority weight from config
-        greedy_priority_weight = self.get_config_value('greedy_algorithm.greedy_priority_weight', 2.0)
+        config = self.config_snapshot
+        greedy_priority_weight = config.greedy_priority_weight
 
         # Simple score based on average topic need
         total_need = 0.0
@@ -3246,16 +5593,18 @@ class MCQScheduler:
         return total_need
 
     def _calculate_topic_priorities_due_only(self, student: StudentProfile,
-                                            simulated_mastery_levels: Dict[int, float]) -> Dict[int, float]:
+                                            simulated_mastery_levels: Dict[int, float]) -> 'TopicPriorityVector':
         """
         Calculate continuous priority scores for topics below mastery threshold.
         Lower mastery = higher priority
+        Returns a TopicPriorityVector with an empty change log.
         """
         # Get config values
-        mastery_threshold = self.get_config_value('algorithm_config.mastery_threshold', 0.7)
-        greedy_priority_weight = self.get_config_value('greedy_algorithm.greedy_priority_weight', 2.0)
+        config = self.config_snapshot
+        mastery_threshold = config.mastery_threshold
+        greedy_priority_weight = config.greedy_priority_weight
 
-        topic_priorities = {}
+        topic_priorities = TopicPriorityVector(max(self.kg.nodes, default=-1) + 1)
 
         for main_topic_index in student.studied_topics:
             if student.is_topic_studied(main_topic_index):
@@ -3267,6 +5616,7 @@ class MCQScheduler:
                     priority = (1.0 - mastery) * greedy_priority_weight
                     topic_priorities[main_topic_index] = priority
 
+        topic_priorities.changed_topics()
         return topic_priorities
 
     def _calculate_weighted_coverage(self, mcq_vector: OptimizedMCQVector,topic_priorities: Dict[int, float],simulated_mastery_levels: Dict[int, float]) -> Dict:
@@ -3275,8 +5625,9 @@ class MCQScheduler:
         Returns coverage score and breakdown.
         """
         # Get config values
-        greedy_subtopic_weight = self.get_config_value('greedy_algorithm.greedy_subtopic_weight', 0.7)
-        greedy_prereq_weight = self.get_config_value('greedy_algorithm.greedy_prereq_weight', 0.5)
+        config = self.config_snapshot
+        greedy_subtopic_weight = config.greedy_subtopic_weight
+        greedy_prereq_weight = config.greedy_prereq_weight
 
         total_topic_coverage_score = 0.0
         coverage_details = {'main_topic_coverage': 0.0,'subtopic_coverage': 0.0,'prereq_coverage': 0.0}
@@ -3325,8 +5676,9 @@ class MCQScheduler:
                 mcq_id, simulated_mastery_levels, topic_priorities, coverage_info, student)
 
         # Get config values
-        mastery_threshold = self.get_config_value('algorithm_config.mastery_threshold', 0.7)
-        greedy_priority_weight = self.get_config_value('greedy_algorithm.greedy_priority_weight', 2.0)
+        config = self.config_snapshot
+        mastery_threshold = config.mastery_threshold
+        greedy_priority_weight = config.greedy_priority_weight
 
         # Get MCQ data (use existing pattern from process_mcq_response_improved)
         if hasattr(self.kg, 'ultra_loader'):
@@ -3381,7 +5733,7 @@ class MCQScheduler:
             topic_priorities.pop(topic_index, None)
 
         # Apply area of effect simulation if enabled
-        enable_virtual_area_effects = self.get_config_value('greedy_algorithm.enable_virtual_area_effects', True)
+        enable_virtual_area_effects = config.enable_virtual_area_effects
         if (enable_virtual_area_effects and
             self.bkt_system and
             hasattr(self.bkt_system, 'is_area_effect_enabled') and
@@ -3426,88 +5778,50 @@ class MCQScheduler:
         mastery_threshold = self.get_config_value('algorithm_config.mastery_threshold', 0.7)
         greedy_priority_weight = self.get_config_value('greedy_algorithm.greedy_priority_weight', 2.0)
 
-        # Use NetworkX to find paths (same logic as apply_area_of_effect)
-        undirected_graph = self.kg.graph.to_undirected()
-
-        try:
-            paths = nx.single_source_shortest_path(undirected_graph, center_topic_index, cutoff=max_distance)
-        except Exception:
-            return []
-
-        # Remove center node
-        paths.pop(center_topic_index, None)
+        # Precomputed neighbourhood (same kernel as apply_area_of_effect)
+        kernel = self.kg.get_influence_kernel(max_distance, decay_rate)
 
         updates = []
         topics_to_remove = []
 
-        for topic_index, path in paths.items():
-            distance = len(path) - 1
-
-            # Calculate path weight (same logic as _calculate_path_weight)
-            path_weight = self._calculate_path_weight_safe(path)
-
-            # Calculate effect (same formula as apply_area_of_effect)
-            base_effect = mastery_change * (decay_rate ** distance)
-            final_effect = base_effect * path_weight
-
-            if final_effect > min_effect:
-                current_mastery = simulated_mastery_levels.get(topic_index, student.get_mastery(topic_index))
-                new_mastery = min(1.0, current_mastery + final_effect)
-
-                # Update virtual mastery (not real student data)
-                simulated_mastery_levels[topic_index] = new_mastery
-
-                # Calculate coverage boost
-                coverage_boost = 0.0
-                if topic_index in topic_priorities:
-                    coverage_boost = topic_priorities[topic_index] * final_effect * 0.3  # Reduced weight for area effects
-
-                # Update topic priorities
-                if topic_index in topic_priorities:
-                    if new_mastery >= mastery_threshold:
-                        topics_to_remove.append(topic_index)
-                    else:
-                        new_priority = (1.0 - new_mastery) ** greedy_priority_weight
-                        topic_priorities[topic_index] = new_priority
-
-                updates.append({
-                    'topic_index': topic_index,
-                    'center_topic': center_topic_index,
-                    'distance': distance,
-                    'effect_strength': final_effect,
-                    'mastery_change': new_mastery - current_mastery,
-                    'coverage_boost': coverage_boost,
-                    'update_type': 'area_effect_simulation'
-                })
-
-        # Remove topics that reached mastery threshold
-        for topic_index in topics_to_remove:
-            topic_priorities.pop(topic_index, None)
-
-        return updates
+        for topic_index, distance, path_weight, final_effect, path in kernel.neighbours(
+                center_topic_index, mastery_change, min_effect):
+            current_mastery = simulated_mastery_levels.get(topic_index, student.get_mastery(topic_index))
+            new_mastery = min(1.0, current_mastery + final_effect)
 
-    def _calculate_path_weight_safe(self, path: List[int]) -> float:
-        """Calculate path weight with error handling (same as existing _calculate_path_weight)"""
-        if len(path) < 2:
-            return 1.0
+            # Update virtual mastery (not real student data)
+            simulated_mastery_levels[topic_index] = new_mastery
+            if isinstance(topic_priorities, TopicPriorityVector):
+                topic_priorities.touch(topic_index)
 
-        total_weight = 1.0
-        for i in range(len(path) - 1):
-            source, target = path[i], path[i + 1]
-            edge_weight = 0.5  # Default weight
+            # Calculate coverage boost
+            coverage_boost = 0.0
+            if topic_index in topic_priorities:
+                coverage_boost = topic_priorities[topic_index] * final_effect * 0.3  # Reduced weight for area effects
 
-            try:
-                if self.kg.graph.has_edge(source, target):
-                    edge_weight = self.kg.graph[source][target].get('weight', 0.5)
-                elif self.kg.graph.has_edge(target, source):
-                    edge_weight = self.kg.graph[target][source].get('weight', 0.5)
-            except Exception:
-                edge_weight = 0.5
+            # Update topic priorities
+            if topic_index in topic_priorities:
+                if new_mastery >= mastery_threshold:
+                    topics_to_remove.append(topic_index)
+                else:
+                    new_priority = (1.0 - new_mastery) ** greedy_priority_weight
+                    topic_priorities[topic_index] = new_priority
 
-            total_weight *= edge_weight
+            updates.append({
+                'topic_index': topic_index,
+                'center_topic': center_topic_index,
+                'distance': distance,
+                'effect_strength': final_effect,
+                'mastery_change': new_mastery - current_mastery,
+                'coverage_boost': coverage_boost,
+                'update_type': 'area_effect_simulation'
+            })
 
-        return total_weight
+        # Remove topics that reached mastery threshold
+        for topic_index in topics_to_remove:
+            topic_priorities.pop(topic_index, None)
 
+        return updates
 
     def _update_simulated_mastery_fallback(self, mcq_id: str,
                                         simulated_mastery_levels: Dict[int, float],
@@ -3612,41 +5926,22 @@ class MCQScheduler:
         return coverage_to_cost_ratio, coverage_info
 
 
-    def calculate_skills_difficulty_mismatch(self, mcq_vector: OptimizedMCQVector, student) -> Dict[str, float]:
+    def _resolve_skills_student(self, student) -> Optional[StudentProfile]:
         """
-        FIXED VERSION: Calculate mismatch between student abilities and question difficulty requirements.
+        StudentProfile for the skills mismatch: accepts a profile or a dict with student_id.
+        Returns None when the student cannot be found.
         """
-
         # Handle both StudentProfile objects and dictionaries safely
         if isinstance(student, dict):
             student_id = student.get('student_id')
-            if student_id:
-                actual_student = self.student_manager.get_student(student_id)
-                if actual_student:
-                    student = actual_student
-                else:
-                    print(f"⚠️  Warning: Could not find StudentProfile for {student_id}")
-                    # Return default penalties with total_skills_penalty
-                    return {
-                        'problem_solving': 0.0,
-                        'procedural_fluency': 0.0,
-                        'conceptual_understanding': 0.0,
-                        'mathematical_communication': 0.0,
-                        'memory': 0.0,
-                        'spatial_reasoning': 0.0,
-                        'total_skills_penalty': 0.0
-                    }
-            else:
+            if not student_id:
                 print("⚠️  Warning: Student dict has no student_id")
-                return {
-                    'problem_solving': 0.0,
-                    'procedural_fluency': 0.0,
-                    'conceptual_understanding': 0.0,
-                    'mathematical_communication': 0.0,
-                    'memory': 0.0,
-                    'spatial_reasoning': 0.0,
-                    'total_skills_penalty': 0.0
-                }
+                return None
+            actual_student = self.student_manager.get_student(student_id)
+            if not actual_student:
+                print(f"⚠️  Warning: Could not find StudentProfile for {student_id}")
+                return None
+            student = actual_student
 
         # Ensure student has ability_levels attribute
         if not hasattr(student, 'ability_levels'):
@@ -3659,55 +5954,100 @@ class MCQScheduler:
                 'memory': 0.5,
                 'spatial_reasoning': 0.5
             }
+        return student
 
-        # Get configuration weights with defaults
-        config_weights = self.config.get('algorithm_config.skill_difficulty_weights', {
-            'problem_solving_penalty': 0.0,
-            'procedural_penalty': 0.0,
-            'conceptual_penalty': 0.0,
-            'memory_penalty': 0.0,
-            'communication_penalty': 0.0,
-            'spatial_penalty': 0.0,
-            'student_offset': 0.0
-        })
+    def calculate_skills_mismatch_matrix(self, skill_difficulties: np.ndarray, student) -> np.ndarray:
+        """
+        Vectorized calculate_skills_difficulty_mismatch for many MCQs at once.
+        skill_difficulties is (n, 6) in DIFFICULTY_SKILLS order (MCQColumnStore.skill_difficulty rows).
+        Returns (n, 7): the six skill penalties in DIFFICULTY_SKILLS order, then total_skills_penalty
+        summed in the scalar version's skill order so totals match it exactly.
+        """
+        skill_difficulties = np.asarray(skill_difficulties, dtype=float).reshape(-1, len(DIFFICULTY_SKILLS))
+        penalties = np.zeros((skill_difficulties.shape[0], len(DIFFICULTY_SKILLS) + 1))
+
+        student = self._resolve_skills_student(student)
+        if student is None:
+            return penalties
+
+        config = self.config_snapshot
+        abilities = np.array([student.ability_levels.get(skill, 0.5) for skill in DIFFICULTY_SKILLS]) + config.skill_student_offset
+        penalty_weights = np.array([config.skill_penalty_weights[skill] for skill in DIFFICULTY_SKILLS])
+
+        penalties[:, :-1] = -penalty_weights * np.abs(abilities - skill_difficulties)
+        for skill in _SKILL_PENALTY_ORDER:
+            penalties[:, -1] += penalties[:, DIFFICULTY_SKILLS.index(skill)]
+        return penalties
+
+    def _skills_based_cost(self, mcq_vector: OptimizedMCQVector, student: StudentProfile) -> float:
+        """|total_skills_penalty| of an MCQ, from the per-call cache when select_optimal_mcqs has one"""
+        cache = self._skills_cost_cache
+        if cache is not None and cache[0] is student:
+            cost = cache[1].get(mcq_vector.mcq_id)
+            if cost is not None:
+                return cost
+        return abs(self.calculate_skills_difficulty_mismatch(mcq_vector, student)['total_skills_penalty'])
+
+    def calculate_skills_difficulty_mismatch(self, mcq_vector: OptimizedMCQVector, student) -> Dict[str, float]:
+        """
+        FIXED VERSION: Calculate mismatch between student abilities and question difficulty requirements.
+        """
+
+        student = self._resolve_skills_student(student)
+        if student is None:
+            # Return default penalties with total_skills_penalty
+            return {
+                'problem_solving': 0.0,
+                'procedural_fluency': 0.0,
+                'conceptual_understanding': 0.0,
+                'mathematical_communication': 0.0,
+                'memory': 0.0,
+                'spatial_reasoning': 0.0,
+                'total_skills_penalty': 0.0
+            }
+
+        # Get configuration weights with defaults (resolved once per config version)
+        config = self.config_snapshot
+        student_offset = config.skill_student_offset
+        penalty_weights = config.skill_penalty_weights
 
         skill_penalties = {}
 
         # Problem-solving skills mismatch
-        student_problem_solving = student.ability_levels.get('problem_solving', 0.5) + config_weights.get('student_offset', 0.1)
+        student_problem_solving = student.ability_levels.get('problem_solving', 0.5) + student_offset
         question_problem_solving = mcq_vector.difficulty_breakdown.problem_solving
         problem_solving_mismatch = student_problem_solving - question_problem_solving
-        skill_penalties['problem_solving'] = -config_weights.get('problem_solving_penalty', 0.2) * abs(problem_solving_mismatch)
+        skill_penalties['problem_solving'] = -penalty_weights['problem_solving'] * abs(problem_solving_mismatch)
 
         # Procedural fluency mismatch
-        student_procedural = student.ability_levels.get('procedural_fluency', 0.5) + config_weights.get('student_offset', 0.1)
+        student_procedural = student.ability_levels.get('procedural_fluency', 0.5) + student_offset
         question_procedural = mcq_vector.difficulty_breakdown.procedural_fluency
         procedural_mismatch = student_procedural - question_procedural
-        skill_penalties['procedural_fluency'] = -config_weights.get('procedural_penalty', 0.15) * abs(procedural_mismatch)
+        skill_penalties['procedural_fluency'] = -penalty_weights['procedural_fluency'] * abs(procedural_mismatch)
 
         # Conceptual understanding mismatch
-        student_conceptual = student.ability_levels.get('conceptual_understanding', 0.5) + config_weights.get('student_offset', 0.1)
+        student_conceptual = student.ability_levels.get('conceptual_understanding', 0.5) + student_offset
         question_conceptual = mcq_vector.difficulty_breakdown.conceptual_understanding
         conceptual_mismatch = student_conceptual - question_conceptual
-        skill_penalties['conceptual_understanding'] = -config_weights.get('conceptual_penalty', 0.15) * abs(conceptual_mismatch)
+        skill_penalties['conceptual_understanding'] = -penalty_weights['conceptual_understanding'] * abs(conceptual_mismatch)
 
         # Memory requirement mismatch
-        student_memory = student.ability_levels.get('memory', 0.5) + config_weights.get('student_offset', 0.1)
+        student_memory = student.ability_levels.get('memory', 0.5) + student_offset
         question_memory = mcq_vector.difficulty_breakdown.memory
         memory_mismatch = student_memory - question_memory
-        skill_penalties['memory'] = -config_weights.get('memory_penalty', 0.1) * abs(memory_mismatch)
+        skill_penalties['memory'] = -penalty_weights['memory'] * abs(memory_mismatch)
 
         # Mathematical communication mismatch
-        student_communication = student.ability_levels.get('mathematical_communication', 0.5) + config_weights.get('student_offset', 0.1)
+        student_communication = student.ability_levels.get('mathematical_communication', 0.5) + student_offset
         question_communication = mcq_vector.difficulty_breakdown.mathematical_communication
         communication_mismatch = student_communication - question_communication
-        skill_penalties['mathematical_communication'] = -config_weights.get('communication_penalty', 0.1) * abs(communication_mismatch)
+        skill_penalties['mathematical_communication'] = -penalty_weights['mathematical_communication'] * abs(communication_mismatch)
 
         # Spatial reasoning mismatch
-        student_spatial = student.ability_levels.get('spatial_reasoning', 0.5) + config_weights.get('student_offset', 0.1)
+        student_spatial = student.ability_levels.get('spatial_reasoning', 0.5) + student_offset
         question_spatial = mcq_vector.difficulty_breakdown.spatial_reasoning
         spatial_mismatch = student_spatial - question_spatial
-        skill_penalties['spatial_reasoning'] = -config_weights.get('spatial_penalty', 0.1) * abs(spatial_mismatch)
+        skill_penalties['spatial_reasoning'] = -penalty_weights['spatial_reasoning'] * abs(spatial_mismatch)
 
         # Calculate and include total_skills_penalty
         total_penalty = sum(skill_penalties.values())
@@ -3723,17 +6063,22 @@ class MCQScheduler:
         Calculate difficulty mismatch cost with confidence-based reduction.
         Lower confidence = reduced penalties = more exploration.
         """
-        # Get config values
-        confidence_cap = self.get_config_value('confidence_algorithm.confidence_cap', 0.8)
-        difficulty_reduction_factor = self.get_config_value('confidence_algorithm.difficulty_reduction_factor', 0.5)
-        min_difficulty_penalty = self.get_config_value('confidence_algorithm.min_difficulty_penalty', 0.1)
-
         # Calculate base difficulty cost (existing logic)
         base_difficulty_cost = self._calculate_base_difficulty_cost(mcq_vector, simulated_mastery_levels, student)
 
+        return base_difficulty_cost * self._confidence_penalty_multiplier(confidence)
+
+    def _confidence_penalty_multiplier(self, confidence: float = 1.0) -> float:
+        """Multiplier applied to the base difficulty cost; 1.0 at or above the confidence cap"""
+        # Get config values
+        config = self.config_snapshot
+        confidence_cap = config.confidence_cap
+        difficulty_reduction_factor = config.difficulty_reduction_factor
+        min_difficulty_penalty = config.min_difficulty_penalty
+
         # Apply confidence-based reduction only if below cap
         if confidence >= confidence_cap:
-            return base_difficulty_cost
+            return 1.0
 
         # Calculate reduction factor based on confidence
         confidence_below_cap = confidence_cap - confidence
@@ -3742,24 +6087,38 @@ class MCQScheduler:
 
         # Apply reduction but maintain minimum penalty
         penalty_multiplier = 1.0 - (reduction_ratio * difficulty_reduction_factor)
-        penalty_multiplier = max(penalty_multiplier, min_difficulty_penalty)
-
-        return base_difficulty_cost * penalty_multiplier
+        return max(penalty_multiplier, min_difficulty_penalty)
 
     def _calculate_base_difficulty_cost(self, mcq_vector: OptimizedMCQVector, simulated_mastery_levels: Dict[int, float], student: StudentProfile) -> float:
         """
         Calculate cost based on difficulty mismatch.
         Questions too hard or too easy get penalized.
+        Reuses the value from the greedy call's GreedyCostCache while the MCQ's subtopic masteries are unchanged.
         """
+        cache = self._cost_cache
+        if cache is None or not cache.applies_to(student, simulated_mastery_levels):
+            return self._compute_base_difficulty_cost(mcq_vector, simulated_mastery_levels, student)
+
+        cost = cache.base_difficulty_cost.get(mcq_vector.mcq_id)
+        if cost is not None:
+            cache.hits += 1
+            return cost
+
+        cache.misses += 1
+        cost = self._compute_base_difficulty_cost(mcq_vector, simulated_mastery_levels, student)
+        cache.base_difficulty_cost[mcq_vector.mcq_id] = cost
+        cache.register(mcq_vector.mcq_id, mcq_vector.subtopic_weights)
+        return cost
+
+    def _compute_base_difficulty_cost(self, mcq_vector: OptimizedMCQVector, simulated_mastery_levels: Dict[int, float], student: StudentProfile) -> float:
+        """Uncached base difficulty cost: static skills cost plus the mastery-dependent overall term"""
         # Get penalty values from config
-        greedy_difficulty_penalty = self.get_config_value('greedy_algorithm.greedy_difficulty_penalty', 1.5)
-        greedy_too_easy_penalty = self.get_config_value('greedy_algorithm.greedy_too_easy_penalty', 1.5)
-
-        # Calculate skills-based difficulty mismatch
-        skills_analysis = self.calculate_skills_difficulty_mismatch(mcq_vector, student)
+        config = self.config_snapshot
+        greedy_difficulty_penalty = config.greedy_difficulty_penalty
+        greedy_too_easy_penalty = config.greedy_too_easy_penalty
 
-        # Use the total skills penalty as the base difficulty cost
-        skills_based_cost = abs(skills_analysis['total_skills_penalty'])
+        # Skills-based difficulty mismatch: the total skills penalty is the base difficulty cost
+        skills_based_cost = self._skills_based_cost(mcq_vector, student)
 
 
         # Calculate weighted student ability for this MCQ
@@ -3785,8 +6144,8 @@ class MCQScheduler:
 
         # Combine skills-based cost with overall difficulty cost
         # Weight the skills component higher since it's more granular
-        skills_weight = self.get_config_value('greedy_algorithm.skills_breakdown_weight', 2.0)
-        overall_weight = self.get_config_value('greedy_algorithm.overall_difficulty_weight', 1.0)
+        skills_weight = config.skills_breakdown_weight
+        overall_weight = config.overall_difficulty_weight
 
         total_difficulty_cost = (skills_weight * skills_based_cost +
                                 overall_weight * overall_cost)
@@ -3797,9 +6156,42 @@ class MCQScheduler:
         """
         Calculate bonus for covering important topics.
         Topics with many dependencies are more important.
+        During a loop-engine greedy call the per-topic weights are static and the bonus is
+        reused until one of the MCQ's subtopics stops (or starts) being due.
         """
+        cache = self._cost_cache
+        if cache is None or topic_priorities is not cache.topic_priorities:
+            return self._compute_importance_bonus(mcq_vector, topic_priorities)
+
+        bonus = cache.importance_bonus.get(mcq_vector.mcq_id)
+        if bonus is not None:
+            cache.hits += 1
+            return bonus
+
+        cache.misses += 1
+        entries = cache.importance_entries.get(mcq_vector.mcq_id)
+        if entries is None:
+            entries = cache.importance_entries[mcq_vector.mcq_id] = self._importance_entries(mcq_vector)
+            cache.register(mcq_vector.mcq_id, mcq_vector.subtopic_weights)
+
+        bonus = 0.0
+        for topic_index, topic_importance in entries:
+            if topic_index in topic_priorities:
+                bonus += topic_importance
+        cache.importance_bonus[mcq_vector.mcq_id] = bonus
+        return bonus
+
+    def _importance_entries(self, mcq_vector: OptimizedMCQVector) -> List[Tuple[int, float]]:
+        """Static (topic, out_degree * weight * importance weight) terms of the importance bonus"""
+        greedy_importance_weight = self.config_snapshot.greedy_importance_weight
+        return [(topic_index, self.kg.get_node_degree(topic_index).get('out_degree', 0) * mcq_weight * greedy_importance_weight)
+                for topic_index, mcq_weight in mcq_vector.subtopic_weights.items()]
+
+    def _compute_importance_bonus(self, mcq_vector: OptimizedMCQVector, topic_priorities: Dict[int, float]) -> float:
+        """Uncached importance bonus"""
         # Get importance weight from config
-        greedy_importance_weight = self.get_config_value('greedy_algorithm.greedy_importance_weight', 0.3)
+        config = self.config_snapshot
+        greedy_importance_weight = config.greedy_importance_weight
 
         importance_bonus = 0.0
 
@@ -4360,49 +6752,257 @@ class FSRSForgettingConfig:
 
 
 
+_FSRS_EPOCH = datetime(1970, 1, 1)
+_NO_REVIEW = np.iinfo(np.int64).min  # last_review_us of a topic that was never reviewed
+_NO_DUE = np.iinfo(np.int64).max     # due_us of a topic whose retention never crosses the threshold
+
+
+def _epoch_microseconds(moment: datetime) -> int:
+    """Exact integer microseconds since the epoch; naive datetimes are taken as-is, aware ones as UTC"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - _FSRS_EPOCH) // timedelta(microseconds=1)
+
+
+class FSRSMemoryColumns(Mapping):
+    """
+    One student's FSRS memory state as parallel NumPy arrays with a slot per topic:
+    stability, difficulty, retrievability, last_review_us (epoch microseconds, _NO_REVIEW
+    when unset), review_count and recent_success_rate. As a Mapping it still reads
+    {topic_index: components}, handing out FSRSComponentsView objects that write through.
+
+    due_us holds the predicted time each topic's retention drops below the retrievability
+    threshold, and due_heap is a min-heap of (due_us, topic_index) over it. Superseded heap
+    entries are dropped lazily when they no longer match due_us.
+    """
+
+    def __init__(self, capacity: int = 8):
+        self.slot_of: Dict[int, int] = {}
+        self.topics = np.zeros(capacity, dtype=np.int64)
+        self.stability = np.zeros(capacity)
+        self.difficulty = np.zeros(capacity)
+        self.retrievability = np.zeros(capacity)
+        self.last_review_us = np.full(capacity, _NO_REVIEW, dtype=np.int64)
+        self.review_count = np.zeros(capacity, dtype=np.int64)
+        self.recent_success_rate = np.zeros(capacity)
+        self.due_us = np.full(capacity, _NO_DUE, dtype=np.int64)
+        self.due_heap: List[Tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.slot_of)
+
+    def __iter__(self):
+        return iter(self.slot_of)
+
+    def __getitem__(self, topic_index: int) -> 'FSRSComponentsView':
+        return FSRSComponentsView(self, self.slot_of[topic_index])
+
+    def _grow(self, capacity: int):
+        for name in ('topics', 'stability', 'difficulty', 'retrievability', 'review_count', 'recent_success_rate'):
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.zeros(capacity - len(column), dtype=column.dtype)]))
+        self.last_review_us = np.concatenate([self.last_review_us,
+                                              np.full(capacity - len(self.last_review_us), _NO_REVIEW, dtype=np.int64)])
+        self.due_us = np.concatenate([self.due_us, np.full(capacity - len(self.due_us), _NO_DUE, dtype=np.int64)])
+
+    def slot(self, topic_index: int, now: datetime) -> int:
+        """Slot of a topic, initializing it with default components reviewed at now"""
+        slot = self.slot_of.get(topic_index)
+        if slot is None:
+            slot = self.slot_of[topic_index] = len(self.slot_of)
+            if slot >= len(self.topics):
+                self._grow(2 * len(self.topics) + 1)
+            self.topics[slot] = topic_index
+            self.stability[slot] = 1.0
+            self.difficulty[slot] = 0.5
+            self.retrievability[slot] = 1.0
+            self.last_review_us[slot] = _epoch_microseconds(now)
+            self.review_count[slot] = 0
+            self.recent_success_rate[slot] = 0.5
+            self.due_us[slot] = _NO_DUE
+        return slot
+
+    def set_due(self, slot: int, due_us: int):
+        """Record a topic's new due time and index it"""
+        self.due_us[slot] = due_us
+        if due_us != _NO_DUE:
+            heapq.heappush(self.due_heap, (due_us, self.topics[slot].item()))
+        if len(self.due_heap) > 2 * len(self.slot_of) + 16:
+            # Too many superseded entries: rebuild from due_us
+            scheduled = np.flatnonzero(self.due_us[:len(self.slot_of)] != _NO_DUE)
+            self.due_heap = list(zip(self.due_us[scheduled].tolist(), self.topics[scheduled].tolist()))
+            heapq.heapify(self.due_heap)
+
+    def due_by(self, limit_us: int) -> List[int]:
+        """Topics due at or before limit_us, earliest first, in O(k log n)"""
+        heap = self.due_heap
+        due_entries = []
+        seen = set()
+        while heap and heap[0][0] <= limit_us:
+            due_us, topic_index = heapq.heappop(heap)
+            if self.due_us[self.slot_of[topic_index]] == due_us and topic_index not in seen:
+                seen.add(topic_index)
+                due_entries.append((due_us, topic_index))
+        # Still due: put them back for the next query
+        for entry in due_entries:
+            heapq.heappush(heap, entry)
+        return [topic_index for _, topic_index in due_entries]
+
+
+class FSRSComponentsView:
+    """FSRSMemoryComponents-compatible view of one slot of an FSRSMemoryColumns"""
+
+    __slots__ = ('columns', 'slot')
+
+    def __init__(self, columns: FSRSMemoryColumns, slot: int):
+        self.columns = columns
+        self.slot = slot
+
+    def _field(name: str):
+        def getter(self):
+            return getattr(self.columns, name)[self.slot].item()
+
+        def setter(self, value):
+            getattr(self.columns, name)[self.slot] = value
+        return property(getter, setter)
+
+    stability = _field('stability')
+    difficulty = _field('difficulty')
+    retrievability = _field('retrievability')
+    review_count = _field('review_count')
+    recent_success_rate = _field('recent_success_rate')
+    del _field
+
+    @property
+    def last_review(self) -> Optional[datetime]:
+        last_review_us = self.columns.last_review_us[self.slot].item()
+        if last_review_us == _NO_REVIEW:
+            return None
+        return _FSRS_EPOCH + timedelta(microseconds=last_review_us)
+
+    @last_review.setter
+    def last_review(self, value: Optional[datetime]):
+        self.columns.last_review_us[self.slot] = _NO_REVIEW if value is None else _epoch_microseconds(value)
+
+    def to_components(self) -> FSRSMemoryComponents:
+        """Detached FSRSMemoryComponents copy"""
+        return FSRSMemoryComponents(self.stability, self.difficulty, self.retrievability,
+                                    self.last_review, self.review_count, self.recent_success_rate)
+
+
 class FSRSForgettingModel:
-    """FSRS-inspired forgetting model using power functions"""
+    """
+    FSRS-inspired forgetting model using power functions.
+    Memory state is stored per student in FSRSMemoryColumns (memory_components[student_id]).
+    """
 
     def __init__(self, config: FSRSForgettingConfig = None):
         self.config = config or FSRSForgettingConfig()
-        self.memory_components: Dict[str, Dict[int, FSRSMemoryComponents]] = {}
-
-    def get_memory_components(self, student_id: str, topic_index: int) -> FSRSMemoryComponents:
-        """Get or initialize memory components for a student-topic pair"""
-        if student_id not in self.memory_components:
-            self.memory_components[student_id] = {}
-
-        if topic_index not in self.memory_components[student_id]:
-            # Initialize with default values
-            self.memory_components[student_id][topic_index] = FSRSMemoryComponents(
-                stability=1.0,
-                difficulty=0.5,
-                retrievability=1.0,
-                last_review=datetime.now(),
-                review_count=0,
-                recent_success_rate=0.5
-            )
-
-        return self.memory_components[student_id][topic_index]
-
-    def apply_forgetting(self, student_id: str, topic_index: int, current_mastery: float) -> float:
-        """Apply FSRS-inspired forgetting to current mastery level"""
-        components = self.get_memory_components(student_id, topic_index)
+        self.memory_components: Dict[str, FSRSMemoryColumns] = {}
+
+    def current_time(self) -> datetime:
+        """Clock used when no explicit time is passed (patched to simulated time below)"""
+        return datetime.now()
+
+    def _columns(self, student_id: str) -> FSRSMemoryColumns:
+        columns = self.memory_components.get(student_id)
+        if columns is None:
+            columns = self.memory_components[student_id] = FSRSMemoryColumns()
+        return columns
+
+    def _slot(self, columns: FSRSMemoryColumns, topic_index: int, now: datetime) -> int:
+        """Slot of a topic, initializing and scheduling it on first use"""
+        slot = columns.slot_of.get(topic_index)
+        if slot is None:
+            slot = columns.slot(topic_index, now)
+            self._schedule_review(columns, slot)
+        return slot
+
+    def _days_until_threshold(self, stability: float, difficulty: float, retrievability: float) -> float:
+        """
+        Days after the last review at which apply_forgetting's retention factor falls below
+        retrievability_threshold, by bisection (inf if not within ten years).
+        Retention exp(-t / (base_forgetting_time * multiplier(t))) < threshold
+        is t > -ln(threshold) * base_forgetting_time * multiplier(t).
+        """
+        config = self.config
+        if not 0.0 < config.retrievability_threshold < 1.0:
+            return 0.0 if config.retrievability_threshold >= 1.0 else math.inf
+        scale = -math.log(config.retrievability_threshold) * config.base_forgetting_time
+        constant_terms = (config.difficulty_weight * math.pow(difficulty, config.difficulty_power_factor) +
+                          config.retrievability_weight * math.pow(retrievability, config.retrievability_power_factor))
+
+        def below_threshold(days: float) -> bool:
+            multiplier = config.stability_weight * math.pow(days, config.stability_power_factor) * stability + constant_terms
+            return days > scale * multiplier
+
+        low, high = 0.0, 1.0
+        while not below_threshold(high):
+            low, high = high, 2 * high
+            if high > 3650.0:
+                return math.inf
+        for _ in range(40):
+            middle = (low + high) / 2
+            if below_threshold(middle):
+                high = middle
+            else:
+                low = middle
+        return high
+
+    def _schedule_review(self, columns: FSRSMemoryColumns, slot: int):
+        """Recompute a topic's due time after its memory state or last review changed"""
+        last_review_us = columns.last_review_us[slot].item()
+        if last_review_us == _NO_REVIEW:
+            columns.set_due(slot, _NO_DUE)
+            return
+        days = self._days_until_threshold(columns.stability[slot].item(), columns.difficulty[slot].item(),
+                                          columns.retrievability[slot].item())
+        columns.set_due(slot, _NO_DUE if math.isinf(days) else last_review_us + math.ceil(days * 24 * 3600 * 10**6))
 
-        if components.last_review is None:
-            components.last_review = datetime.now()
+    def due_topics(self, student_id: str, by_time: Optional[datetime] = None) -> List[int]:
+        """
+        Topics whose retention will have dropped below retrievability_threshold by by_time
+        (default: current time), earliest first. Served from the student's due-review heap,
+        which update_memory_components and the forgetting calls keep current.
+        """
+        columns = self.memory_components.get(student_id)
+        if columns is None:
+            return []
+        return columns.due_by(_epoch_microseconds(by_time or self.current_time()))
+
+    def get_memory_components(self, student_id: str, topic_index: int,
+                              now: Optional[datetime] = None) -> FSRSComponentsView:
+        """Get or initialize memory components for a student-topic pair (new pairs start at now)"""
+        columns = self._columns(student_id)
+        slot = columns.slot_of.get(topic_index)
+        if slot is None:
+            slot = self._slot(columns, topic_index, now or self.current_time())
+        return FSRSComponentsView(columns, slot)
+
+    def apply_forgetting(self, student_id: str, topic_index: int, current_mastery: float,
+                         now: Optional[datetime] = None) -> float:
+        """Apply FSRS-inspired forgetting to current mastery level, as of now (default: current time)"""
+        now = now or self.current_time()
+        columns = self._columns(student_id)
+        slot = self._slot(columns, topic_index, now)
+        now_us = _epoch_microseconds(now)
+
+        last_review_us = columns.last_review_us[slot].item()
+        if last_review_us == _NO_REVIEW:
+            columns.last_review_us[slot] = now_us
+            self._schedule_review(columns, slot)
             return current_mastery
 
         # Calculate time since last review in days
-        time_elapsed = (datetime.now() - components.last_review).total_seconds() / (24 * 3600)
+        time_elapsed = (now_us - last_review_us) / 10**6 / (24 * 3600)
 
         if time_elapsed <= 0:
             return current_mastery
 
         # FSRS-inspired forgetting formula using power functions
-        stability_factor = math.pow(time_elapsed, self.config.stability_power_factor) * components.stability
-        difficulty_factor = math.pow(components.difficulty, self.config.difficulty_power_factor)
-        retrievability_factor = math.pow(components.retrievability, self.config.retrievability_power_factor)
+        stability_factor = math.pow(time_elapsed, self.config.stability_power_factor) * columns.stability[slot].item()
+        difficulty_factor = math.pow(columns.difficulty[slot].item(), self.config.difficulty_power_factor)
+        retrievability_factor = math.pow(columns.retrievability[slot].item(), self.config.retrievability_power_factor)
 
         # Combine factors with weights
         forgetting_multiplier = (
@@ -4418,50 +7018,137 @@ class FSRSForgettingModel:
         forgotten_mastery = max(0.01, current_mastery * forgetting_rate)
 
         # Update last access time for retrievability calculations
-        components.last_review = datetime.now()
+        columns.last_review_us[slot] = now_us
+        self._schedule_review(columns, slot)
 
         return forgotten_mastery
 
+    def apply_forgetting_all(self, student_id: str, mastery_levels: Dict[int, float],
+                             now: Optional[datetime] = None) -> Dict[int, float]:
+        """
+        apply_forgetting for every topic of mastery_levels in one NumPy pass, including its
+        last_review updates. Returns {topic_index: decayed mastery}. np.power / np.exp may
+        differ from math.pow / math.exp in the last bit on SIMD builds.
+        """
+        now = now or self.current_time()
+        columns = self._columns(student_id)
+        topics = list(mastery_levels.keys())
+        if not topics:
+            return {}
+        slots = np.array([self._slot(columns, topic_index, now) for topic_index in topics], dtype=np.int64)
+        now_us = _epoch_microseconds(now)
+
+        decayed, touched = self._forgetting_pass(columns, slots, list(mastery_levels.values()), now_us)
+        columns.last_review_us[slots[touched]] = now_us
+        for slot in slots[touched].tolist():
+            self._schedule_review(columns, slot)
+
+        return dict(zip(topics, decayed.tolist()))
+
+    def predict_forgetting(self, student_id: str, mastery_levels: Dict[int, float],
+                           at_time: Optional[datetime] = None) -> Dict[int, float]:
+        """
+        Decayed mastery of every topic of mastery_levels as of at_time (default: current time),
+        without initializing or updating any memory state. Topics with no memory components
+        keep their mastery, as apply_forgetting leaves a freshly initialized topic unchanged.
+        """
+        at_time = at_time or self.current_time()
+        predicted = dict(mastery_levels)
+        columns = self.memory_components.get(student_id)
+        if columns is None:
+            return predicted
+        known = [topic_index for topic_index in mastery_levels if topic_index in columns.slot_of]
+        if not known:
+            return predicted
+        slots = np.array([columns.slot_of[topic_index] for topic_index in known], dtype=np.int64)
+        decayed, _ = self._forgetting_pass(columns, slots, [mastery_levels[topic_index] for topic_index in known],
+                                           _epoch_microseconds(at_time))
+        predicted.update(zip(known, decayed.tolist()))
+        return predicted
+
+    def _forgetting_pass(self, columns: FSRSMemoryColumns, slots: np.ndarray, mastery: List[float],
+                         now_us: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized apply_forgetting arithmetic for the given slots, without side effects.
+        Returns (decayed mastery, mask of slots whose last review apply_forgetting would reset).
+        """
+        mastery = np.array(mastery, dtype=float)
+        last_review_us = columns.last_review_us[slots]
+        never_reviewed = last_review_us == _NO_REVIEW
+        time_elapsed = np.where(never_reviewed, 0, now_us - last_review_us) / 10**6 / (24 * 3600)
+        decays = ~never_reviewed & (time_elapsed > 0)
+
+        elapsed = time_elapsed[decays]
+        decay_slots = slots[decays]
+        forgetting_multiplier = (
+            self.config.stability_weight * (np.power(elapsed, self.config.stability_power_factor) * columns.stability[decay_slots]) +
+            self.config.difficulty_weight * np.power(columns.difficulty[decay_slots], self.config.difficulty_power_factor) +
+            self.config.retrievability_weight * np.power(columns.retrievability[decay_slots], self.config.retrievability_power_factor)
+        )
+        forgetting_rate = np.exp(-elapsed / (self.config.base_forgetting_time * forgetting_multiplier))
+
+        decayed = mastery.copy()
+        decayed[decays] = np.maximum(0.01, mastery[decays] * forgetting_rate)
+        return decayed, never_reviewed | decays
+
     def update_memory_components(self, student_id: str, topic_index: int,
-                               is_correct: bool, new_mastery: float):
+                               is_correct: bool, new_mastery: float, now: Optional[datetime] = None):
         """Update FSRS memory components based on learning event"""
-        components = self.get_memory_components(student_id, topic_index)
+        now = now or self.current_time()
+        columns = self._columns(student_id)
+        slot = self._slot(columns, topic_index, now)
+        config = self.config
 
-        # Update review count
-        components.review_count += 1
+        # Update review count and last review time
+        columns.review_count[slot] += 1
+        columns.last_review_us[slot] = _epoch_microseconds(now)
 
         # Update success rate with exponential moving average
         alpha = 0.3  # Learning rate for moving average
         success_value = 1.0 if is_correct else 0.0
-        components.recent_success_rate = (
+        columns.recent_success_rate[slot] = (
             alpha * success_value +
-            (1 - alpha) * components.recent_success_rate
+            (1 - alpha) * columns.recent_success_rate[slot].item()
         )
 
         # Update stability based on performance
+        stability = columns.stability[slot].item()
         if is_correct:
-            components.stability = min(
-                self.config.max_stability,
-                components.stability * self.config.success_stability_boost
-            )
+            columns.stability[slot] = min(config.max_stability, stability * config.success_stability_boost)
         else:
-            components.stability = max(
-                self.config.min_stability,
-                components.stability * self.config.failure_stability_penalty
-            )
+            columns.stability[slot] = max(config.min_stability, stability * config.failure_stability_penalty)
 
         # Update difficulty based on performance and mastery
+        difficulty = columns.difficulty[slot].item()
         if is_correct and new_mastery > 0.7:
-            components.difficulty = max(0.1, components.difficulty - self.config.difficulty_adaptation_rate)
+            columns.difficulty[slot] = max(0.1, difficulty - config.difficulty_adaptation_rate)
         elif not is_correct and new_mastery < 0.5:
-            components.difficulty = min(1.0, components.difficulty + self.config.difficulty_adaptation_rate)
+            columns.difficulty[slot] = min(1.0, difficulty + config.difficulty_adaptation_rate)
 
         # Update retrievability
+        retrievability = columns.retrievability[slot].item()
         if is_correct:
-            components.retrievability = min(1.0, components.retrievability + 0.2)
+            columns.retrievability[slot] = min(1.0, retrievability + 0.2)
         else:
-            components.retrievability = max(0.1, components.retrievability - 0.1)
+            columns.retrievability[slot] = max(0.1, retrievability - 0.1)
 
+        # Re-index when this topic next falls due
+        self._schedule_review(columns, slot)
+
+
+
+# BKT system inherited by forked ingest_responses workers
+_INGEST_BKT = None
+
+
+def _ingest_response_block(streams: Dict[str, List[Tuple]]) -> Tuple[Dict[str, Tuple], Dict[str, int]]:
+    """ProcessPoolExecutor entry point for one block of ingest_responses"""
+    counts = _INGEST_BKT._ingest_student_streams(streams)
+    fsrs = _INGEST_BKT.fsrs_forgetting
+    states = {student_id: (_INGEST_BKT.student_manager.get_student(student_id),
+                           fsrs.memory_components.get(student_id) if fsrs else None)
+              for student_id in streams}
+    return states, counts
 
 
 class BayesianKnowledgeTracing:
@@ -4484,6 +7171,7 @@ class BayesianKnowledgeTracing:
         # Topic-specific parameters (loaded from config)
         self.topic_parameters: Dict[int, Dict] = {}
         self._initialize_topic_parameters()
+        self._parameter_table = None  # (config version, prior, learning, slip, guess) indexed by topic
 
         # Initialize FSRS forgetting model if enabled
         if self.config.get('bkt_config.enable_fsrs_forgetting', True):
@@ -4613,6 +7301,43 @@ class BayesianKnowledgeTracing:
         """Predict probability of correct answer: P(Correct) = P(L_t)(1-P(S)) + (1-P(L_t))P(G)"""
         return mastery * (1 - params['slip_rate']) + (1 - mastery) * params['guess_rate']
 
+    def update_mastery_batch(self, mastery: np.ndarray, is_correct, slip_rate: np.ndarray,
+                             guess_rate: np.ndarray, learning_rate: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        calculate_conditional_probability followed by update_mastery over arrays of topics.
+        is_correct may be one bool or a bool array; parameters broadcast against mastery.
+        Same arithmetic as the scalar versions, so results match them exactly.
+        Returns (conditional_prob, new_mastery).
+        """
+        mastery = np.asarray(mastery, dtype=float)
+        is_correct = np.asarray(is_correct, dtype=bool)
+        numerator = np.where(is_correct, mastery * (1 - slip_rate), mastery * slip_rate)
+        denominator = np.where(is_correct,
+                               mastery * (1 - slip_rate) + (1 - mastery) * guess_rate,
+                               mastery * slip_rate + (1 - mastery) * (1 - guess_rate))
+        conditional_prob = np.divide(numerator, denominator, out=mastery.copy(), where=denominator != 0)
+        new_mastery = conditional_prob + (1 - conditional_prob) * learning_rate
+        return conditional_prob, new_mastery
+
+    def get_topic_parameter_arrays(self, topic_indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        get_topic_parameters for an array of topics as (prior, learning, slip, guess) arrays.
+        Backed by a per-topic table that is rebuilt when the config snapshot version changes.
+        """
+        topic_indices = np.asarray(topic_indices, dtype=np.int64)
+        version = getattr(self.config, 'version', None)
+        size = max(max(self.kg.nodes, default=-1), int(topic_indices.max(initial=-1))) + 1
+        table = self._parameter_table
+        if table is None or table[0] != version or len(table[1]) < size:
+            params = [self.get_topic_parameters(topic_index) for topic_index in range(size)]
+            table = self._parameter_table = (
+                version,
+                np.array([p['prior_knowledge'] for p in params], dtype=float),
+                np.array([p['learning_rate'] for p in params], dtype=float),
+                np.array([p['slip_rate'] for p in params], dtype=float),
+                np.array([p['guess_rate'] for p in params], dtype=float))
+        return tuple(column[topic_indices] for column in table[1:])
+
     def process_student_response(self, student_id: str, topic_index: int,
                                 is_correct: bool, mcq_id: str = None,
                                 custom_params: Optional[Dict] = None) -> Dict:
@@ -4820,10 +7545,15 @@ class BayesianKnowledgeTracing:
 
         return {'skill_update': skill_update}
 
-    def process_mcq_response_improved(self, student_id: str, mcq_id: str,is_correct: bool) -> List[Dict]:
+    def process_mcq_response_improved(self, student_id: str, mcq_id: str, is_correct: bool,
+                                      detailed: bool = True, now: Optional[datetime] = None) -> List[Dict]:
         """
         Enhanced version that uses explicit topic weights from the MCQ
-        with FSRS forgetting applied automatically
+        with FSRS forgetting applied automatically.
+        All weighted topics go through update_mastery_batch in one pass. With detailed=False
+        each update only carries main_topic_index, topic_weight, is_primary_topic,
+        mastery_after and mastery_change instead of the full process_student_response dict.
+        now is the response time used for FSRS forgetting (default: current simulated time).
         """
         if hasattr(self.kg, 'ultra_loader'):
             # For  optimized loading, get minimal data
@@ -4844,28 +7574,115 @@ class BayesianKnowledgeTracing:
             subtopic_weights = mcq.subtopic_weights
             main_topic_index = mcq.main_topic_index
 
-        updates = []
+        student = self.student_manager.get_student(student_id)
+        if not student:
+            raise ValueError(f"Student {student_id} not found")
+        if not subtopic_weights:
+            return []
 
-        # Use the MCQ's explicit topic weights directly
-        for topic_index, weight in subtopic_weights.items():
-            # Get base parameters for this topic
-            base_params = self.get_topic_parameters(topic_index)
+        topics = list(subtopic_weights.keys())
+        weights = np.array(list(subtopic_weights.values()), dtype=float)
+        prior, base_learning, slip, guess = self.get_topic_parameter_arrays(np.array(topics))
+        # Use the MCQ's explicit topic weights directly: learning rate scaled by weight
+        learning = base_learning * weights
 
-            # Create adjusted parameters with scaled learning rate
-            adjusted_params = {
-                'prior_knowledge': base_params['prior_knowledge'],
-                'learning_rate': base_params['learning_rate'] * weight,  # Scale by weight
-                'slip_rate': base_params['slip_rate'],
-                'guess_rate': base_params['guess_rate']
+        # First sighting of a topic starts from its prior
+        mastery_before = np.array([student.mastery_levels.get(topic_index, prior_knowledge)
+                                   for topic_index, prior_knowledge in zip(topics, prior.tolist())])
+        for topic_index, prior_knowledge in zip(topics, prior.tolist()):
+            if topic_index not in student.mastery_levels:
+                student.mastery_levels[topic_index] = prior_knowledge
+
+        # Apply FSRS forgetting if enabled
+        fsrs_enabled = bool(self.config.get('bkt_config.enable_fsrs_forgetting', True) and self.fsrs_forgetting)
+        if fsrs_enabled:
+            current = np.array([self.fsrs_forgetting.apply_forgetting(student_id, topic_index, mastery, now)
+                                for topic_index, mastery in zip(topics, mastery_before.tolist())])
+        else:
+            current = mastery_before
+
+        conditional_prob, new_mastery = self.update_mastery_batch(current, is_correct, slip, guess, learning)
+
+        # Update student's mastery levels, then FSRS memory components
+        new_mastery_list = new_mastery.tolist()
+        for topic_index, mastery in zip(topics, new_mastery_list):
+            student.mastery_levels[topic_index] = mastery
+        if fsrs_enabled:
+            for topic_index, mastery in zip(topics, new_mastery_list):
+                self.fsrs_forgetting.update_memory_components(student_id, topic_index, is_correct, mastery, now)
+
+        mastery_change = (new_mastery - current).tolist()
+
+        # Skills are updated once per weighted topic, as process_student_response does
+        skill_updates = [{} for _ in topics]
+        if self.skill_tracking_enabled and self.skill_tracker and mcq_id:
+            for position in range(len(topics)):
+                try:
+                    mcq_vector = self.scheduler._get_or_create_optimized_mcq_vector(mcq_id)
+                    if mcq_vector:
+                        skill_updates[position] = self.skill_tracker.update_skills_from_question(
+                            student, mcq_vector, is_correct
+                        )
+                except Exception as e:
+                    print(f"Warning: Skill update failed for {mcq_id}: {e}")
+
+        if not detailed:
+            return [{
+                'main_topic_index': topic_index,
+                'topic_weight': weight,
+                'is_primary_topic': (topic_index == main_topic_index),
+                'mastery_after': mastery,
+                'mastery_change': change
+            } for topic_index, weight, mastery, change in zip(topics, subtopic_weights.values(),
+                                                             new_mastery_list, mastery_change)]
+
+        prediction_before = (current * (1 - slip) + (1 - current) * guess).tolist()
+        prediction_after = (new_mastery * (1 - slip) + (1 - new_mastery) * guess).tolist()
+        columns = zip(topics, subtopic_weights.values(), mastery_before.tolist(), current.tolist(),
+                      new_mastery_list, mastery_change, conditional_prob.tolist(), prediction_before,
+                      prediction_after, prior.tolist(), learning.tolist(), slip.tolist(), guess.tolist(),
+                      skill_updates)
+
+        updates = []
+        for (topic_index, weight, before, forgotten, after, change, conditional, predicted_before,
+             predicted_after, prior_knowledge, learning_rate, slip_rate, guess_rate, skills) in columns:
+            # Same layout as process_student_response
+            update = {
+                'student_id': student_id,
+                'main_topic_index': topic_index,
+                'topic_name': self.kg.get_topic_of_index(topic_index),
+                'mcq_id': mcq_id,
+                'is_correct': is_correct,
+                'mastery_before': before,
+                'mastery_after': after,
+                'mastery_change': change,
+                'conditional_probability': conditional,
+                'prediction_before': predicted_before,
+                'prediction_after': predicted_after,
+                'parameters_used': {
+                    'prior_knowledge': prior_knowledge,
+                    'learning_rate': learning_rate,
+                    'slip_rate': slip_rate,
+                    'guess_rate': guess_rate
+                }
             }
 
-            # Process with enhanced method (includes FSRS forgetting)
-            update = self.process_student_response(
-                student_id, topic_index, is_correct, mcq_id, custom_params=adjusted_params)
+            if fsrs_enabled:
+                components = self.fsrs_forgetting.get_memory_components(student_id, topic_index)
+                update['fsrs_components'] = {
+                    'stability': components.stability,
+                    'difficulty': components.difficulty,
+                    'retrievability': components.retrievability,
+                    'review_count': components.review_count,
+                    'recent_success_rate': components.recent_success_rate
+                }
+                update['mastery_after_forgetting'] = forgotten
+                update['forgetting_applied'] = before - forgotten
+                update['total_change'] = after - before
 
+            update['skill_updates'] = skills
             update['topic_weight'] = weight
             update['is_primary_topic'] = (topic_index == main_topic_index)
-
             updates.append(update)
 
         return updates
@@ -4887,84 +7704,46 @@ class BayesianKnowledgeTracing:
         if not student:
             return []
 
-        # Use NetworkX to find all shortest paths within distance
-        undirected_graph = self.kg.graph.to_undirected()
-
-        try:
-            # Get all shortest paths to nodes within max_distance
-            paths = nx.single_source_shortest_path(undirected_graph, center_topic_index, cutoff=max_distance)
-        except Exception:  # Catch any NetworkX errors
-            return []
-
-        # Remove center node (path to itself)
-        paths.pop(center_topic_index, None)
+        # Precomputed neighbourhood: decay^distance * mastery_change * path_weight per topic
+        kernel = self.kg.get_influence_kernel(max_distance, decay_rate)
 
         updates = []
 
-        for topic_index, path in paths.items():
-            distance = len(path) - 1  # Number of edges in path
-
-            # Calculate path weight by multiplying all edge weights along the path
-            path_weight = self._calculate_path_weight(path)
+        # Only significant effects are returned
+        for topic_index, distance, path_weight, final_effect, path in kernel.neighbours(
+                center_topic_index, mastery_change, min_effect):
+            current_mastery = student.mastery_levels.get(topic_index)
+            new_mastery = min(1.0, current_mastery + final_effect)
 
-            # Calculate effect: decay^distance * mastery_change * path_weight
-            base_effect = mastery_change * (decay_rate ** distance)
-            final_effect = base_effect * path_weight
-
-            # Only apply significant effects
-            if final_effect > min_effect:
-                current_mastery = student.mastery_levels.get(topic_index)
-                new_mastery = min(1.0, current_mastery + final_effect)
-
-                # Update student mastery
-                student.mastery_levels[topic_index] = new_mastery
+            # Update student mastery
+            student.mastery_levels[topic_index] = new_mastery
 
-                # Record the update
-                updates.append({
-                    'main_topic_index': topic_index,
-                    'topic_name': self.kg.get_topic_of_index(topic_index),
-                    'mastery_before': current_mastery,
-                    'mastery_after': new_mastery,
-                    'mastery_change': new_mastery - current_mastery,
-                    'distance': distance,
-                    'path_weight': path_weight,
-                    'effect_strength': final_effect,
-                    'path': [self.kg.get_topic_of_index(idx) for idx in path],
-                    'update_type': 'area_effect'
-                })
+            # Record the update
+            updates.append({
+                'main_topic_index': topic_index,
+                'topic_name': self.kg.get_topic_of_index(topic_index),
+                'mastery_before': current_mastery,
+                'mastery_after': new_mastery,
+                'mastery_change': new_mastery - current_mastery,
+                'distance': distance,
+                'path_weight': path_weight,
+                'effect_strength': final_effect,
+                'path': [self.kg.get_topic_of_index(idx) for idx in path],
+                'update_type': 'area_effect'
+            })
 
         return updates
 
-    def _calculate_path_weight(self, path: List[int]) -> float:
-        """Calculate the combined weight along a path by multiplying edge weights."""
-        if len(path) < 2:
-            return 1.0
-
-        total_weight = 1.0
-        for i in range(len(path) - 1):
-            source, target = path[i], path[i + 1]
-
-            # Get edge weight (check both directions since we're using undirected)
-            edge_weight = 0.5  # Default weight
-
-            if self.kg.graph.has_edge(source, target):
-                edge_weight = self.kg.graph[source][target].get('weight', 0.5)
-            elif self.kg.graph.has_edge(target, source):
-                edge_weight = self.kg.graph[target][source].get('weight', 0.5)
-
-            # Multiply weights along the path
-            total_weight *= edge_weight
-
-        return total_weight
-
-    def process_mcq_with_area_effect(self, student_id: str, mcq_id: str, is_correct: bool) -> List[Dict]:
+    def process_mcq_with_area_effect(self, student_id: str, mcq_id: str, is_correct: bool,
+                                     detailed: bool = True, now: Optional[datetime] = None) -> List[Dict]:
         """
         Simplified MCQ processing with area effects.
         Replaces the longer process_mcq_response_with_area_effect method.
+        detailed=False skips the full per-topic result dicts (see process_mcq_response_improved).
         """
         try:
             # Do normal MCQ processing first
-            primary_updates = self.process_mcq_response_improved(student_id, mcq_id, is_correct)
+            primary_updates = self.process_mcq_response_improved(student_id, mcq_id, is_correct, detailed, now)
 
             if not is_correct:  # Only spread effects on correct answers
                 return primary_updates
@@ -4986,6 +7765,96 @@ class BayesianKnowledgeTracing:
             traceback.print_exc()
             return []
 
+    def ingest_responses(self, responses, max_workers: Optional[int] = None,
+                         block_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Bulk replay of historical responses, e.g. to backfill mastery from event logs.
+        responses yields (student_id, mcq_id, is_correct, timestamp[, time_taken]) rows in any order.
+
+        Each student's events are applied in timestamp order (ties keep input order) with the
+        same updates StudentManager.record_attempt makes at that time: attempt history, BKT
+        mastery with area effects, FSRS memory (forgetting measured up to the event timestamp)
+        and skills. Per-topic result dicts are not built. Rows for unknown students or MCQs
+        are skipped and counted, as record_attempt skips them.
+
+        Students are split into blocks of block_size (bkt_config.ingest_block_size) that run on
+        a ProcessPoolExecutor of max_workers processes (bkt_config.ingest_max_workers, default
+        os.cpu_count()) where fork is available, and serially otherwise; worker results are
+        copied back into the parent's student profiles and FSRS memory.
+        """
+        global _INGEST_BKT
+
+        block_size = block_size or self.get_config_value('bkt_config.ingest_block_size', 256)
+        max_workers = max_workers or self.get_config_value('bkt_config.ingest_max_workers', None) or os.cpu_count() or 1
+
+        streams: Dict[str, List[Tuple]] = {}
+        counts = {'events': 0, 'applied': 0, 'unknown_students': 0, 'unknown_mcqs': 0}
+        for position, row in enumerate(responses):
+            student_id, mcq_id, is_correct, timestamp = row[:4]
+            time_taken = row[4] if len(row) > 4 else 0.0
+            counts['events'] += 1
+            if self.student_manager.get_student(student_id) is None:
+                counts['unknown_students'] += 1
+                continue
+            streams.setdefault(student_id, []).append((timestamp, position, mcq_id, is_correct, time_taken))
+
+        student_ids = list(streams)
+        blocks = [{student_id: streams[student_id] for student_id in student_ids[start:start + block_size]}
+                  for start in range(0, len(student_ids), block_size)]
+
+        use_processes = (max_workers > 1 and len(blocks) > 1 and
+                         'fork' in multiprocessing.get_all_start_methods())
+        if use_processes:
+            # Forked workers inherit the BKT system through this module global instead of pickling it
+            _INGEST_BKT = self
+            try:
+                with ProcessPoolExecutor(max_workers=min(max_workers, len(blocks)),
+                                         mp_context=multiprocessing.get_context('fork')) as executor:
+                    block_results = list(executor.map(_ingest_response_block, blocks))
+            except (OSError, NotImplementedError) as e:
+                print(f"⚠️ Process pool unavailable ({e}), ingesting serially")
+                use_processes = False
+            finally:
+                _INGEST_BKT = None
+
+        if use_processes:
+            for states, block_counts in block_results:
+                for student_id, (profile, memory_components) in states.items():
+                    student = self.student_manager.get_student(student_id)
+                    for name, value in vars(profile).items():
+                        if isinstance(getattr(student, name), TopicRow):
+                            getattr(student, name).assign(value)
+                        else:
+                            setattr(student, name, value)
+                    if self.fsrs_forgetting is not None and memory_components is not None:
+                        self.fsrs_forgetting.memory_components[student_id] = memory_components
+                for key, value in block_counts.items():
+                    counts[key] += value
+        else:
+            for block in blocks:
+                for key, value in self._ingest_student_streams(block).items():
+                    counts[key] += value
+
+        counts['students'] = len(student_ids)
+        counts['blocks'] = len(blocks)
+        counts['workers'] = min(max_workers, len(blocks)) if use_processes else 1
+        return counts
+
+    def _ingest_student_streams(self, streams: Dict[str, List[Tuple]]) -> Dict[str, int]:
+        """Apply each student's (timestamp, position, mcq_id, is_correct, time_taken) events in order"""
+        loader = getattr(self.kg, 'ultra_loader', None)
+        counts = {'applied': 0, 'unknown_mcqs': 0}
+        for student_id, events in streams.items():
+            student = self.student_manager.get_student(student_id)
+            for timestamp, _, mcq_id, is_correct, time_taken in sorted(events, key=lambda event: event[:2]):
+                if (loader.get_minimal_mcq_data(mcq_id) if loader is not None else self.kg.mcqs.get(mcq_id)) is None:
+                    counts['unknown_mcqs'] += 1
+                    continue
+                self.student_manager._log_attempt(student, mcq_id, is_correct, time_taken, timestamp)
+                self.process_mcq_with_area_effect(student_id, mcq_id, is_correct, detailed=False, now=timestamp)
+                counts['applied'] += 1
+        return counts
+
 
     def calibrate_parameters(self, student_id: str, topic_index: int,
                            attempt_history: List[Tuple[bool, datetime]]) -> Dict:
@@ -5026,18 +7895,51 @@ class BayesianKnowledgeTracing:
         }
 
     # METHODS FOR FSRS FUNCTIONALITY
+    def predict_mastery(self, student_id: str, topics: Optional[List[int]] = None,
+                        at_time: Optional[datetime] = None) -> Dict[int, float]:
+        """
+        Mastery with FSRS forgetting applied as of at_time (default: current simulated time),
+        for the given topics or every topic with stored mastery. Topics without stored mastery
+        are left out. Pure: neither mastery nor FSRS memory state is touched, so results can be
+        cached and computed from concurrent readers.
+        """
+        student = self.student_manager.get_student(student_id)
+        if not student:
+            return {}
+
+        mastery_levels = student.mastery_levels
+        if topics is None:
+            stored = dict(mastery_levels.items())
+        else:
+            stored = {topic_index: mastery_levels[topic_index] for topic_index in topics
+                      if topic_index in mastery_levels}
+
+        if self.config.get('bkt_config.enable_fsrs_forgetting', True) and self.fsrs_forgetting:
+            return self.fsrs_forgetting.predict_forgetting(student_id, stored, at_time)
+        return stored
+
     def get_current_mastery_with_decay(self, student_id: str, topic_index: int) -> float:
         """Get current mastery level with forgetting applied, without updating stored values"""
         student = self.student_manager.get_student(student_id)
         if not student:
             return 0.0
 
-        stored_mastery = student.mastery_levels.get(topic_index)
+        return self.predict_mastery(student_id, [topic_index]).get(topic_index)
 
-        if self.config.get('bkt_config.enable_fsrs_forgetting', True) and self.fsrs_forgetting:
-            return self.fsrs_forgetting.apply_forgetting(student_id, topic_index, stored_mastery)
-        else:
-            return stored_mastery
+    def _decay_reviewed_topics(self, student_id: str, student: StudentProfile) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """
+        Stored mastery of the topics above 0.05 mastery that have FSRS reviews, and their
+        predict_mastery values. Read-only.
+        """
+        columns = self.fsrs_forgetting.memory_components.get(student_id)
+        if columns is None:
+            return {}, {}
+        slot_of = columns.slot_of
+        review_count = columns.review_count
+        reviewed = {topic_index: mastery for topic_index, mastery in student.mastery_levels.items()
+                    if mastery > 0.05  # Only consider topics with minimal mastery
+                    and topic_index in slot_of and review_count[slot_of[topic_index]] > 0}
+        return reviewed, self.predict_mastery(student_id, list(reviewed))
 
     def get_review_recommendations(self, student_id: str,
                                  target_retention: float = 0.9) -> List[Dict]:
@@ -5050,34 +7952,33 @@ class BayesianKnowledgeTracing:
             return []
 
         recommendations = []
+        reviewed, current_masteries = self._decay_reviewed_topics(student_id, student)
 
-        for topic_index, mastery in student.mastery_levels.items():
-            if mastery > 0.05:  # Only consider topics with minimal mastery
-                components = self.fsrs_forgetting.get_memory_components(student_id, topic_index)
+        for topic_index, mastery in reviewed.items():
+            components = self.fsrs_forgetting.memory_components[student_id][topic_index]
+
+            # Calculate current retention
+            current_mastery = current_masteries[topic_index]
+            retention_ratio = current_mastery / mastery if mastery > 0 else 0
 
-                if components.review_count > 0:
-                    # Calculate current retention
-                    current_mastery = self.get_current_mastery_with_decay(student_id, topic_index)
-                    retention_ratio = current_mastery / mastery if mastery > 0 else 0
-
-                    # Calculate priority score based on retention drop and importance
-                    retention_drop = 1.0 - retention_ratio
-                    importance_score = mastery  # Higher mastery = more important to maintain
-
-                    priority_score = retention_drop * importance_score
-
-                    if retention_ratio < target_retention:
-                        recommendations.append({
-                            'topic_index': topic_index,
-                            'topic_name': self.kg.get_topic_of_index(topic_index),
-                            'current_mastery': current_mastery,
-                            'original_mastery': mastery,
-                            'retention_ratio': retention_ratio,
-                            'priority_score': priority_score,
-                            'review_count': components.review_count,
-                            'stability': components.stability,
-                            'difficulty': components.difficulty
-                        })
+            # Calculate priority score based on retention drop and importance
+            retention_drop = 1.0 - retention_ratio
+            importance_score = mastery  # Higher mastery = more important to maintain
+
+            priority_score = retention_drop * importance_score
+
+            if retention_ratio < target_retention:
+                recommendations.append({
+                    'topic_index': topic_index,
+                    'topic_name': self.kg.get_topic_of_index(topic_index),
+                    'current_mastery': current_mastery,
+                    'original_mastery': mastery,
+                    'retention_ratio': retention_ratio,
+                    'priority_score': priority_score,
+                    'review_count': components.review_count,
+                    'stability': components.stability,
+                    'difficulty': components.difficulty
+                })
 
         # Sort by priority score (descending)
         recommendations.sort(key=lambda x: x['priority_score'], reverse=True)
@@ -5107,21 +8008,19 @@ class BayesianKnowledgeTracing:
         retrievability_sum = 0.0
         component_count = 0
 
-        for topic_index, mastery in student.mastery_levels.items():
-            if mastery > 0.05:  # Only consider topics with minimal mastery
-                components = self.fsrs_forgetting.get_memory_components(student_id, topic_index)
+        reviewed, current_masteries = self._decay_reviewed_topics(student_id, student)
 
-                if components.review_count > 0:
-                    component_count += 1
-                    stability_sum += components.stability
-                    difficulty_sum += components.difficulty
-                    retrievability_sum += components.retrievability
+        for topic_index, mastery in reviewed.items():
+            components = self.fsrs_forgetting.memory_components[student_id][topic_index]
+            component_count += 1
+            stability_sum += components.stability
+            difficulty_sum += components.difficulty
+            retrievability_sum += components.retrievability
 
-                    # Check if needs review (retention < 90%)
-                    current_retention = self.fsrs_forgetting.apply_forgetting(
-                        student_id, topic_index, mastery) / mastery
-                    if current_retention < 0.9:
-                        diagnostics['topics_needing_review'] += 1
+            # Check if needs review (retention < 90%)
+            current_retention = current_masteries[topic_index] / mastery
+            if current_retention < 0.9:
+                diagnostics['topics_needing_review'] += 1
 
         diagnostics['topics_with_memory_components'] = component_count
         if component_count > 0:
@@ -5230,116 +8129,16 @@ time_manipulator = TimeManipulator()
 
 # Monkey patch the FSRSForgettingModel to use simulated time
 def patch_fsrs_for_time_manipulation():
-    """Patch the existing FSRSForgettingModel to use simulated time"""
-
-    # Store original methods
-    original_get_memory_components = FSRSForgettingModel.get_memory_components
-    original_apply_forgetting = FSRSForgettingModel.apply_forgetting
-    original_update_memory_components = FSRSForgettingModel.update_memory_components
-
-    def patched_get_memory_components(self, student_id: str, topic_index: int) -> FSRSMemoryComponents:
-        """Patched version that uses simulated time for initialization"""
-        if student_id not in self.memory_components:
-            self.memory_components[student_id] = {}
-
-        if topic_index not in self.memory_components[student_id]:
-            # Initialize with simulated time
-            self.memory_components[student_id][topic_index] = FSRSMemoryComponents(
-                stability=1.0,
-                difficulty=0.5,
-                retrievability=1.0,
-                last_review=time_manipulator.get_current_time(),  # Use simulated time
-                review_count=0,
-                recent_success_rate=0.5
-            )
-
-        return self.memory_components[student_id][topic_index]
-
-    def patched_apply_forgetting(self, student_id: str, topic_index: int, current_mastery: float) -> float:
-        """Patched version that uses simulated time for forgetting calculations"""
-        components = self.get_memory_components(student_id, topic_index)
-
-        if components.last_review is None:
-            components.last_review = time_manipulator.get_current_time()
-            return current_mastery
-
-        # Calculate time since last review using simulated time
-        current_time = time_manipulator.get_current_time()
-        time_elapsed = (current_time - components.last_review).total_seconds() / (24 * 3600)
-
-        if time_elapsed <= 0:
-            return current_mastery
-
-        # FSRS-inspired forgetting formula using power functions
-        stability_factor = math.pow(time_elapsed, self.config.stability_power_factor) * components.stability
-        difficulty_factor = math.pow(components.difficulty, self.config.difficulty_power_factor)
-        retrievability_factor = math.pow(components.retrievability, self.config.retrievability_power_factor)
-
-        # Combine factors with weights
-        forgetting_multiplier = (
-            self.config.stability_weight * stability_factor +
-            self.config.difficulty_weight * difficulty_factor +
-            self.config.retrievability_weight * retrievability_factor
-        )
-
-        # Apply forgetting with exponential decay
-        forgetting_rate = math.exp(-time_elapsed / (self.config.base_forgetting_time * forgetting_multiplier))
-
-        # Ensure forgetting doesn't go below minimum threshold
-        forgotten_mastery = max(0.01, current_mastery * forgetting_rate)
-
-        # Update last access time using simulated time
-        components.last_review = current_time
-
-        return forgotten_mastery
-
-    def patched_update_memory_components(self, student_id: str, topic_index: int,
-                                       is_correct: bool, new_mastery: float):
-        """Patched version that uses simulated time for updates"""
-        components = self.get_memory_components(student_id, topic_index)
-
-        # Update review count
-        components.review_count += 1
-
-        # Update last review time to simulated time
-        components.last_review = time_manipulator.get_current_time()
-
-        # Update success rate with exponential moving average
-        alpha = 0.3
-        success_value = 1.0 if is_correct else 0.0
-        components.recent_success_rate = (
-            alpha * success_value +
-            (1 - alpha) * components.recent_success_rate
-        )
-
-        # Update stability based on performance
-        if is_correct:
-            components.stability = min(
-                self.config.max_stability,
-                components.stability * self.config.success_stability_boost
-            )
-        else:
-            components.stability = max(
-                self.config.min_stability,
-                components.stability * self.config.failure_stability_penalty
-            )
-
-        # Update difficulty based on performance and mastery
-        if is_correct and new_mastery > 0.7:
-            components.difficulty = max(0.1, components.difficulty - self.config.difficulty_adaptation_rate)
-        elif not is_correct and new_mastery < 0.5:
-            components.difficulty = min(1.0, components.difficulty + self.config.difficulty_adaptation_rate)
-
-        # Update retrievability
-        if is_correct:
-            components.retrievability = min(1.0, components.retrievability + 0.2)
-        else:
-            components.retrievability = max(0.1, components.retrievability - 0.1)
+    """
+    Patch the existing FSRSForgettingModel to use simulated time.
+    Every FSRS method without an explicit now reads current_time(), so only the clock changes.
+    """
+    def patched_current_time(self) -> datetime:
+        """Simulated time from the global time manipulator"""
+        return time_manipulator.get_current_time()
 
     # Apply the patches
-    FSRSForgettingModel.get_memory_components = patched_get_memory_components
-    FSRSForgettingModel.apply_forgetting = patched_apply_forgetting
-    FSRSForgettingModel.update_memory_components = patched_update_memory_components
+    FSRSForgettingModel.current_time = patched_current_time
 
 # Apply the patches when this module is imported
 patch_fsrs_for_time_manipulation()
@@ -5377,24 +8176,26 @@ def simulate_time_passage(bkt_system, student_id: str, days: int = 0, hours: int
     total_decay = 0
     topics_affected = 0
 
-    for topic_index, original_mastery in mastery_before.items():
-        if original_mastery > 0.05:  # Only apply forgetting to topics with some mastery
-            # Apply forgetting and update student's mastery
-            new_mastery = bkt_system.fsrs_forgetting.apply_forgetting(student_id, topic_index, original_mastery)
-            student.mastery_levels[topic_index] = new_mastery
+    # Apply forgetting to topics with some mastery in one pass and update student's mastery
+    decayed = bkt_system.fsrs_forgetting.apply_forgetting_all(
+        student_id, {topic_index: mastery for topic_index, mastery in mastery_before.items() if mastery > 0.05})
 
-            decay_amount = original_mastery - new_mastery
-            if decay_amount > 0.001:  # Only track significant decay
-                decay_results.append({
-                    'topic_index': topic_index,
-                    'topic_name': bkt_system.kg.get_topic_of_index(topic_index),
-                    'mastery_before': original_mastery,
-                    'mastery_after': new_mastery,
-                    'decay_amount': decay_amount,
-                    'decay_percentage': (decay_amount / original_mastery) * 100
-                })
-                total_decay += decay_amount
-                topics_affected += 1
+    for topic_index, new_mastery in decayed.items():
+        original_mastery = mastery_before[topic_index]
+        student.mastery_levels[topic_index] = new_mastery
+
+        decay_amount = original_mastery - new_mastery
+        if decay_amount > 0.001:  # Only track significant decay
+            decay_results.append({
+                'topic_index': topic_index,
+                'topic_name': bkt_system.kg.get_topic_of_index(topic_index),
+                'mastery_before': original_mastery,
+                'mastery_after': new_mastery,
+                'decay_amount': decay_amount,
+                'decay_percentage': (decay_amount / original_mastery) * 100
+            })
+            total_decay += decay_amount
+            topics_affected += 1
 
     # Sort by decay amount
     decay_results.sort(key=lambda x: x['decay_amount'], reverse=True)
@@ -5433,11 +8234,10 @@ def preview_mastery_decay(bkt_system, student_id: str, days_ahead: int = 30) ->
     if not student:
         return {'error': 'Student not found'}
 
-    # Store original time offset
-    original_offset = time_manipulator.get_time_offset()
-
-    # Simulate time passage
-    time_manipulator.fast_forward(days=days_ahead)
+    # Predict at the simulated time days_ahead from now; nothing is fast-forwarded or updated
+    predicted = bkt_system.predict_mastery(
+        student_id, at_time=time_manipulator.get_current_time() + timedelta(days=days_ahead))
+    memory_components = bkt_system.fsrs_forgetting.memory_components.get(student_id, {})
 
     decay_preview = {
         'days_simulated': days_ahead,
@@ -5446,15 +8246,14 @@ def preview_mastery_decay(bkt_system, student_id: str, days_ahead: int = 30) ->
 
     for topic_index, current_mastery in student.mastery_levels.items():
         if current_mastery > 0.05:  # Only preview topics with some mastery
-            # Calculate predicted mastery after time passage
-            predicted_mastery = bkt_system.fsrs_forgetting.apply_forgetting(
-                student_id, topic_index, current_mastery)
+            # Predicted mastery after time passage
+            predicted_mastery = predicted[topic_index]
 
             decay_amount = current_mastery - predicted_mastery
             decay_percentage = (decay_amount / current_mastery) * 100 if current_mastery > 0 else 0
 
-            # Get memory components for additional info
-            components = bkt_system.fsrs_forgetting.get_memory_components(student_id, topic_index)
+            # Memory components for additional info (defaults for topics never reviewed)
+            components = memory_components.get(topic_index) or FSRSMemoryComponents()
 
             decay_preview['topics'].append({
                 'topic_index': topic_index,
@@ -5468,9 +8267,6 @@ def preview_mastery_decay(bkt_system, student_id: str, days_ahead: int = 30) ->
                 'retrievability': components.retrievability
             })
 
-    # Restore original time offset
-    time_manipulator._time_offset = original_offset
-
     # Sort by decay amount (most decay first)
     decay_preview['topics'].sort(key=lambda x: x['decay_amount'], reverse=True)
 
@@ -5631,11 +8427,10 @@ def preview_decay_simulation(bkt_system, student_id: str, days_ahead: int = 7) -
     if not bkt_system.fsrs_forgetting:
         return {'error': 'FSRS forgetting not enabled'}
 
-    # Store original time offset
-    original_offset = time_manipulator.get_time_offset()
-
-    # Temporarily simulate time passage
-    time_manipulator.fast_forward(days=days_ahead)
+    # Predict at the simulated time days_ahead from now; nothing is fast-forwarded or updated
+    predicted = bkt_system.predict_mastery(
+        student_id, at_time=time_manipulator.get_current_time() + timedelta(days=days_ahead))
+    memory_components = bkt_system.fsrs_forgetting.memory_components.get(student_id, {})
 
     decay_preview = {
         'days_simulated': days_ahead,
@@ -5644,15 +8439,14 @@ def preview_decay_simulation(bkt_system, student_id: str, days_ahead: int = 7) -
 
     for topic_index, current_mastery in student.mastery_levels.items():
         if current_mastery > 0.05:  # Only preview topics with some mastery
-            # Calculate predicted mastery after time passage
-            predicted_mastery = bkt_system.fsrs_forgetting.apply_forgetting(
-                student_id, topic_index, current_mastery)
+            # Predicted mastery after time passage
+            predicted_mastery = predicted[topic_index]
 
             decay_amount = current_mastery - predicted_mastery
             decay_percentage = (decay_amount / current_mastery) * 100 if current_mastery > 0 else 0
 
-            # Get memory components for additional info
-            components = bkt_system.fsrs_forgetting.get_memory_components(student_id, topic_index)
+            # Memory components for additional info (defaults for topics never reviewed)
+            components = memory_components.get(topic_index) or FSRSMemoryComponents()
 
             topic_name = bkt_system.kg.get_topic_of_index(topic_index)
             if topic_name:  # Only include topics with valid names
@@ -5668,9 +8462,6 @@ def preview_decay_simulation(bkt_system, student_id: str, days_ahead: int = 7) -
                     'retrievability': components.retrievability
                 })
 
-    # Restore original time offset (this is just a preview)
-    time_manipulator._time_offset = original_offset
-
     # Sort by decay amount (most decay first)
     decay_preview['topics'].sort(key=lambda x: x['decay_amount'], reverse=True)
 
@@ -15,8 +15,14 @@ import json
 import random
 from typing import Dict, List, Set, Tuple, Optional, Any
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timedelta
 import traceback
+import contextlib
+import io
+import itertools
+import os
+import pickle
+import tempfile
 from copy import deepcopy
 
 # Import the classes we're testing
@@ -36,6 +42,13 @@ except ImportError:
     class BayesianKnowledgeTracing: pass
     class OptimizedMCQVector: pass
 
+# The equivalence checks call the optimized paths of the current module directly
+try:
+    import mcq_algorithm
+    import sympy
+except ImportError:
+    mcq_algorithm = None
+
 # Test Configuration Classes
 @dataclass
 class TestConfig:
@@ -1646,15 +1659,736 @@ def debug_mcq_loading_issues(config_file: str = 'config.json') -> Dict[str, Any]
     return debug_info
 
 
+# Equivalence checks
+# ------------------
+# The optimized code paths of mcq_algorithm (greedy engines, batch planning, bulk ingestion,
+# columnar FSRS) promise the same results as the plain paths they replace. Each check builds
+# fresh systems on the small graph, runs both paths and compares the outcome exactly.
+# Run from the repository root, like test_skill_tracking_system.
+
+EQUIVALENCE_NODES_FILE = '_static/small-graph-kg.json'
+EQUIVALENCE_MCQS_FILE = '_static/small-graph-breakdown-mcqs-computed.json'
+EQUIVALENCE_CONFIG_FILE = '_static/config.json'
+# Question banks whose parameterized MCQs the rendering checks go through
+EQUIVALENCE_PARAMETERIZED_BANKS = (EQUIVALENCE_MCQS_FILE, '_static/computed_mcqs_breakdown.json')
+
+
+def _quietly(func, *args, **kwargs):
+    """Call func with its progress prints suppressed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def _build_equivalence_system(num_students: int = 4, seed: int = 0,
+                              dense_student_store: bool = False) -> Tuple[Any, Any, Any, Any]:
+    """
+    Fresh (kg, student_manager, mcq_scheduler, bkt_system) with students s0..s{num_students-1}.
+    Students get the same random mastery, confidence and abilities for the same seed.
+    """
+    kg = _quietly(mcq_algorithm.KnowledgeGraph, nodes_file=EQUIVALENCE_NODES_FILE,
+                  mcqs_file=EQUIVALENCE_MCQS_FILE, config_file=EQUIVALENCE_CONFIG_FILE)
+    kg.config.config['algorithm_config']['dense_student_store'] = dense_student_store
+
+    student_manager = mcq_algorithm.StudentManager(kg.config)
+    mcq_scheduler = mcq_algorithm.MCQScheduler(kg, student_manager)
+    bkt_system = _quietly(mcq_algorithm.BayesianKnowledgeTracing, kg, student_manager)
+    mcq_scheduler.set_bkt_system(bkt_system)
+    bkt_system.set_scheduler(mcq_scheduler)
+    student_manager.set_bkt_system(bkt_system)
+
+    rng = random.Random(seed)
+    for index in range(num_students):
+        student = _quietly(student_manager.create_student, f"s{index}")
+        for topic_index in kg.get_all_indexes():
+            mastery = rng.uniform(0.1, 0.6)
+            student.mastery_levels[topic_index] = mastery
+            student.confidence_levels[topic_index] = mastery * 0.8
+            student.studied_topics[topic_index] = True
+        for skill in student.ability_levels:
+            student.ability_levels[skill] = rng.uniform(0.2, 0.8)
+
+    return kg, student_manager, mcq_scheduler, bkt_system
+
+
+def _student_state(student_manager, bkt_system) -> Dict[str, Tuple]:
+    """Everything a response updates, per student, as plain comparable values"""
+    fsrs = bkt_system.fsrs_forgetting
+    return {
+        student_id: (
+            dict(student.mastery_levels),
+            dict(student.ability_levels),
+            student.total_questions_attempted,
+            [attempt.mcq_id for attempt in student.attempt_history],
+            {topic_index: (c.stability, c.difficulty, c.retrievability, c.last_review,
+                           c.review_count, c.recent_success_rate)
+             for topic_index, c in fsrs.memory_components.get(student_id, {}).items()}
+        )
+        for student_id, student in student_manager.students.items()
+    }
+
+
+def check_ingest_matches_sequential_attempts(num_events: int = 600, seed: int = 1) -> Dict[str, Any]:
+    """
+    BayesianKnowledgeTracing.ingest_responses vs record_attempt called for each response
+    in timestamp order at that time. The log is shuffled in time and has rows for an unknown
+    student and an unknown MCQ; it is ingested serially and on worker processes, with the
+    dict-backed and the dense student store.
+    """
+    kg, student_manager, _, bkt_system = _build_equivalence_system()
+    mcq_ids = list(kg.ultra_loader.minimal_mcq_data)
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    rows = [(f"s{rng.randrange(5)}", rng.choice(mcq_ids + ['unknown_mcq']), rng.random() < 0.65,
+             start + timedelta(hours=rng.randrange(2000)))
+            for _ in range(num_events)]
+
+    # Reference: one record_attempt per row, in timestamp order (ties in log order)
+    time_manipulator = mcq_algorithm.time_manipulator
+    try:
+        for _, (student_id, mcq_id, is_correct, timestamp) in sorted(enumerate(rows), key=lambda row: (row[1][3], row[0])):
+            time_manipulator.get_current_time = lambda timestamp=timestamp: timestamp
+            _quietly(student_manager.record_attempt, student_id, mcq_id, is_correct, 0.0, kg)
+    finally:
+        del time_manipulator.get_current_time
+    reference = _student_state(student_manager, bkt_system)
+
+    details = {}
+    for dense_student_store in (False, True):
+        for max_workers in (1, 3):
+            _, ingest_manager, _, ingest_bkt = _build_equivalence_system(dense_student_store=dense_student_store)
+            counts = _quietly(ingest_bkt.ingest_responses, iter(rows), max_workers=max_workers, block_size=2)
+            store = 'dense' if dense_student_store else 'dict'
+            details[f"{store}_workers_{max_workers}"] = {
+                'matches': _student_state(ingest_manager, ingest_bkt) == reference,
+                'counts': counts
+            }
+
+    skipped_rows = all(run['counts']['unknown_students'] > 0 and run['counts']['unknown_mcqs'] > 0
+                       for run in details.values())
+    details['success'] = skipped_rows and all(run['matches'] for run in details.values())
+    return details
+
+
+def _compare_greedy_engine(engine: str, num_questions: int = 20, seeds: Tuple[int, ...] = (0, 1, 2),
+                           confidences: Tuple[float, ...] = (1.0, 0.4)) -> Dict[str, Any]:
+    """select_optimal_mcqs with the given engine vs the loop engine, per seed and confidence"""
+    details = {}
+    for seed in seeds:
+        _, _, mcq_scheduler, _ = _build_equivalence_system(num_students=1, seed=seed)
+        for confidence in confidences:
+            expected = _quietly(mcq_scheduler.select_optimal_mcqs, 's0', num_questions,
+                                confidence=confidence, engine='loop')
+            loop_evaluations = mcq_scheduler.greedy_stats['ratio_evaluations']
+            selected = _quietly(mcq_scheduler.select_optimal_mcqs, 's0', num_questions,
+                                confidence=confidence, engine=engine)
+            details[f"seed_{seed}_confidence_{confidence}"] = {
+                'matches': selected == expected,
+                'selected': len(selected),
+                'loop_evaluations': loop_evaluations,
+                f"{engine}_evaluations": mcq_scheduler.greedy_stats['ratio_evaluations']
+            }
+    details['success'] = all(run['matches'] and run['selected'] > 0 for run in details.values())
+    return details
+
+
+def check_vectorized_engine_matches_loop() -> Dict[str, Any]:
+    """The 'vectorized' greedy engine selects the same MCQs, in the same order, as 'loop'"""
+    return _compare_greedy_engine('vectorized')
+
+
+def check_lazy_engine_matches_loop() -> Dict[str, Any]:
+    """The 'lazy' (CELF) greedy engine selects the same MCQs, in the same order, as 'loop'"""
+    return _compare_greedy_engine('lazy')
+
+
+def check_batch_planning_matches_per_student(num_students: int = 12, num_questions: int = 15) -> Dict[str, Any]:
+    """
+    MCQScheduler.select_optimal_mcqs_batch vs select_optimal_mcqs called per student, for each
+    engine, planned serially and on worker processes. Results must come back in input order.
+    """
+    student_ids = [f"s{index}" for index in range(num_students)]
+    details = {}
+    for engine in ('loop', 'vectorized', 'lazy'):
+        _, _, mcq_scheduler, _ = _build_equivalence_system(num_students=num_students)
+        expected = {student_id: _quietly(mcq_scheduler.select_optimal_mcqs, student_id, num_questions, engine=engine)
+                    for student_id in student_ids}
+        for max_workers in (1, 3):
+            planned = _quietly(mcq_scheduler.select_optimal_mcqs_batch, student_ids, num_questions,
+                               engine=engine, max_workers=max_workers, block_size=4)
+            details[f"{engine}_workers_{max_workers}"] = {
+                'matches': planned == expected,
+                'input_order': list(planned) == student_ids,
+                'batch_stats': dict(mcq_scheduler.batch_stats)
+            }
+    details['success'] = all(run['matches'] and run['input_order'] for run in details.values())
+    return details
+
+
+def _build_reviewed_student(num_events: int = 200, seed: int = 2,
+                            spacing_hours: float = 5.0) -> Tuple[Any, Any, datetime]:
+    """(student_manager, bkt_system, time of last response) for student s0 after a replayed response history"""
+    kg, student_manager, _, bkt_system = _build_equivalence_system(num_students=1, seed=seed)
+    mcq_ids = list(kg.ultra_loader.minimal_mcq_data)
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    rows = [('s0', rng.choice(mcq_ids), rng.random() < 0.7, start + timedelta(hours=spacing_hours * index))
+            for index in range(num_events)]
+    _quietly(bkt_system.ingest_responses, rows, max_workers=1)
+    return student_manager, bkt_system, rows[-1][3]
+
+
+def check_apply_forgetting_all_matches_scalar(days_after: Tuple[float, ...] = (0.5, 5.0, 60.0)) -> Dict[str, Any]:
+    """
+    FSRSForgettingModel.apply_forgetting_all vs apply_forgetting called per topic, on copies of
+    the same memory state: same decayed mastery (up to the last bit np.exp may differ in) and
+    the same last_review / due-time updates, including topics that had no memory state yet.
+    """
+    student_manager, bkt_system, last_response = _build_reviewed_student()
+    fsrs = bkt_system.fsrs_forgetting
+    mastery_levels = dict(student_manager.get_student('s0').mastery_levels)
+    original_columns = fsrs.memory_components['s0']
+
+    details = {}
+    for days in days_after:
+        now = last_response + timedelta(days=days)
+
+        fsrs.memory_components['s0'] = deepcopy(original_columns)
+        scalar = {topic_index: fsrs.apply_forgetting('s0', topic_index, mastery, now)
+                  for topic_index, mastery in mastery_levels.items()}
+        scalar_columns = fsrs.memory_components['s0']
+
+        fsrs.memory_components['s0'] = deepcopy(original_columns)
+        vectorized = fsrs.apply_forgetting_all('s0', mastery_levels, now)
+        vectorized_columns = fsrs.memory_components['s0']
+
+        max_relative_error = max(abs(vectorized[topic_index] - value) / value for topic_index, value in scalar.items())
+        details[f"days_{days}"] = {
+            'same_topics': list(vectorized) == list(scalar),
+            'max_relative_error': max_relative_error,
+            'same_state': (vectorized_columns.slot_of == scalar_columns.slot_of
+                           and np.array_equal(vectorized_columns.last_review_us, scalar_columns.last_review_us)
+                           and np.array_equal(vectorized_columns.due_us, scalar_columns.due_us)),
+            'topics': len(scalar),
+            'topics_with_memory_before': len(original_columns.slot_of),
+            'decayed_topics': sum(1 for topic_index, value in scalar.items() if value != mastery_levels[topic_index])
+        }
+
+    fsrs.memory_components['s0'] = original_columns
+    details['success'] = all(run['same_topics'] and run['same_state'] and run['max_relative_error'] <= 1e-12
+                             and run['decayed_topics'] > 0 for run in details.values())
+    return details
+
+
+def check_predict_mastery_is_pure(days_after: float = 60.0) -> Dict[str, Any]:
+    """
+    BayesianKnowledgeTracing.predict_mastery and the read-only helpers built on it leave mastery
+    and FSRS memory state untouched, and predict what apply_forgetting would return at that time.
+    """
+    student_manager, bkt_system, last_response = _build_reviewed_student()
+    fsrs = bkt_system.fsrs_forgetting
+    student = student_manager.get_student('s0')
+
+    def snapshot():
+        return pickle.dumps((fsrs.memory_components, dict(student.mastery_levels)))
+
+    before = snapshot()
+    at_time = last_response + timedelta(days=days_after)
+    predicted = bkt_system.predict_mastery('s0', at_time=at_time)
+    _quietly(bkt_system.get_review_recommendations, 's0')
+    _quietly(bkt_system.get_fsrs_diagnostics, 's0')
+    for topic_index in list(predicted)[:5]:
+        bkt_system.get_current_mastery_with_decay('s0', topic_index)
+    unchanged = snapshot() == before
+
+    # Reference: the updating path, on a copy of the memory state
+    original_columns = fsrs.memory_components['s0']
+    fsrs.memory_components['s0'] = deepcopy(original_columns)
+    expected = {topic_index: fsrs.apply_forgetting('s0', topic_index, mastery, at_time)
+                for topic_index, mastery in student.mastery_levels.items()}
+    fsrs.memory_components['s0'] = original_columns
+
+    mismatched = sum(1 for topic_index, value in expected.items() if predicted.get(topic_index) != value)
+    details = {
+        'state_unchanged': unchanged,
+        'topics': len(predicted),
+        'mismatched_predictions': mismatched,
+        'decayed_topics': sum(1 for topic_index, value in predicted.items() if value != student.mastery_levels[topic_index])
+    }
+    details['success'] = unchanged and mismatched == 0 and len(predicted) == len(expected) and details['decayed_topics'] > 0
+    return details
+
+
+def check_due_topics_matches_full_scan(hours_after: Tuple[float, ...] = tuple(index / 4 for index in range(25)) + (12, 24, 96, 1440)) -> Dict[str, Any]:
+    """
+    FSRSForgettingModel.due_topics (due-time heap) vs scanning every topic with memory state
+    for predicted retention below retrievability_threshold, at times after the last response.
+    """
+    # Responses a few minutes apart, so many topics were reviewed shortly before by_time
+    _, bkt_system, last_response = _build_reviewed_student(spacing_hours=0.1)
+    fsrs = bkt_system.fsrs_forgetting
+    threshold = fsrs.config.retrievability_threshold
+    topics = list(fsrs.memory_components['s0'].slot_of)
+
+    details = {}
+    # Quarter-hour steps after the last reviews, where topics cross the threshold
+    for hours in hours_after:
+        by_time = last_response + timedelta(hours=hours)
+        due = fsrs.due_topics('s0', by_time)
+        retention = fsrs.predict_forgetting('s0', {topic_index: 1.0 for topic_index in topics}, at_time=by_time)
+        scanned = {topic_index for topic_index, value in retention.items() if value < threshold}
+        details[f"hours_{hours}"] = {
+            'matches': set(due) == scanned and len(due) == len(set(due)),
+            'due': len(due),
+            'scanned': len(scanned)
+        }
+
+    details['success'] = (all(run['matches'] for run in details.values())
+                          and any(run['due'] for run in details.values()))
+    return details
+
+
+def check_dense_store_matches_dict_store(seeds: Tuple[int, ...] = (0, 1, 2), num_questions: int = 20) -> Dict[str, Any]:
+    """
+    select_optimal_mcqs for every engine with algorithm_config.dense_student_store on and off.
+    Topics are given mastery in shuffled order and mastery values repeat, so any difference in
+    iteration order between TopicRow and the dict it replaces would show up in tie-breaks.
+    """
+    details = {}
+    for seed in seeds:
+        runs = {}
+        for dense_student_store in (False, True):
+            kg, student_manager, mcq_scheduler, bkt_system = _build_equivalence_system(
+                num_students=0, dense_student_store=dense_student_store)
+            rng = random.Random(seed)
+            topics = list(kg.get_all_indexes())
+            rng.shuffle(topics)
+            student = _quietly(student_manager.create_student, 's0')
+            for topic_index in topics:
+                mastery = round(rng.uniform(0.1, 0.6), 1)
+                student.mastery_levels[topic_index] = mastery
+                student.confidence_levels[topic_index] = mastery * 0.8
+                student.studied_topics[topic_index] = True
+            mcq_ids = list(kg.ultra_loader.minimal_mcq_data)
+            start = datetime(2024, 1, 1)
+            _quietly(bkt_system.ingest_responses,
+                     [('s0', rng.choice(mcq_ids), rng.random() < 0.6, start + timedelta(hours=index)) for index in range(100)],
+                     max_workers=1)
+            runs[dense_student_store] = (
+                list(student.mastery_levels.items()),
+                list(student.studied_topics),
+                {engine: _quietly(mcq_scheduler.select_optimal_mcqs, 's0', num_questions, engine=engine)
+                 for engine in ('loop', 'vectorized', 'lazy')}
+            )
+        details[f"seed_{seed}"] = {
+            'same_iteration_order': runs[True][:2] == runs[False][:2],
+            'same_selection': runs[True][2] == runs[False][2],
+            'selected': len(runs[False][2]['loop'])
+        }
+    details['success'] = all(run['same_iteration_order'] and run['same_selection'] and run['selected'] > 0
+                             for run in details.values())
+    return details
+
+
+def _parameterized_mcq_records() -> List[Dict]:
+    """Raw records of every parameterized MCQ in EQUIVALENCE_PARAMETERIZED_BANKS"""
+    records = []
+    for mcqs_file in EQUIVALENCE_PARAMETERIZED_BANKS:
+        with open(mcqs_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        mcqs = data['mcqs'] if isinstance(data, dict) else data
+        records.extend(record for record in mcqs if record.get('generated_parameters'))
+    return records
+
+
+def _render_uncached(mcq, params: Dict) -> List:
+    """Question text, options, explanations and every breakdown step rendered directly for params"""
+    mcq._current_params = params
+    rendered = [mcq.generate_question_text(mcq.text, params), mcq.render_options(params),
+                mcq.render_option_explanations(params)]
+    for route in (mcq.breakdown or {}).values():
+        for step_data in route.get('steps', []):
+            step = mcq_algorithm.BreakdownStep.from_dict(step_data, mcq)
+            rendered.append((step.render_step_text(), step.render_step_options(),
+                             step.render_step_option_explanations()))
+    return rendered
+
+
+class _SubsExpression:
+    """Reference for compile_expression: sympify on every call and substitute with subs()"""
+
+    def __init__(self, text: str):
+        self.expr = sympy.sympify(text, locals={'__builtins__': {}})
+
+    def substitute(self, params: Dict):
+        return self.expr.subs(params)
+
+
+def check_compiled_expressions_match_subs(seeds: Tuple[int, ...] = tuple(range(10))) -> Dict[str, Any]:
+    """
+    Every parameterized MCQ of the bundled banks, with its breakdown steps, rendered through
+    compile_expression (parsed once, exact parameters bound directly) and through a fresh
+    sympify(...).subs(...) per call, for the same parameters. The render cache is off.
+    """
+    records = _parameterized_mcq_records()
+    original_capacity = mcq_algorithm.RENDER_CACHE.capacity
+    compile_expression = mcq_algorithm.compile_expression
+    mismatched = []
+    renders = 0
+    try:
+        mcq_algorithm.RENDER_CACHE.set_capacity(0)
+        for record in records:
+            mcq = mcq_algorithm.MCQ.from_dict(record)
+            for seed in seeds:
+                random.seed(seed)
+                params = _quietly(mcq._generate_parameters)
+                compiled = _quietly(_render_uncached, mcq, dict(params))
+                mcq_algorithm.compile_expression = _SubsExpression
+                try:
+                    reference = _quietly(_render_uncached, mcq, dict(params))
+                finally:
+                    mcq_algorithm.compile_expression = compile_expression
+                renders += 1
+                if compiled != reference:
+                    mismatched.append((mcq.id, seed))
+    finally:
+        mcq_algorithm.RENDER_CACHE.set_capacity(original_capacity)
+
+    return {
+        'mcqs': len(records),
+        'renders': renders,
+        'mismatched': mismatched[:10],
+        'success': renders > 0 and not mismatched
+    }
+
+
+def check_render_cache_matches_fresh_render(seeds: Tuple[int, ...] = tuple(range(6))) -> Dict[str, Any]:
+    """
+    question_text / question_options / rendered_option_explanations served by RENDER_CACHE vs
+    rendering the same parameters directly: for the MCQ that filled the cache, for a reloaded
+    copy of it, and for an edited copy under the same id, which must not get the cached render.
+    """
+    render_cache = mcq_algorithm.RENDER_CACHE
+    records = _parameterized_mcq_records()
+    render_cache.clear()
+    hits_before = render_cache.get_stats()['render_cache_hits']
+
+    def served(mcq):
+        return [mcq.question_text, mcq.question_options, mcq.rendered_option_explanations]
+
+    mismatched = []
+    for record in records:
+        mcq = mcq_algorithm.MCQ.from_dict(record)
+        reloaded = mcq_algorithm.MCQ.from_dict(record)
+        edited = mcq_algorithm.MCQ.from_dict(dict(record, text='Edited: ' + record['text']))
+        for seed in seeds:
+            random.seed(seed)
+            params = _quietly(mcq._generate_parameters)
+            expected = _quietly(_render_uncached, mcq, dict(params))[:3]
+            edited_expected = _quietly(_render_uncached, edited, dict(params))[:3]
+
+            mcq._current_params = dict(params)
+            reloaded._current_params = dict(params)
+            edited._current_params = dict(params)
+            for label, rendered, want in (('first', _quietly(served, mcq), expected),
+                                          ('cached', _quietly(served, mcq), expected),
+                                          ('reloaded', _quietly(served, reloaded), expected),
+                                          ('edited', _quietly(served, edited), edited_expected)):
+                if rendered != want:
+                    mismatched.append((mcq.id, seed, label))
+
+    hits = render_cache.get_stats()['render_cache_hits'] - hits_before
+    return {
+        'mcqs': len(records),
+        'cache_hits': hits,
+        'mismatched': mismatched[:10],
+        'success': hits > 0 and not mismatched
+    }
+
+
+def _broken_parameter_constraints(generated_parameters: Dict[str, Dict], params: Dict) -> List[str]:
+    """
+    Generated parameters whose value is outside its int range or choices, or breaks its
+    exclude rule (another parameter's name, a list of values or a single value).
+    """
+    broken = []
+    for param_name, config in generated_parameters.items():
+        value = params.get(param_name)
+        if config.get('type') == 'int' and not (isinstance(value, int) and config['min'] <= value <= config['max']):
+            broken.append(param_name)
+            continue
+        if config.get('type') == 'choice' and value not in config.get('choices', []):
+            broken.append(param_name)
+            continue
+        exclude = config.get('exclude')
+        if isinstance(exclude, str):
+            if exclude in params and exclude != param_name and value == params[exclude]:
+                broken.append(param_name)
+        elif isinstance(exclude, list):
+            if value in exclude:
+                broken.append(param_name)
+        elif isinstance(exclude, (int, float)) and value == exclude:
+            broken.append(param_name)
+    return broken
+
+
+def _evaluate_calculation_plan(calculated_parameters: Dict[str, str], params: Dict) -> Dict:
+    """params plus the calculated parameters, evaluated as _generate_parameters does"""
+    values = dict(params)
+    namespace = mcq_algorithm.MCQ.create_safe_math_namespace(values)
+    for calc_name, _, code in mcq_algorithm.calculation_plan(calculated_parameters).steps:
+        if code is None:
+            continue
+        try:
+            result = mcq_algorithm._evaluate_calculation(code, {"__builtins__": {}}, namespace)
+        except Exception:
+            continue
+        values[calc_name] = result
+        namespace[calc_name] = result
+    return values
+
+
+def check_variant_pool_matches_online_generation(variants_per_mcq: int = 8, draws_per_mcq: int = 6) -> Dict[str, Any]:
+    """
+    Variants drawn from a pool written by build_variant_pools and loaded back from JSON vs
+    on-line generation: the served text, options and explanations equal a direct render of the
+    drawn parameters, the generated parameters satisfy the MCQ's constraints, and the calculated
+    ones equal, value and type, what _generate_parameters computes from them.
+    """
+    kg = _quietly(mcq_algorithm.KnowledgeGraph, nodes_file=EQUIVALENCE_NODES_FILE,
+                  mcqs_file=EQUIVALENCE_MCQS_FILE, config_file=EQUIVALENCE_CONFIG_FILE)
+    loader = kg.ultra_loader
+
+    with tempfile.TemporaryDirectory() as pool_directory:
+        pool_file = os.path.join(pool_directory, 'equivalence.variants.json')
+        _quietly(mcq_algorithm.build_variant_pools, EQUIVALENCE_MCQS_FILE, pool_file,
+                 variants_per_mcq=variants_per_mcq)
+        _quietly(loader.load_variant_pools, pool_file)
+
+    mismatched_renders, broken_constraints, mismatched_calculations = [], [], []
+    draws = 0
+    # MCQs whose calculated parameters never all evaluate get an empty pool and are generated on-line
+    pooled_mcqs = [mcq_id for mcq_id, pool in loader.variant_pools.items() if pool]
+    for mcq_id in pooled_mcqs:
+        for _ in range(draws_per_mcq):
+            mcq = kg.get_mcq_safely(mcq_id, need_full_text=True)
+            params = dict(mcq._current_params)
+            served = _quietly(lambda: [mcq.question_text, mcq.question_options, mcq.rendered_option_explanations])
+            calculated_parameters = mcq.calculated_parameters or {}
+            generated = {name: value for name, value in params.items() if name not in calculated_parameters}
+            recomputed = _evaluate_calculation_plan(calculated_parameters, generated)
+            expected = _quietly(_render_uncached, mcq, dict(params))[:3]
+            draws += 1
+            if served != expected:
+                mismatched_renders.append(mcq_id)
+            if _broken_parameter_constraints(mcq.generated_parameters, params):
+                broken_constraints.append(mcq_id)
+            if recomputed != params or [type(value) for value in recomputed.values()] != [type(value) for value in params.values()]:
+                mismatched_calculations.append(mcq_id)
+
+    return {
+        'pooled_mcqs': len(pooled_mcqs),
+        'empty_pools': len(loader.variant_pools) - len(pooled_mcqs),
+        'draws': draws,
+        'variant_draws': loader.get_stats()['variant_pool_draws'],
+        'mismatched_renders': mismatched_renders[:10],
+        'broken_constraints': broken_constraints[:10],
+        'mismatched_calculations': mismatched_calculations[:10],
+        'success': draws > 0 and not (mismatched_renders or broken_constraints or mismatched_calculations)
+    }
+
+
+def check_parameter_domains_respect_constraints(draws_per_mcq: int = 50, synthetic_draws: int = 20000) -> Dict[str, Any]:
+    """
+    Parameters sampled from ParameterDomains vs the constraints of the rejection loop they
+    replace. Every bundled parameterized MCQ only gets values inside its ranges and choices that
+    pass its exclude rules. A synthetic MCQ whose excludes tie parameters together reaches exactly
+    the allowed combinations. Unsatisfiable specs are reported as invalid and fall back.
+    """
+    records = _parameterized_mcq_records()
+    broken = []
+    for record in records:
+        mcq = mcq_algorithm.MCQ.from_dict(record)
+        random.seed(0)
+        for _ in range(draws_per_mcq):
+            params = _quietly(mcq._generate_parameters)
+            if _broken_parameter_constraints(mcq.generated_parameters, params):
+                broken.append(mcq.id)
+
+    # Linked excludes: a/b differ, c/d differ and d != 0, k is never 'q'
+    linked = {'a': {'type': 'int', 'min': 1, 'max': 4}, 'b': {'type': 'int', 'min': 1, 'max': 4, 'exclude': 'a'},
+              'c': {'type': 'int', 'min': -2, 'max': 2, 'exclude': 'd'}, 'd': {'type': 'int', 'min': -2, 'max': 2, 'exclude': 0},
+              'k': {'type': 'choice', 'choices': ['p', 'q', 'r'], 'exclude': ['q']}}
+    names = list(linked)
+    candidates = [range(config['min'], config['max'] + 1) if config['type'] == 'int' else config['choices']
+                  for config in linked.values()]
+    allowed = {combination for combination in itertools.product(*candidates)
+               if not _broken_parameter_constraints(linked, dict(zip(names, combination)))}
+    synthetic = mcq_algorithm.MCQ.from_dict(dict(records[0], id='equivalence-linked-parameters',
+                                                 generated_parameters=linked, calculated_parameters={}))
+    random.seed(1)
+    drawn = set()
+    for _ in range(synthetic_draws):
+        params = _quietly(synthetic._generate_parameters)
+        drawn.add(tuple(params[name] for name in names))
+
+    # Specs no attempt can satisfy
+    unsatisfiable = {
+        'excluded_only_value': {'a': {'type': 'int', 'min': 1, 'max': 1, 'exclude': 1}},
+        'empty_range': {'a': {'type': 'int', 'min': 3, 'max': 1}},
+        'no_choices': {'k': {'type': 'choice', 'choices': []}},
+        'linked_single_values': {'a': {'type': 'int', 'min': 1, 'max': 1},
+                                 'b': {'type': 'int', 'min': 1, 'max': 1, 'exclude': 'a'}},
+    }
+    unreported = []
+    for spec_name, generated_parameters in unsatisfiable.items():
+        mcq_id = f"equivalence-{spec_name}"
+        mcq = mcq_algorithm.MCQ.from_dict(dict(records[0], id=mcq_id, generated_parameters=generated_parameters,
+                                               calculated_parameters={}))
+        _quietly(mcq._generate_parameters)
+        fallbacks = {entry['mcq_id']: entry['fallbacks'] for entry in mcq_algorithm.get_parameter_sampling_stats()}
+        if not mcq_algorithm.ParameterDomains(generated_parameters).invalid or not fallbacks.get(mcq_id):
+            unreported.append(spec_name)
+
+    return {
+        'mcqs': len(records),
+        'broken_constraints': broken[:10],
+        'allowed_combinations': len(allowed),
+        'drawn_combinations': len(drawn),
+        'unreported_invalid_specs': unreported,
+        'success': not broken and drawn == allowed and not unreported
+    }
+
+
+def _evaluate_written_order(calculated_parameters: Dict[str, str], params: Dict) -> Optional[Dict]:
+    """
+    params plus the calculated parameters, evaluated in written order with a fresh namespace per
+    expression, repeating whole passes until nothing changes. None if that never settles (a cycle).
+    """
+    values = dict(params)
+    for _ in range(len(calculated_parameters) + 1):
+        before = _value_fingerprint(values)
+        for calc_name, calc_expr in calculated_parameters.items():
+            if calc_name == calc_expr:
+                continue
+            try:
+                values[calc_name] = eval(calc_expr, {"__builtins__": {}},
+                                         mcq_algorithm.MCQ.create_safe_math_namespace(values))
+            except Exception:
+                continue
+        if _value_fingerprint(values) == before:
+            return values
+    return None
+
+
+def _value_fingerprint(values: Dict) -> List[Tuple[str, str, str]]:
+    """Comparable (name, type, repr) of each value, so NaN equals NaN and 2 differs from 2.0"""
+    return sorted((name, type(value).__name__, repr(value)) for name, value in values.items())
+
+
+def check_calculation_plan_matches_written_order(draws_per_mcq: int = 5) -> Dict[str, Any]:
+    """
+    calculated_parameters evaluated through their CalculationPlan vs written-order evaluation
+    repeated until it settles, for every bundled MCQ block, every breakdown step block (with the
+    parent's parameters) and each block with its entries reversed.
+    """
+    blocks, mismatched, cycles = 0, [], []
+    for record in _parameterized_mcq_records():
+        mcq = mcq_algorithm.MCQ.from_dict(record)
+        random.seed(0)
+        for _ in range(draws_per_mcq):
+            params = _quietly(mcq._generate_parameters)
+            generated = {name: params[name] for name in mcq.generated_parameters if name in params}
+            cases = [(mcq.calculated_parameters or {}, generated)]
+            mcq._current_params = params
+            for route in (mcq.breakdown or {}).values():
+                for step_data in route.get('steps', []):
+                    step = mcq_algorithm.BreakdownStep.from_dict(step_data, mcq)
+                    cases.append((step.all_calculated_parameters, dict(params)))
+            for calculated_parameters, base in cases:
+                if not calculated_parameters:
+                    continue
+                for block in (calculated_parameters, dict(reversed(list(calculated_parameters.items())))):
+                    blocks += 1
+                    expected = _evaluate_written_order(block, base)
+                    if expected is None:
+                        cycles.append(mcq.id)
+                    elif _value_fingerprint(_evaluate_calculation_plan(block, base)) != _value_fingerprint(expected):
+                        mismatched.append(mcq.id)
+
+    return {
+        'blocks': blocks,
+        'mismatched': sorted(set(mismatched))[:10],
+        'unsettled': sorted(set(cycles))[:10],
+        'success': blocks > 0 and not mismatched
+    }
+
+
+EQUIVALENCE_CHECKS = [
+    ("Ingest vs Sequential Attempts", check_ingest_matches_sequential_attempts),
+    ("Vectorized vs Loop Engine", check_vectorized_engine_matches_loop),
+    ("Lazy vs Loop Engine", check_lazy_engine_matches_loop),
+    ("Batch vs Per-Student Planning", check_batch_planning_matches_per_student),
+    ("Vectorized vs Scalar Forgetting", check_apply_forgetting_all_matches_scalar),
+    ("Side-Effect-Free Mastery Prediction", check_predict_mastery_is_pure),
+    ("Due Topics vs Full Scan", check_due_topics_matches_full_scan),
+    ("Dense vs Dict Student Store", check_dense_store_matches_dict_store),
+    ("Compiled Expressions vs subs()", check_compiled_expressions_match_subs),
+    ("Render Cache vs Fresh Render", check_render_cache_matches_fresh_render),
+    ("Variant Pool vs On-Line Generation", check_variant_pool_matches_online_generation),
+    ("Parameter Domains vs Constraints", check_parameter_domains_respect_constraints),
+    ("Calculation Plan vs Written Order", check_calculation_plan_matches_written_order),
+]
+
+
+def run_equivalence_checks() -> List[TestResult]:
+    """Run every equivalence check of the optimized paths and print a summary"""
+    print("\n🟰 RUNNING EQUIVALENCE CHECKS")
+    print("-" * 50)
+
+    if mcq_algorithm is None:
+        print("⚠️  mcq_algorithm could not be imported - skipping equivalence checks")
+        return []
+
+    results = []
+    for test_name, check in EQUIVALENCE_CHECKS:
+        start_time = time.time()
+        try:
+            details = check()
+            success = details.pop('success')
+            results.append(TestResult(
+                test_name=test_name,
+                success=success,
+                execution_time=time.time() - start_time,
+                details=details
+            ))
+            print(f"{'✅' if success else '❌'} {test_name}: {'PASSED' if success else 'FAILED'}")
+            if not success:
+                print(f"   {details}")
+        except Exception as e:
+            results.append(TestResult(
+                test_name=test_name,
+                success=False,
+                execution_time=time.time() - start_time,
+                error_message=str(e)
+            ))
+            print(f"❌ {test_name}: FAILED - {str(e)}")
+            traceback.print_exc()
+
+    passed = sum(1 for result in results if result.success)
+    print(f"\n📊 Equivalence checks passed: {passed}/{len(results)}")
+    return results
+
+
 if __name__ == "__main__":
     print("MCQ Algorithm Test Suite - Choose an option:")
     print("1. Quick functionality test")
     print("2. Debug MCQ loading issues")
     print("3. Full comprehensive test suite")
     print("4. Weight optimization only")
+    print("5. Equivalence checks (optimized paths vs reference paths)")
 
     try:
-        choice = input("Enter choice (1-4, or press Enter for full suite): ").strip()
+        choice = input("Enter choice (1-5, or press Enter for full suite): ").strip()
     except:
         choice = "3"  # Default to full suite
 
@@ -1676,6 +2410,10 @@ if __name__ == "__main__":
         for result in weight_results:
             print(f"  {result['config_name']}: {result['avg_coverage_ratio']:.3f} coverage")
 
+    elif choice == "5":
+        equivalence_results = run_equivalence_checks()
+        print(f"✅ Equivalence checks {'PASSED' if all(r.success for r in equivalence_results) else 'FAILED'}")
+
     else:  # choice == "3" or default
         print("\n🚀 Starting comprehensive MCQ algorithm test suite...")
         results = run_comprehensive_tests()
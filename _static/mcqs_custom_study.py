@@ -636,35 +636,15 @@ class CustomStudyScheduler(MCQScheduler):
         """Get topics that will be due tomorrow using FSRS predictions"""
         from datetime import timedelta
 
-        tomorrow = datetime.now() + timedelta(days=1)
-        due_topics = []
+        fsrs = self.bkt_system.fsrs_forgetting
+        tomorrow = fsrs.current_time() + timedelta(days=1)
 
         print("   🔮 Using FSRS to predict tomorrow's due topics...")
 
-        for topic_id in student.mastery_levels.keys():
-            try:
-                # Get FSRS memory components
-                memory_components = self.bkt_system.fsrs_forgetting.get_memory_components(
-                    student.id if hasattr(student, 'id') else 'unknown_student',
-                    topic_id
-                )
-
-                # Calculate predicted retrievability tomorrow
-                predicted_retrievability = self.bkt_system.fsrs_forgetting.calculate_retrievability(
-                    memory_components, tomorrow
-                )
-
-                # Topic is due if retrievability drops below threshold
-                retrievability_threshold = self.kg.config.get('bkt_config.fsrs_retrievability_threshold')
-                if predicted_retrievability < retrievability_threshold:
-                    due_topics.append(topic_id)
-
-            except Exception as e:
-                # If FSRS calculation fails for this topic, skip it
-                print(f"   ⚠️  FSRS calculation failed for topic {topic_id}: {e}")
-                continue
-
-        return due_topics
+        # Topics whose retention drops below fsrs_retrievability_threshold by tomorrow,
+        # popped from the student's due-review heap instead of scanning every topic
+        return [topic_id for topic_id in fsrs.due_topics(student.student_id, tomorrow)
+                if topic_id in student.mastery_levels]
 
     def _get_tomorrows_due_topics_fallback(self, student: StudentProfile) -> List[int]:
         """
@@ -696,15 +676,19 @@ class CustomStudyScheduler(MCQScheduler):
         # Use existing importance calculation from parent class
         return self.kg.get_node_degree(node_id)['out_degree'] / 10.0  # Normalize
 
-    def _get_mcqs_for_node(self, node_id: int) -> List[str]:
-        """Get all MCQ IDs that test a specific node."""
+    def _get_mcqs_for_node(self, node_id: int, min_weight: float = 0.0) -> List[str]:
+        """Get all MCQ IDs that test a specific node (as main topic or with subtopic weight >= min_weight)."""
         mcq_ids = []
         if hasattr(self.kg, 'ultra_loader'):
             mcq_ids = self.kg.ultra_loader.get_mcq_ids_for_due_topics([node_id])
+            # Subtopic coverage from the weight-sorted inverted index, highest weight first
+            main_topic_ids = set(mcq_ids)
+            mcq_ids.extend(mcq_id for mcq_id in self.kg.ultra_loader.get_mcq_ids_for_subtopic(node_id, min_weight)
+                           if mcq_id not in main_topic_ids)
         else:
             # Fallback for regular loading
             for mcq_id, mcq in self.kg.mcqs.items():
-                if mcq.main_topic_index == node_id or node_id in mcq.subtopic_weights:
+                if mcq.main_topic_index == node_id or mcq.subtopic_weights.get(node_id, -1.0) >= min_weight:
                     mcq_ids.append(mcq_id)
         return mcq_ids
 
@@ -1,7 +1,9 @@
 import uuid
 import json
 from typing import Dict, List, Union
-from mcq_algorithm import DifficultyBreakdown, KnowledgeGraph, MCQ
+from dataclasses import asdict
+import numpy as np
+from mcq_algorithm import DifficultyBreakdown, KnowledgeGraph, MCQ, build_variant_pools, compile_question_bank
 
 def process_mcq_document(mcq_document: Union[List[Dict], Dict], knowledge_graph) -> List[Dict]:
     """
@@ -47,23 +49,26 @@ def _calculate_prerequisites(subtopic_weights: Dict[int, float], knowledge_graph
     Get all prerequisite topics needed to attempt this question.
     Uses graph traversal to find dependencies of tested topics.
     """
-    adjacency_matrix = knowledge_graph.get_adjacency_matrix()
+    adjacency = knowledge_graph.get_adjacency_csr()
     prerequisites = {}
 
-    if adjacency_matrix.size > 0:
-        for topic_index, topic_weight in subtopic_weights.items():
-            if topic_index < adjacency_matrix.shape[0]:
-                topic_prereqs = adjacency_matrix[topic_index, :]
+    for topic_index, topic_weight in subtopic_weights.items():
+        if 0 <= topic_index < adjacency.shape[0]:
+            start, end = adjacency.indptr[topic_index], adjacency.indptr[topic_index + 1]
+            row_indices = adjacency.indices[start:end]
+            row_strengths = adjacency.data[start:end]
 
-                for prereq_index, prereq_strength in enumerate(topic_prereqs):
-                    if prereq_strength > 0:
-                        weighted_prereq = prereq_strength * topic_weight
-                        prereq_key = str(prereq_index)
+            # Visit prerequisites in index order, as the dense row scan did
+            order = np.argsort(row_indices, kind='stable')
+            for prereq_index, prereq_strength in zip(row_indices[order].tolist(), row_strengths[order].tolist()):
+                if prereq_strength > 0:
+                    weighted_prereq = prereq_strength * topic_weight
+                    prereq_key = str(prereq_index)
 
-                        if prereq_key in prerequisites:
-                            prerequisites[prereq_key] = max(prerequisites[prereq_key], weighted_prereq)
-                        else:
-                            prerequisites[prereq_key] = weighted_prereq
+                    if prereq_key in prerequisites:
+                        prerequisites[prereq_key] = max(prerequisites[prereq_key], weighted_prereq)
+                    else:
+                        prerequisites[prereq_key] = weighted_prereq
 
     return prerequisites
 
@@ -140,7 +145,7 @@ def _process_single_mcq(mcq_input: Dict, knowledge_graph) -> Dict:
         "main_topic_index": int(main_topic_index),
         "chapter": str(chapter),
         "subtopic_weights": subtopic_weights,
-        'difficulty_breakdown': difficulty_breakdown.__dict__,
+        'difficulty_breakdown': asdict(difficulty_breakdown),
         "overall_difficulty": float(overall_difficulty),
         'prerequisites': {str(k): v for k, v in prerequisites.items()}
     }
@@ -264,6 +269,10 @@ def usage():
     processed_mcqs = process_mcq_document(mcq_document, kg)
     with open('_static\small-graph-breakdown-mcqs-computed.json', 'w') as f:
         json.dump({"mcqs": processed_mcqs}, f, indent=2)
+    # Columnar index next to the JSON; pass the .npz as mcqs_file for fast loading
+    compile_question_bank('_static\small-graph-breakdown-mcqs-computed.json')
+    # Pre-rendered parameter variants; point mcq_loader.variant_pool_file at the sidecar to use them
+    build_variant_pools('_static\small-graph-breakdown-mcqs-computed.json')
 
 if __name__ == "__main__":
     usage()